@@ -0,0 +1,96 @@
+"""Query throughput of ConcurrentRTree as reader threads are added.
+
+Each round runs N reader threads issuing random range queries for a fixed
+time while one writer thread keeps inserting new rectangles. On a regular
+(GIL) CPython build the readers still share one interpreter lock, so the
+numbers show the lock overhead rather than parallel speed-up; on a
+free-threaded build (python3.13t+) the readers run truly in parallel.
+
+Usage:
+    python bench_concurrent.py --entries 20000 --threads 1 2 4 8 --seconds 2
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from rtree_lib import Rect
+from rtree_concurrent import ConcurrentRTree
+
+WORLD = 1000.0
+
+
+def random_rect(rng: random.Random, size: float) -> Rect:
+    x = rng.uniform(0.0, WORLD - size)
+    y = rng.uniform(0.0, WORLD - size)
+    return Rect(x, y, x + size, y + size)
+
+
+def run_round(tree: ConcurrentRTree, n_readers: int, seconds: float,
+              query_size: float, write_interval: float, seed: int):
+    stop = threading.Event()
+    counts = [0] * n_readers
+    writes = [0]
+
+    def reader(slot: int):
+        rng = random.Random(seed + slot)
+        done = 0
+        while not stop.is_set():
+            tree.search_range(random_rect(rng, query_size))
+            done += 1
+        counts[slot] = done
+
+    def writer():
+        rng = random.Random(seed - 1)
+        next_id = 10_000_000
+        while not stop.is_set():
+            tree.insert(random_rect(rng, rng.uniform(0.5, 5.0)), next_id)
+            next_id += 1
+            writes[0] += 1
+            time.sleep(write_interval)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(n_readers)]
+    if write_interval >= 0:
+        threads.append(threading.Thread(target=writer))
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return sum(counts) / elapsed, writes[0] / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--entries", type=int, default=20000)
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--seconds", type=float, default=2.0)
+    ap.add_argument("--query-size", type=float, default=20.0)
+    ap.add_argument("--write-interval", type=float, default=0.001,
+                    help="seconds between writer inserts (negative = no writer)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    tree = ConcurrentRTree(max_entries=8, min_entries=4)
+    for i in range(args.entries):
+        tree.insert(random_rect(rng, rng.uniform(0.5, 5.0)), i)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"entries={args.entries} seconds/round={args.seconds} GIL={'on' if gil else 'off'}")
+    print(f"{'readers':>8} {'queries/s':>12} {'speedup':>8} {'inserts/s':>10}")
+    base = None
+    for n in args.threads:
+        qps, wps = run_round(tree, n, args.seconds, args.query_size,
+                             args.write_interval, args.seed)
+        base = base or qps
+        print(f"{n:>8} {qps:>12.0f} {qps / base:>8.2f} {wps:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
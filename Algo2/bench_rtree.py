@@ -0,0 +1,213 @@
+"""Throughput of rtree_lib.RTree against brute-force NumPy scans and a uniform grid.
+
+For every dataset (uniform, clustered, skewed), size and node capacity M the
+benchmark measures insert, bulk-load (STR), range, kNN and delete throughput.
+It also reports the R-tree shape from RTree.enable_stats / tree_stats: nodes
+visited per range query, height, node fill factor and total sibling overlap.
+Range results are checked against the brute-force scan, so a broken index
+fails loudly instead of looking fast. A second table times RTree.join of two
+bulk-loaded trees against one search_range per box of the first set, and
+checks that both find the same pairs.
+
+Usage:
+    python bench_rtree.py --sizes 1000 10000 100000 --M 8 16 32
+    python bench_rtree.py --datasets clustered --sizes 1000000 --queries 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from rtree_lib import Rect, RTree
+from spatial_hash import SpatialHashGrid
+
+WORLD = 1000.0
+DATASETS = ("uniform", "clustered", "skewed")
+
+
+# ========= data =========
+
+def make_boxes(kind: str, n: int, rng: np.random.Generator) -> np.ndarray:
+    """n small rectangles as rows (xmin, ymin, xmax, ymax) inside the world."""
+    if kind == "uniform":
+        lo = rng.uniform(0.0, WORLD, size=(n, 2))
+    elif kind == "clustered":
+        centers = rng.uniform(0.1 * WORLD, 0.9 * WORLD, size=(max(1, n // 1000) + 4, 2))
+        lo = centers[rng.integers(len(centers), size=n)] + rng.normal(0.0, 0.02 * WORLD, (n, 2))
+    elif kind == "skewed":
+        # dense near the origin, sparse towards the far corner
+        lo = WORLD * rng.uniform(0.0, 1.0, size=(n, 2)) ** 4
+    else:
+        raise ValueError(f"unknown dataset {kind!r}, expected one of {DATASETS}")
+    lo = np.clip(lo, 0.0, WORLD - 5.0)
+    size = rng.uniform(0.5, 5.0, size=(n, 2))
+    return np.hstack([lo, lo + size])
+
+
+def make_queries(n: int, size: float, rng: np.random.Generator) -> np.ndarray:
+    lo = rng.uniform(0.0, WORLD - size, size=(n, 2))
+    return np.hstack([lo, lo + size])
+
+
+# ========= baselines =========
+
+def brute_range(boxes: np.ndarray, alive: np.ndarray, q) -> np.ndarray:
+    hit = ((boxes[:, 2] >= q[0]) & (boxes[:, 0] <= q[2]) &
+           (boxes[:, 3] >= q[1]) & (boxes[:, 1] <= q[3]) & alive)
+    return np.flatnonzero(hit)
+
+
+def brute_knn(boxes: np.ndarray, alive: np.ndarray, p, k: int) -> np.ndarray:
+    gap = np.maximum(np.maximum(boxes[:, :2] - p, p - boxes[:, 2:]), 0.0)
+    d2 = np.einsum("ij,ij->i", gap, gap)
+    d2[~alive] = np.inf
+    k = min(k, len(d2))
+    idx = np.argpartition(d2, k - 1)[:k]
+    return idx[np.argsort(d2[idx])]
+
+
+# ========= benchmark =========
+
+def rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def bench_case(kind: str, n: int, M: int, args, rng: np.random.Generator) -> list:
+    m = max(2, M * 2 // 5)
+    boxes = make_boxes(kind, n, rng)
+    rects = [Rect(*b) for b in boxes.tolist()]
+    queries = make_queries(args.queries, args.query_size, rng)
+    points = rng.uniform(0.0, WORLD, size=(args.queries, 2))
+    n_delete = min(n, args.deletes)
+    victims = rng.choice(n, size=n_delete, replace=False)
+    alive = np.ones(n, dtype=bool)
+
+    def build_insert():
+        tree = RTree(M, m, split=args.split)
+        for i, r in enumerate(rects):
+            tree.insert(r, i)
+        return tree
+
+    def build_grid():
+        grid = SpatialHashGrid(args.cell)
+        for i, r in enumerate(rects):
+            grid.insert(r, i)
+        return grid
+
+    tree, t_insert = timed(build_insert)
+    bulk, t_bulk = timed(RTree.bulk_load, zip(rects, range(n)), M, m, args.split)
+    grid, t_grid = timed(build_grid)
+
+    qlist = [Rect(*q) for q in queries.tolist()]
+    rows = []
+    for name, idx, t_build in (("insert", tree, t_insert), ("bulk", bulk, t_bulk)):
+        hits, t_range = timed(lambda: [idx.search_range(q) for q in qlist])
+        for q, got in zip(queries[:20], hits):
+            assert sorted(got) == brute_range(boxes, alive, q).tolist(), "range mismatch"
+        _, t_knn = timed(lambda: [idx.nearest(p, args.k) for p in points.tolist()])
+        counters = idx.enable_stats()
+        for q in qlist:
+            idx.search_range(q)
+        idx.disable_stats()
+        visited = counters.nodes_visited / counters.queries
+        stats = idx.tree_stats()
+        rows.append((f"rtree/{name}", rate(n, t_build), rate(len(qlist), t_range),
+                     rate(len(points), t_knn), visited, stats))
+
+    _, t_range = timed(lambda: [brute_range(boxes, alive, q) for q in queries])
+    _, t_knn = timed(lambda: [brute_knn(boxes, alive, p, args.k) for p in points])
+    rows.append(("brute", float("inf"), rate(len(queries), t_range),
+                 rate(len(points), t_knn), float(n), None))
+    _, t_range = timed(lambda: [grid.search_range(q) for q in qlist])
+    _, t_knn = timed(lambda: [grid.nearest(p, args.k) for p in points.tolist()])
+    rows.append(("grid", rate(n, t_grid), rate(len(queries), t_range),
+                 rate(len(points), t_knn), float("nan"), None))
+
+    # deletes mutate the structures, so they run last
+    del_rates = {}
+    _, t = timed(lambda: [tree.delete(rects[i], int(i)) for i in victims])
+    del_rates["rtree/insert"] = rate(n_delete, t)
+
+    def brute_delete():
+        for i in victims:
+            alive[i] = False
+    _, t = timed(brute_delete)
+    del_rates["brute"] = rate(n_delete, t)
+    _, t = timed(lambda: [grid.delete(rects[i], int(i)) for i in victims])
+    del_rates["grid"] = rate(n_delete, t)
+    for q in queries[:20]:
+        assert sorted(tree.search_range(Rect(*q))) == brute_range(boxes, alive, q).tolist(), \
+            "range mismatch after delete"
+    return [row + (del_rates.get(row[0], float("nan")),) for row in rows]
+
+
+def bench_join(kind: str, n: int, M: int, args, rng: np.random.Generator) -> tuple:
+    m = max(2, M * 2 // 5)
+    left = [Rect(*b) for b in make_boxes(kind, n, rng).tolist()]
+    right = [Rect(*b) for b in make_boxes(kind, n, rng).tolist()]
+    tree_l = RTree.bulk_load(zip(left, range(n)), M, m, args.split)
+    tree_r = RTree.bulk_load(zip(right, range(n)), M, m, args.split)
+    # the flat arrays are cached per tree; build them outside the timing
+    tree_l.join(tree_r)
+
+    pairs, t_join = timed(tree_l.join, tree_r)
+
+    def loop():
+        return [(i, j) for i, r in enumerate(left) for j in tree_r.search_range(r)]
+    looped, t_loop = timed(loop)
+    assert sorted(map(tuple, pairs.tolist())) == sorted(looped), "join mismatch"
+    return len(pairs), t_join, t_loop
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--datasets", nargs="+", choices=DATASETS, default=list(DATASETS))
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--M", type=int, nargs="+", default=[8, 16, 32],
+                    help="node capacities to compare (m = 40%% of M)")
+    ap.add_argument("--split", default="quadratic", choices=("quadratic", "linear", "rstar"))
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--query-size", type=float, default=20.0)
+    ap.add_argument("--k", type=int, default=10, help="neighbours per kNN query")
+    ap.add_argument("--deletes", type=int, default=1000)
+    ap.add_argument("--cell", type=float, default=10.0, help="uniform grid cell size")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"split={args.split} queries={args.queries} query_size={args.query_size} "
+          f"k={args.k} grid_cell={args.cell}")
+    header = (f"{'dataset':>9} {'n':>8} {'M':>3} {'index':>12} {'build/s':>10} "
+              f"{'range/s':>9} {'knn/s':>8} {'delete/s':>9} {'visited':>8} "
+              f"{'height':>6} {'fill':>5} {'overlap':>8}")
+    print(header)
+    for kind in args.datasets:
+        for n in args.sizes:
+            for M in args.M:
+                rng = np.random.default_rng(args.seed)
+                for name, build, rng_q, knn, visited, stats, dele in bench_case(kind, n, M, args, rng):
+                    shape = (f"{stats.height:>6} {stats.mean_fill:>5.2f} {stats.overlap_area:>8.0f}"
+                             if stats else f"{'-':>6} {'-':>5} {'-':>8}")
+                    print(f"{kind:>9} {n:>8} {M:>3} {name:>12} {build:>10.0f} {rng_q:>9.0f} "
+                          f"{knn:>8.0f} {dele:>9.0f} {visited:>8.1f} {shape}")
+
+    print()
+    print(f"{'dataset':>9} {'n':>8} {'M':>3} {'pairs':>9} {'join s':>8} {'loop s':>8} "
+          f"{'speedup':>7}")
+    for kind in args.datasets:
+        for n in args.sizes:
+            for M in args.M:
+                rng = np.random.default_rng(args.seed)
+                pairs, t_join, t_loop = bench_join(kind, n, M, args, rng)
+                print(f"{kind:>9} {n:>8} {M:>3} {pairs:>9} {t_join:>8.3f} {t_loop:>8.3f} "
+                      f"{t_loop / t_join:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""Disk-backed R-tree: fixed-size node pages in a memory-mapped file.
+
+Page 0 holds the tree header, every other page holds exactly one node.
+Nodes are decoded on demand through an LRU buffer pool, so only
+`buffer_pages` nodes live in Python memory at once and an existing index
+can be reopened without rebuilding it. Leaf entries store int64 object ids.
+"""
+
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from rtree_lib import Rect
+
+MAGIC = b"RTPG"
+VERSION = 1
+
+# magic, version, page_size, max_entries, min_entries,
+# root page, height, number of pages, number of entries
+HEADER = struct.Struct("<4sIIIIqqqq")
+NODE_HEADER = struct.Struct("<BxHxxxx")
+ENTRY_DTYPE = np.dtype([("box", "<f8", (4,)), ("ref", "<i8")])
+
+
+class DiskNode:
+    def __init__(self, page_id: int, leaf: bool, capacity: int):
+        self.page_id = page_id
+        self.leaf = leaf
+        self.count = 0
+        # one spare slot so a node can overflow before it is split
+        self.boxes = np.empty((capacity + 1, 4), dtype=np.float64)
+        self.refs = np.empty(capacity + 1, dtype=np.int64)
+
+    def append(self, box, ref: int):
+        self.boxes[self.count] = box
+        self.refs[self.count] = ref
+        self.count += 1
+
+    def mbr(self) -> np.ndarray:
+        b = self.boxes[:self.count]
+        return np.array([b[:, 0].min(), b[:, 1].min(), b[:, 2].max(), b[:, 3].max()])
+
+
+class DiskRTree:
+    """
+    Persistent R-tree (Guttman, linear split) stored in pages of an mmap'd file.
+
+    Use `DiskRTree.create(path)` for a new index or `DiskRTree.open(path)` to
+    reopen one; `close()` (or the context manager) flushes dirty pages and
+    the header back to the file.
+    """
+
+    def __init__(self, path: str, buffer_pages: int):
+        if buffer_pages < 1:
+            raise ValueError("buffer_pages must be >= 1")
+        self.path = path
+        self.buffer_pages = buffer_pages
+        self.buffer_hits = 0
+        self.buffer_misses = 0
+        self._pool: "OrderedDict[int, DiskNode]" = OrderedDict()
+        self._dirty = set()
+        self._pinned = False
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+
+    # ---------- open / create / close ----------
+
+    @classmethod
+    def create(cls, path: str, page_size: int = 4096, max_entries: Optional[int] = None,
+               min_entries: Optional[int] = None, buffer_pages: int = 256) -> "DiskRTree":
+        capacity = (page_size - NODE_HEADER.size) // ENTRY_DTYPE.itemsize
+        if page_size < HEADER.size or capacity < 4:
+            raise ValueError(f"page_size {page_size} is too small for a node")
+        M = capacity if max_entries is None else max_entries
+        m = max(2, M * 2 // 5) if min_entries is None else min_entries
+        if M > capacity:
+            raise ValueError(f"max_entries {M} does not fit in a {page_size}-byte page")
+        assert 1 < m <= M // 2
+
+        tree = cls(path, buffer_pages)
+        tree.page_size = page_size
+        tree.M = M
+        tree.m = m
+        tree.height = 1
+        tree.num_pages = 1
+        tree.size = 0
+        tree._file = open(path, "w+b")
+        tree._file.truncate(page_size * 16)
+        tree._mm = mmap.mmap(tree._file.fileno(), page_size * 16)
+        root = tree._new_node(leaf=True)
+        tree.root_page = root.page_id
+        tree._write_header()
+        return tree
+
+    @classmethod
+    def open(cls, path: str, buffer_pages: int = 256) -> "DiskRTree":
+        size = os.path.getsize(path)
+        if size < HEADER.size:
+            raise ValueError(f"{path} is not a disk R-tree file ({size} bytes, "
+                             f"shorter than the header)")
+        tree = cls(path, buffer_pages)
+        tree._file = open(path, "r+b")
+        tree._mm = mmap.mmap(tree._file.fileno(), size)
+        (magic, version, tree.page_size, tree.M, tree.m, tree.root_page,
+         tree.height, tree.num_pages, tree.size) = HEADER.unpack_from(tree._mm, 0)
+        # a rejected file is released without flush(), which would write
+        # our header over it
+        if magic != MAGIC:
+            tree._release()
+            raise ValueError(f"{path} is not a disk R-tree file")
+        if version != VERSION:
+            tree._release()
+            raise ValueError(f"unsupported disk R-tree version {version}")
+        return tree
+
+    def flush(self):
+        for page_id in list(self._dirty):
+            self._write_node(self._pool[page_id])
+        self._dirty.clear()
+        self._write_header()
+        self._mm.flush()
+
+    def close(self):
+        if self._mm is None:
+            return
+        self.flush()
+        self._release()
+
+    def _release(self):
+        # drop the pool and unmap the file without writing anything back
+        self._pool.clear()
+        self._dirty.clear()
+        self._mm.close()
+        self._file.close()
+        self._mm = None
+        self._file = None
+
+    def __enter__(self) -> "DiskRTree":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    # ---------- public API ----------
+
+    def insert(self, rect: Rect, obj_id: int):
+        # the insertion path stays pinned in the pool until the insert is
+        # done, so no half-updated (overflowing) node is ever written back
+        self._pinned = True
+        try:
+            self._insert(rect, obj_id)
+        finally:
+            self._pinned = False
+            self._evict()
+
+    def _insert(self, rect: Rect, obj_id: int):
+        box = (rect.xmin, rect.ymin, rect.xmax, rect.ymax)
+        path = []
+        node = self._get(self.root_page)
+        while not node.leaf:
+            idx = self._choose_subtree(node, box)
+            path.append((node, idx))
+            node = self._get(int(node.refs[idx]))
+
+        node.append(box, obj_id)
+        self.size += 1
+        split = self._split(node) if node.count > self.M else None
+        self._mark_dirty(node)
+
+        for parent, idx in reversed(path):
+            parent.boxes[idx] = node.mbr()
+            if split is not None:
+                parent.append(split.mbr(), split.page_id)
+                split = self._split(parent) if parent.count > self.M else None
+            self._mark_dirty(parent)
+            node = parent
+
+        if split is not None:
+            root = self._new_node(leaf=False)
+            root.append(node.mbr(), node.page_id)
+            root.append(split.mbr(), split.page_id)
+            self.root_page = root.page_id
+            self.height += 1
+
+    def search_range(self, query: Rect) -> List[int]:
+        res: List[int] = []
+        stack = [self.root_page]
+        while stack:
+            node = self._get(stack.pop())
+            hits = node.refs[:node.count][self._intersecting(node, query)]
+            if node.leaf:
+                res.extend(hits.tolist())
+            else:
+                stack.extend(hits.tolist())
+        return res
+
+    def iter_range(self, query: Rect) -> Iterator[int]:
+        stack = [self.root_page]
+        while stack:
+            node = self._get(stack.pop())
+            hits = node.refs[:node.count][self._intersecting(node, query)]
+            if node.leaf:
+                yield from hits.tolist()
+            else:
+                stack.extend(hits.tolist())
+
+    # ---------- buffer pool ----------
+
+    def _get(self, page_id: int) -> DiskNode:
+        node = self._pool.get(page_id)
+        if node is not None:
+            self.buffer_hits += 1
+            self._pool.move_to_end(page_id)
+            return node
+        self.buffer_misses += 1
+        node = self._read_node(page_id)
+        self._pool[page_id] = node
+        self._evict()
+        return node
+
+    def _mark_dirty(self, node: DiskNode):
+        self._pool[node.page_id] = node
+        self._pool.move_to_end(node.page_id)
+        self._dirty.add(node.page_id)
+        self._evict()
+
+    def _evict(self):
+        if self._pinned:
+            return
+        while len(self._pool) > self.buffer_pages:
+            page_id, node = self._pool.popitem(last=False)
+            if page_id in self._dirty:
+                self._write_node(node)
+                self._dirty.discard(page_id)
+
+    # ---------- pages ----------
+
+    def _new_node(self, leaf: bool) -> DiskNode:
+        page_id = self.num_pages
+        self.num_pages += 1
+        needed = self.num_pages * self.page_size
+        if needed > len(self._mm):
+            self._grow(max(needed, 2 * len(self._mm)))
+        node = DiskNode(page_id, leaf, self.M)
+        self._mark_dirty(node)
+        return node
+
+    def _grow(self, new_size: int):
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(new_size)
+        self._mm = mmap.mmap(self._file.fileno(), new_size)
+
+    def _read_node(self, page_id: int) -> DiskNode:
+        offset = page_id * self.page_size
+        leaf, count = NODE_HEADER.unpack_from(self._mm, offset)
+        node = DiskNode(page_id, bool(leaf), self.M)
+        entries = np.frombuffer(self._mm, dtype=ENTRY_DTYPE, count=count,
+                                offset=offset + NODE_HEADER.size)
+        node.boxes[:count] = entries["box"]
+        node.refs[:count] = entries["ref"]
+        node.count = count
+        del entries  # drop the buffer export so the mmap can be resized/closed
+        return node
+
+    def _write_node(self, node: DiskNode):
+        offset = node.page_id * self.page_size
+        entries = np.empty(node.count, dtype=ENTRY_DTYPE)
+        entries["box"] = node.boxes[:node.count]
+        entries["ref"] = node.refs[:node.count]
+        NODE_HEADER.pack_into(self._mm, offset, int(node.leaf), node.count)
+        start = offset + NODE_HEADER.size
+        self._mm[start:start + entries.nbytes] = entries.tobytes()
+
+    def _write_header(self):
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.page_size, self.M, self.m,
+                         self.root_page, self.height, self.num_pages, self.size)
+
+    # ---------- algorithms ----------
+
+    @staticmethod
+    def _intersecting(node: DiskNode, query: Rect) -> np.ndarray:
+        b = node.boxes[:node.count]
+        return ((b[:, 2] >= query.xmin) & (b[:, 0] <= query.xmax) &
+                (b[:, 3] >= query.ymin) & (b[:, 1] <= query.ymax))
+
+    @staticmethod
+    def _choose_subtree(node: DiskNode, box) -> int:
+        b = node.boxes[:node.count]
+        area = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+        grown = ((np.maximum(b[:, 2], box[2]) - np.minimum(b[:, 0], box[0])) *
+                 (np.maximum(b[:, 3], box[3]) - np.minimum(b[:, 1], box[1])))
+        return int(np.lexsort((area, grown - area))[0])
+
+    def _split(self, node: DiskNode) -> DiskNode:
+        """Guttman linear split; `node` keeps group 1, the new page gets group 2."""
+        n = node.count
+        boxes = node.boxes[:n].copy()
+        refs = node.refs[:n].copy()
+
+        best_sep = None
+        for lo, hi in ((0, 2), (1, 3)):
+            width = boxes[:, hi].max() - boxes[:, lo].min()
+            highest_low = int(np.argmax(boxes[:, lo]))
+            highs = boxes[:, hi].copy()
+            highs[highest_low] = np.inf
+            lowest_high = int(np.argmin(highs))
+            sep = boxes[highest_low, lo] - boxes[lowest_high, hi]
+            if width > 0.0:
+                sep /= width
+            if best_sep is None or sep > best_sep:
+                best_sep = sep
+                s1, s2 = highest_low, lowest_high
+
+        new = self._new_node(node.leaf)
+        node.count = 0
+        node.append(boxes[s1], refs[s1])
+        new.append(boxes[s2], refs[s2])
+        mbr1 = boxes[s1].tolist()
+        mbr2 = boxes[s2].tolist()
+        remaining = n - 2
+        for i in range(n):
+            if i == s1 or i == s2:
+                continue
+            x0, y0, x1, y1 = boxes[i].tolist()
+            if node.count + remaining == self.m:
+                to_first = True
+            elif new.count + remaining == self.m:
+                to_first = False
+            else:
+                area1 = (mbr1[2] - mbr1[0]) * (mbr1[3] - mbr1[1])
+                area2 = (mbr2[2] - mbr2[0]) * (mbr2[3] - mbr2[1])
+                inc1 = (max(mbr1[2], x1) - min(mbr1[0], x0)) * \
+                       (max(mbr1[3], y1) - min(mbr1[1], y0)) - area1
+                inc2 = (max(mbr2[2], x1) - min(mbr2[0], x0)) * \
+                       (max(mbr2[3], y1) - min(mbr2[1], y0)) - area2
+                if inc1 != inc2:
+                    to_first = inc1 < inc2
+                elif area1 != area2:
+                    to_first = area1 < area2
+                else:
+                    to_first = node.count <= new.count
+            target, mbr = (node, mbr1) if to_first else (new, mbr2)
+            target.append(boxes[i], refs[i])
+            mbr[0] = min(mbr[0], x0)
+            mbr[1] = min(mbr[1], y0)
+            mbr[2] = max(mbr[2], x1)
+            mbr[3] = max(mbr[3], y1)
+            remaining -= 1
+        return new
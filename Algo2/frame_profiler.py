@@ -0,0 +1,241 @@
+"""Per-frame phase timing for the robot main loops, with an on-screen graph.
+
+A frame is split into named phases (input, move, avoid, jump, stuck,
+render, ...). The loop calls `start_frame()` once, `mark(phase)` at the end
+of every phase (the phase lasted since the previous mark) and
+`end_frame()`; each call is one perf_counter read. Durations go into a ring
+buffer of the last `capacity` frames, so a long run needs constant memory.
+
+draw() blits a scrolling stacked bar graph (one pixel column per frame,
+one color per phase, idle phases such as the frame-rate wait left out, a
+line at the 60 FPS budget) and a legend with the mean and p95
+milliseconds of every phase over the buffer. Only the newest column
+is drawn per frame. dump() writes the buffer as CSV (one row per frame) or
+as Chrome trace-event JSON (one complete event per phase, for
+chrome://tracing or Perfetto), chosen by the file extension.
+
+The robot scripts share their wiring: add_cli_args() adds --profile and
+--profile-out to a script's flag parser, and LoopProfiler built from the
+parsed flags times the clock wait (tick), toggles the graph on the P key
+(handle_event), draws it (overlay), flips the display (flip) and writes
+--profile-out on close(). step_simulation takes its phase marks from
+marker(profiler), a no-op without a profiler.
+
+Usage (in a robot script):
+    python robot_3.py --profile --profile-out frames.json
+"""
+
+import argparse
+import csv
+import json
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FRAME_BUDGET_MS = 1000.0 / 60.0
+
+# phases of the robot scripts' main loop, in order; "wait" is clock.tick,
+# "trace" the trace record / replay of sim_trace.py
+LOOP_PHASES = ("wait", "input", "move", "avoid", "jump", "stuck", "trace",
+               "render", "overlay", "flip")
+
+# graph colors, cycled over the phases
+PALETTE = [(120, 120, 120), (230, 159, 0), (86, 180, 233), (0, 158, 115),
+           (240, 228, 66), (0, 114, 178), (213, 94, 0), (204, 121, 167),
+           (255, 255, 255), (150, 90, 40)]
+
+
+class FrameProfiler:
+    """Ring buffer of per-phase frame durations (ms) for the phases in `phases`."""
+
+    def __init__(self, phases: Sequence[str], capacity: int = 240,
+                 idle: Sequence[str] = ("wait",)):
+        if capacity < 1:
+            raise ValueError(f"capacity must be >= 1, got {capacity}")
+        self.phases = list(phases)
+        # idle phases (frame-rate limiter) are recorded but not graphed
+        self._busy = [k for k, name in enumerate(self.phases) if name not in idle]
+        self._slot = {name: k for k, name in enumerate(self.phases)}
+        self.capacity = capacity
+        self.ms = np.zeros((capacity, len(self.phases)))
+        self.starts = np.zeros(capacity)  # frame start, seconds since the profiler was made
+        self.frames = 0  # frames ended so far
+        self._t0 = time.perf_counter()
+        self._last = self._t0
+        self._row = np.zeros(len(self.phases))
+        self._frame_start = 0.0
+        self._graph = None
+        self._legend = None
+
+    # ---------- recording ----------
+
+    def start_frame(self):
+        self._last = time.perf_counter()
+        self._frame_start = self._last - self._t0
+        self._row[:] = 0.0
+
+    def mark(self, phase: str):
+        """The time since the previous mark (or frame start) belongs to `phase`."""
+        now = time.perf_counter()
+        self._row[self._slot[phase]] += (now - self._last) * 1000.0
+        self._last = now
+
+    def end_frame(self):
+        k = self.frames % self.capacity
+        self.ms[k] = self._row
+        self.starts[k] = self._frame_start
+        self.frames += 1
+
+    def history(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(starts, ms) of the buffered frames, oldest first."""
+        n = min(self.frames, self.capacity)
+        order = (np.arange(self.frames - n, self.frames)) % self.capacity
+        return self.starts[order], self.ms[order]
+
+    def summary(self) -> Dict[str, Tuple[float, float]]:
+        """Mean and 95th-percentile ms of every phase over the buffered frames."""
+        _, ms = self.history()
+        if len(ms) == 0:
+            return {name: (0.0, 0.0) for name in self.phases}
+        mean = ms.mean(axis=0)
+        p95 = np.percentile(ms, 95, axis=0)
+        return {name: (float(mean[k]), float(p95[k])) for k, name in enumerate(self.phases)}
+
+    # ---------- output ----------
+
+    def dump(self, path: str):
+        """Write the buffered frames to `path`: Chrome trace JSON for .json, else CSV."""
+        starts, ms = self.history()
+        first = self.frames - len(ms)
+        if path.endswith(".json"):
+            events: List[dict] = []
+            for f, (t, row) in enumerate(zip(starts.tolist(), ms.tolist())):
+                ts = t * 1e6
+                events.append({"name": "frame", "ph": "X", "ts": ts, "dur": sum(row) * 1e3,
+                               "pid": 0, "tid": 0, "args": {"frame": first + f}})
+                for name, d in zip(self.phases, row):
+                    if d > 0.0:
+                        events.append({"name": name, "ph": "X", "ts": ts, "dur": d * 1e3,
+                                       "pid": 0, "tid": 1})
+                    ts += d * 1e3
+            with open(path, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            return
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["frame", "start_s", *(f"{name}_ms" for name in self.phases), "total_ms"])
+            for k, (t, row) in enumerate(zip(starts.tolist(), ms.tolist())):
+                w.writerow([first + k, f"{t:.6f}", *(f"{d:.4f}" for d in row), f"{sum(row):.4f}"])
+
+    # ---------- overlay ----------
+
+    def draw(self, screen, font, x: int, y: int, height: int = 60,
+             scale_ms: float = 1.5 * FRAME_BUDGET_MS):
+        """
+        Draw the graph (width = capacity px, `scale_ms` tall) with its
+        top-left corner at (x, y) and the legend to its right.
+        """
+        import pygame
+
+        if self._graph is None or self._graph.get_height() != height:
+            self._graph = pygame.Surface((self.capacity, height))
+            self._graph.fill((0, 0, 0))
+        g = self._graph
+        # scroll one column left and draw the newest frame, bottom up
+        g.scroll(-1, 0)
+        col = self.capacity - 1
+        pygame.draw.line(g, (0, 0, 0), (col, 0), (col, height - 1))
+        if self.frames:
+            row = self.ms[(self.frames - 1) % self.capacity]
+            bottom = float(height)
+            for k in self._busy:
+                top = bottom - row[k] * height / scale_ms
+                if bottom - top >= 0.5 and bottom > 0:
+                    pygame.draw.line(g, PALETTE[k % len(PALETTE)],
+                                     (col, max(0, int(top))), (col, int(bottom) - 1))
+                bottom = top
+        screen.blit(g, (x, y))
+        budget_y = y + height - int(FRAME_BUDGET_MS * height / scale_ms)
+        pygame.draw.line(screen, (255, 255, 255), (x, budget_y), (x + self.capacity - 1, budget_y))
+
+        # the legend text changes slowly; render it every 30 frames only
+        if self._legend is None or self.frames % 30 == 0:
+            stats = self.summary()
+            busy = sum(stats[self.phases[k]][0] for k in self._busy)
+            self._legend = [font.render(f"busy {busy:5.2f} ms / {FRAME_BUDGET_MS:.1f}",
+                                        True, (230, 230, 230))]
+            for k, name in enumerate(self.phases):
+                mean, p95 = stats[name]
+                self._legend.append(font.render(f"{name:<8} {mean:5.2f} p95 {p95:5.2f}",
+                                                True, PALETTE[k % len(PALETTE)]))
+        lx = x + self.capacity + 4
+        width = max(surf.get_width() for surf in self._legend) + 8
+        height = sum(surf.get_height() for surf in self._legend) + 4
+        pygame.draw.rect(screen, (0, 0, 0), (lx, y, width, height))
+        ly = y + 2
+        for surf in self._legend:
+            screen.blit(surf, (lx + 4, ly))
+            ly += surf.get_height()
+
+
+
+# ---------- robot script main loops ----------
+
+
+def add_cli_args(parser: argparse.ArgumentParser):
+    """Add --profile (graph on from the start) and --profile-out FILE to a script's parser."""
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--profile-out", default=None, metavar="FILE")
+
+
+def marker(profiler: Optional[FrameProfiler]) -> Callable[[str], None]:
+    """profiler.mark, or a no-op when there is no profiler."""
+    return profiler.mark if profiler is not None else (lambda phase: None)
+
+
+class LoopProfiler(FrameProfiler):
+    """
+    FrameProfiler over LOOP_PHASES for a robot script's window loop, set up
+    from the flags of add_cli_args(): the graph is shown from the start with
+    --profile, and close() dumps to --profile-out.
+    """
+
+    def __init__(self, args: argparse.Namespace, capacity: int = 240):
+        super().__init__(LOOP_PHASES, capacity)
+        self.visible = bool(args.profile)
+        self.out = args.profile_out
+
+    def tick(self, clock, fps: int = 60) -> float:
+        """Start a frame and wait on the pygame clock; returns dt in seconds."""
+        self.start_frame()
+        dt = clock.tick(fps) / 1000.0
+        self.mark("wait")
+        return dt
+
+    def handle_event(self, event) -> bool:
+        """Toggle the graph on a P key press; True when `event` was that press."""
+        import pygame
+
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+            self.visible = not self.visible
+            return True
+        return False
+
+    def overlay(self, screen, font, x: int = 10, y: int = 30):
+        """Draw the graph when it is shown; the time counts as "overlay"."""
+        if self.visible:
+            self.draw(screen, font, x, y)
+        self.mark("overlay")
+
+    def flip(self):
+        """Flip the display and end the frame."""
+        import pygame
+
+        pygame.display.flip()
+        self.mark("flip")
+        self.end_frame()
+
+    def close(self):
+        if self.out:
+            self.dump(self.out)
@@ -0,0 +1,250 @@
+"""Free-space sampling of robot targets from a rasterised obstacle mask.
+
+choose_target_not_touching() in robot_2.py / robot_3.py drew random floor
+points and asked the obstacle index about each one, up to 1000 times, and
+fell back to (0, 0) when all of them touched an obstacle. FreeSpaceSampler
+does the obstacle work once: the floor rectangle is split into square cells
+and a cell is free when every point in it keeps `clearance` to all
+obstacles, i.e. when its center keeps clearance + half the cell diagonal
+(one RTree.search_batch call, see path_planner.blocked_points). All free
+cells have the same area, so the cumulative-area table of the free mask is
+just the list of free cells: a draw picks one uniformly and a uniform
+point inside it, O(1) and without retries. Cells only partly free are left
+out, which trades a thin band of floor for the guarantee.
+
+Free cells are also split into 4-connected components over the whole
+`floor` the robot drives on (default: the target rectangle), so a gap
+outside the target rectangle still links the regions it connects.
+sample(near=p) draws only from the component of p, so the target can be
+reached from p without leaving the free mask, unless that component holds
+less than `min_share` of the target cells (a pocket the robot was dropped
+into): then the draw covers all target cells.
+
+rebuild() rasterises the whole floor again, rebuild(region) only the
+cells near a changed obstacle. When obstacles are added, moved or removed
+without either call, the index's `changes` counter gives it away and the
+next sample() rebuilds the whole floor.
+
+Usage (draw time and failures against the retry loop):
+    python free_space.py --obstacles 50 100 200 --draws 2000
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from path_planner import blocked_points
+from rtree_lib import Rect, RTree
+
+Point = Tuple[float, float]
+
+
+def _components(free: np.ndarray) -> np.ndarray:
+    # 4-connected labels of a (nx, nz) mask, each the smallest flat cell
+    # index of its component: hook the larger root of every edge that still
+    # spans two labels onto the smaller one, then jump pointers to roots
+    nx, nz = free.shape
+    labels = np.arange(nx * nz)
+    flat = labels.reshape(nx, nz)
+    down = flat[:-1][free[:-1] & free[1:]]
+    right = flat[:, :-1][free[:, :-1] & free[:, 1:]]
+    a = np.concatenate([down, right])
+    b = np.concatenate([down + nz, right + 1])
+    while True:
+        la = labels[a]
+        lb = labels[b]
+        split = la != lb
+        if not split.any():
+            return labels
+        a, b, la, lb = a[split], b[split], la[split], lb[split]
+        np.minimum.at(labels, np.maximum(la, lb), np.minimum(la, lb))
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+class FreeSpaceSampler:
+    """
+    Uniform target points in the floor rectangle `bounds` = (xmin, zmin,
+    xmax, zmax) that keep `clearance` to every obstacle of `index`. `floor`
+    is the rectangle the robot can reach (it must contain `bounds`) and
+    `span` = (y0, y1) the robot's height range for 3D (x, y, z) indexes.
+    """
+
+    def __init__(self, index, bounds: Sequence[float], clearance: float,
+                 resolution: float = 1.0, span: Optional[Tuple[float, float]] = None,
+                 floor: Optional[Sequence[float]] = None, min_share: float = 0.05):
+        if resolution <= 0.0:
+            raise ValueError(f"resolution must be > 0, got {resolution}")
+        self.index = index
+        self.res = float(resolution)
+        self.clearance = float(clearance)
+        self.span = span
+        self.min_share = float(min_share)
+        bx0, bz0, bx1, bz1 = (float(v) for v in bounds)
+        self.xmin, self.zmin, xmax, zmax = (float(v) for v in (floor or bounds))
+        if bx0 < self.xmin or bz0 < self.zmin or bx1 > xmax or bz1 > zmax:
+            raise ValueError(f"bounds {tuple(bounds)} are not inside the floor {tuple(floor or bounds)}")
+        # only whole cells inside the floor, targets only from whole cells
+        # inside the bounds
+        self.nx = max(0, math.floor((xmax - self.xmin) / self.res))
+        self.nz = max(0, math.floor((zmax - self.zmin) / self.res))
+        self.free = np.zeros((self.nx, self.nz), dtype=bool)
+        self.targets = np.zeros((self.nx, self.nz), dtype=bool)
+        self.targets[max(0, math.ceil((bx0 - self.xmin) / self.res - 1e-9)):
+                     max(0, math.floor((bx1 - self.xmin) / self.res + 1e-9)),
+                     max(0, math.ceil((bz0 - self.zmin) / self.res - 1e-9)):
+                     max(0, math.floor((bz1 - self.zmin) / self.res + 1e-9))] = True
+        self.rebuild()
+
+    # ---------- mask ----------
+
+    def rebuild(self, region: Optional[Sequence[float]] = None):
+        """
+        Rasterise the obstacles again: all cells, or only those whose free
+        state can depend on floor rectangle `region` = (xmin, zmin, xmax,
+        zmax), e.g. the footprint of an added or removed obstacle.
+        """
+        self._changes = getattr(self.index, "changes", 0)
+        reach = self.clearance + self.res * math.sqrt(0.5)
+        if region is None:
+            i0, j0, i1, j1 = 0, 0, self.nx, self.nz
+        else:
+            rx0, rz0, rx1, rz1 = region
+            i0 = max(0, math.floor((rx0 - reach - self.xmin) / self.res))
+            j0 = max(0, math.floor((rz0 - reach - self.zmin) / self.res))
+            i1 = min(self.nx, math.ceil((rx1 + reach - self.xmin) / self.res))
+            j1 = min(self.nz, math.ceil((rz1 + reach - self.zmin) / self.res))
+        if i1 > i0 and j1 > j0:
+            xs = self.xmin + (np.arange(i0, i1) + 0.5) * self.res
+            zs = self.zmin + (np.arange(j0, j1) + 0.5) * self.res
+            cx, cz = np.meshgrid(xs, zs, indexing="ij")
+            centers = np.stack([cx.ravel(), cz.ravel()], axis=1)
+            blocked = blocked_points(self.index, centers, reach, self.span)
+            self.free[i0:i1, j0:j1] = ~blocked.reshape(i1 - i0, j1 - j0)
+
+        # free target cells grouped by component of the whole floor, and
+        # each component's slice
+        labels = _components(self.free)
+        cells = np.flatnonzero(self.free & self.targets)
+        cells = cells[np.argsort(labels[cells], kind="stable")]
+        roots, starts, counts = np.unique(labels[cells], return_index=True, return_counts=True)
+        self._labels = labels
+        self._cells = cells
+        self._groups = dict(zip(roots.tolist(), zip(starts.tolist(), counts.tolist())))
+
+    @property
+    def free_cells(self) -> int:
+        """Free cells targets are drawn from."""
+        return len(self._cells)
+
+    @property
+    def components(self) -> int:
+        return len(self._groups)
+
+    def cell_of(self, x: float, z: float) -> Tuple[int, int]:
+        i = int((x - self.xmin) // self.res)
+        j = int((z - self.zmin) // self.res)
+        return min(max(i, 0), self.nx - 1), min(max(j, 0), self.nz - 1)
+
+    # ---------- sampling ----------
+
+    def sample(self, rng=random, near: Optional[Sequence[float]] = None) -> Point:
+        """
+        A uniform free point (x, z); with `near`, from the component of the
+        free cell closest to that point only, unless it holds less than
+        `min_share` of the target cells. `rng` is anything with a
+        random() method in [0, 1) (the random module, random.Random, a NumPy
+        Generator). Raises ValueError when no cell is free.
+        """
+        if getattr(self.index, "changes", 0) != self._changes:
+            self.rebuild()
+        if len(self._cells) == 0:
+            raise ValueError("no free cell to sample a target from")
+        start, count = 0, len(self._cells)
+        if near is not None:
+            group = self._groups.get(self._labels[self._nearest_free(near)])
+            if group is not None and group[1] >= self.min_share * len(self._cells):
+                start, count = group
+        k = start + min(int(rng.random() * count), count - 1)
+        i, j = divmod(int(self._cells[k]), self.nz)
+        return (self.xmin + (i + rng.random()) * self.res,
+                self.zmin + (j + rng.random()) * self.res)
+
+    def _nearest_free(self, p: Sequence[float]) -> int:
+        i, j = self.cell_of(p[0], p[1])
+        c = i * self.nz + j
+        if self.free[i, j]:
+            return c
+        cells = np.flatnonzero(self.free)
+        ci, cj = np.divmod(cells, self.nz)
+        return int(cells[np.argmin((ci - i) ** 2 + (cj - j) ** 2)])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--obstacles", type=int, nargs="+", default=[50, 100, 200])
+    ap.add_argument("--draws", type=int, default=2000)
+    ap.add_argument("--floor", type=float, default=180.0)
+    ap.add_argument("--size", type=float, default=11.5)
+    ap.add_argument("--clearance", type=float, default=6.0, help="robot radius + 2")
+    ap.add_argument("--resolution", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    half = args.floor / 2.0
+    margin = 20.0
+    bounds = (-half + margin, -half + margin, half - margin, half - margin)
+    print(f"floor={args.floor} size={args.size} clearance={args.clearance} "
+          f"res={args.resolution} draws={args.draws}")
+    print(f"{'obst':>5} {'build ms':>8} {'free%':>6} {'comps':>5} {'sample us':>9} "
+          f"{'retry us':>9} {'tries':>6} {'fallbacks':>9} {'bad':>4}")
+    for n in args.obstacles:
+        rnd = random.Random(args.seed)
+        index = RTree(max_entries=8, min_entries=4)
+        for k in range(n):
+            cx = rnd.uniform(-half + args.size / 2, half - args.size / 2)
+            cz = rnd.uniform(-half + args.size / 2, half - args.size / 2)
+            index.insert(Rect(cx - args.size / 2, cz - args.size / 2,
+                              cx + args.size / 2, cz + args.size / 2), k)
+
+        t0 = time.perf_counter()
+        sampler = FreeSpaceSampler(index, bounds, args.clearance, args.resolution,
+                                   floor=(-half, -half, half, half))
+        t1 = time.perf_counter()
+        if sampler.free_cells:
+            pts = [sampler.sample(rnd) for _ in range(args.draws)]
+        else:
+            pts = []
+        t2 = time.perf_counter()
+        bad = sum(len(index.query_circle(p, args.clearance)[0]) > 0 for p in pts)
+
+        # the old loop: random points until one clears, (0, 0) after 1000
+        tries = fallbacks = 0
+        t3 = time.perf_counter()
+        for _ in range(args.draws):
+            for _try in range(1000):
+                tries += 1
+                x = rnd.uniform(bounds[0], bounds[2])
+                z = rnd.uniform(bounds[1], bounds[3])
+                if len(index.query_circle((x, z), args.clearance)[0]) == 0:
+                    break
+            else:
+                fallbacks += 1
+        t4 = time.perf_counter()
+
+        area = int(sampler.targets.sum()) or 1
+        print(f"{n:>5} {(t1 - t0) * 1e3:>8.1f} {100.0 * sampler.free_cells / area:>6.1f} "
+              f"{sampler.components:>5} {(t2 - t1) / args.draws * 1e6:>9.2f} "
+              f"{(t4 - t3) / args.draws * 1e6:>9.2f} {tries / args.draws:>6.1f} "
+              f"{fallbacks:>9} {bad:>4}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""On-disk cache of an obstacle map and its R-tree, shared by robot_2.py and robot_3.py.
+
+With a cache path set (OBSTACLE_CACHE in the scripts), the first run writes
+the obstacle tuples to <path>.npy, the R-tree to <path>.rtree (RTree.save)
+and the parameters that generated them to <path>.json. Later runs with the
+same parameters load the map instead of generating and indexing it again
+(the tree is read through RTree.load and turned back into an RTree); a run
+with other parameters regenerates the map and overwrites the cache.
+
+The parameters come from cache_params(), called before the map is drawn:
+the script's obstacle count, sizes, layout and index settings plus a digest
+of the `random` state, so a different --seed (or RobotSim seed) never loads
+another seed's map, and a run without a seed starts from a fresh state and
+regenerates. The cache also keeps the `random` state after generation and
+a hit restores it, so the targets drawn afterwards are the ones an uncached
+run draws. Only R-tree indexes are cached: for any other index kind
+load_obstacle_cache() returns None and save_obstacle_cache() does nothing,
+so the map is built as usual.
+
+Usage (obstacle count, tree shape and parameters of a cache):
+    python obstacle_cache.py robot_3_obstacles
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rtree_lib import RTree
+
+
+def cache_params(**params) -> dict:
+    """`params` plus a digest of the current `random` state; call before generating."""
+    state = repr(random.getstate()).encode()
+    return dict(params, random=hashlib.sha1(state).hexdigest())
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    try:
+        with open(path + ".json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_obstacle_cache(path: Optional[str], index_kind: str,
+                        params: dict) -> Optional[Tuple[List[tuple], RTree]]:
+    """
+    (obstacles, index) from the cache at `path`, or None when there is none
+    to use or it was generated with other `params`. A hit also restores the
+    `random` state the generation left behind.
+    """
+    if not path or index_kind != "rtree" or not os.path.exists(path + ".rtree"):
+        return None
+    meta = _read_meta(path)
+    # through JSON so tuples and lists compare equal
+    if meta is None or meta.get("params") != json.loads(json.dumps(params)):
+        return None
+    obstacles = [tuple(o) for o in np.load(path + ".npy").tolist()]
+    # the scripts' queries touch a handful of boxes, where the pointer
+    # traversal of RTree is several times faster than FlatRTree's arrays
+    index = RTree.load(path + ".rtree", mmap=True).to_rtree()
+    version, internal, gauss = meta["random_after"]
+    random.setstate((version, tuple(internal), gauss))
+    return obstacles, index
+
+
+def _replace(path: str, write):
+    # write next to `path` and rename over it, so a tree memory-mapped from
+    # the old file keeps its data
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def save_obstacle_cache(path: Optional[str], index_kind: str, params: dict,
+                        obstacles: Sequence[tuple], index: RTree):
+    """
+    Write the obstacles, their R-tree, `params` and the current `random`
+    state to the cache at `path`; a no-op otherwise.
+    """
+    if not path or index_kind != "rtree":
+        return
+    arr = np.asarray(obstacles, dtype=np.float64).reshape(-1, 6)
+
+    def write_npy(tmp):
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+
+    def write_meta(tmp):
+        with open(tmp, "w") as f:
+            json.dump({"params": params, "random_after": random.getstate()}, f)
+
+    if os.path.exists(path + ".json"):
+        os.remove(path + ".json")  # an interrupted write then leaves no match
+    _replace(path + ".npy", write_npy)
+    _replace(path + ".rtree", index.save)
+    _replace(path + ".json", write_meta)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("path", help="cache path without the .npy / .rtree / .json suffix")
+    args = ap.parse_args()
+
+    meta = _read_meta(args.path)
+    if meta is None or not os.path.exists(args.path + ".rtree"):
+        raise SystemExit(f"no cache at {args.path}")
+    obstacles = np.load(args.path + ".npy")
+    index = RTree.load(args.path + ".rtree", mmap=True)
+    print(f"{args.path}: {len(obstacles)} obstacles, {index.dims}D R-tree, "
+          f"height {index.height}, {len(index)} entries")
+    for name, value in meta["params"].items():
+        print(f"  {name} = {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Grid path planning (A* / Theta*) on an occupancy grid built from an obstacle index.
+
+The floor is split into square cells; a cell is blocked when a robot
+standing on its center would come within `clearance` of an obstacle. For an
+RTree the whole grid is rasterised with one RTree.search_batch call; other
+indexes (SpatialHashGrid) are asked cell by cell with query_circle.
+
+A* moves between the 8 neighbouring cells (no cutting blocked corners);
+Theta* additionally links a cell straight to its parent's parent when the
+line between them crosses only free cells, which gives any-angle paths with
+far fewer waypoints. With `hop_range` set, both may also hop: from a free
+cell straight over the blocked cells next to it, in one of the 8
+directions, to the first free cell beyond, when that is at most
+`hop_range` away. A hop costs `hop_cost` length units whatever its length
+(a robot jump takes a fixed time), and route() marks the waypoints reached
+by one. Paths are cached per (start cell, goal cell). When the
+index's `changes` counter moves (an obstacle was inserted or deleted), the
+next plan() or line_of_sight() rasterises the grid again and drops the
+cache; rebuild() does the same on demand.
+"""
+
+import heapq
+import itertools
+import math
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PLANNERS = ("astar", "theta")
+
+Point = Tuple[float, float]
+Waypoint = Tuple[float, float, bool]  # x, z, reached by a hop from the previous one
+
+_SQRT2 = math.sqrt(2.0)
+# (di, dj, cost) of the 8 moves
+_MOVES = ((1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+          (1, 1, _SQRT2), (1, -1, _SQRT2), (-1, 1, _SQRT2), (-1, -1, _SQRT2))
+_BATCH_ROWS = 1 << 16  # cells per search_batch call
+
+
+def blocked_points(index, points: np.ndarray, clearance: float,
+                   span: Optional[Tuple[float, float]] = None) -> np.ndarray:
+    """
+    For each floor point (x, z) of `points`, whether it lies within
+    `clearance` of an obstacle in `index`: one RTree.search_batch call per
+    chunk for an RTree, query_circle per point otherwise. `span` = (y0, y1)
+    is the height range tested against a 3D (x, y, z) index.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    blocked = np.zeros(len(points), dtype=bool)
+    if hasattr(index, "search_batch"):
+        if index.dims == 3:
+            y0, y1 = span if span is not None else (0.0, 0.0)
+            x, z = points[:, :1], points[:, 1:]
+            q = np.hstack([x, np.full_like(x, y0), z, x, np.full_like(x, y1), z])
+        else:
+            q = np.hstack([points, points])
+        for s in range(0, len(q), _BATCH_ROWS):
+            pairs = index.search_batch(q[s:s + _BATCH_ROWS], clearance)
+            blocked[s + pairs[:, 0]] = True
+    else:
+        axes = (0, 2) if index.dims == 3 else None
+        spans = [span] if span is not None else None
+        for k, (x, z) in enumerate(points.tolist()):
+            hits, _, _ = index.query_circle((x, z), clearance, axes=axes, span=spans)
+            blocked[k] = len(hits) > 0
+    return blocked
+
+
+class GridPlanner:
+    """
+    Plans on the floor rectangle `bounds` = (xmin, zmin, xmax, zmax) with
+    cells of `resolution` units. `span` = (y0, y1) is the robot's height
+    range for 3D indexes whose boxes are (x, y, z); 2D indexes hold (x, z).
+    `hop_range` = 0 plans without hops.
+    """
+
+    def __init__(self, index, bounds: Sequence[float], resolution: float = 2.0,
+                 clearance: float = 4.0, span: Optional[Tuple[float, float]] = None,
+                 method: str = "theta", cache_size: int = 4096, hop_range: float = 0.0,
+                 hop_cost: float = 0.0):
+        if method not in PLANNERS:
+            raise ValueError(f"unknown planner {method!r}, expected one of {PLANNERS}")
+        if resolution <= 0.0:
+            raise ValueError(f"resolution must be > 0, got {resolution}")
+        self.index = index
+        self.xmin, self.zmin, xmax, zmax = (float(v) for v in bounds)
+        self.res = float(resolution)
+        self.clearance = float(clearance)
+        self.span = span
+        self.method = method
+        self.cache_size = cache_size
+        self.hop_range = float(hop_range)
+        self.hop_cost = float(hop_cost)
+        self.nx = max(1, math.ceil((xmax - self.xmin) / self.res))
+        self.nz = max(1, math.ceil((zmax - self.zmin) / self.res))
+        self._cache: "OrderedDict[Tuple[int, int], Tuple[Tuple[int, ...], frozenset]]" = \
+            OrderedDict()
+        self._hops: Dict[int, List[int]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rebuild()
+
+    # ---------- occupancy ----------
+
+    def rebuild(self):
+        """Rasterise the obstacles again and drop all cached paths."""
+        self._changes = getattr(self.index, "changes", 0)
+        xs = self.xmin + (np.arange(self.nx) + 0.5) * self.res
+        zs = self.zmin + (np.arange(self.nz) + 0.5) * self.res
+        cx, cz = np.meshgrid(xs, zs, indexing="ij")
+        centers = np.stack([cx.ravel(), cz.ravel()], axis=1)
+        blocked = blocked_points(self.index, centers, self.clearance, self.span)
+        self.blocked = blocked.reshape(self.nx, self.nz)
+        self._free = bytearray((~blocked).astype(np.uint8).tobytes())
+        self._cache.clear()
+        self._hops.clear()
+
+    def cell_of(self, x: float, z: float) -> Tuple[int, int]:
+        i = int((x - self.xmin) // self.res)
+        j = int((z - self.zmin) // self.res)
+        return min(max(i, 0), self.nx - 1), min(max(j, 0), self.nz - 1)
+
+    def center(self, i: int, j: int) -> Point:
+        return self.xmin + (i + 0.5) * self.res, self.zmin + (j + 0.5) * self.res
+
+    def is_free(self, i: int, j: int) -> bool:
+        return 0 <= i < self.nx and 0 <= j < self.nz and bool(self._free[i * self.nz + j])
+
+    def line_of_sight(self, a: Sequence[float], b: Sequence[float]) -> bool:
+        """True when the segment between the cells of points a and b crosses only free cells."""
+        self._sync()
+        i0, j0 = self.cell_of(a[0], a[1])
+        i1, j1 = self.cell_of(b[0], b[1])
+        return self._line_of_sight(i0, j0, i1, j1)
+
+    # ---------- planning ----------
+
+    def plan(self, start: Sequence[float], goal: Sequence[float]) -> Optional[List[Point]]:
+        """
+        Waypoints from `start` to `goal`, without the start and ending with
+        `goal` itself. A start or goal inside a blocked cell is moved to the
+        nearest free cell first. When the goal cannot be reached, the path
+        leads to the reachable cell closest to it (the last leg, to `goal`,
+        then crosses blocked cells); None when the grid has no free cell.
+        """
+        route = self.route(start, goal)
+        return None if route is None else [(x, z) for x, z, _ in route]
+
+    def route(self, start: Sequence[float], goal: Sequence[float]) -> Optional[List[Waypoint]]:
+        """plan() with each waypoint as (x, z, hop): hop when it is reached by a hop."""
+        self._sync()
+        s = self._nearest_free(self.cell_of(start[0], start[1]))
+        g = self._nearest_free(self.cell_of(goal[0], goal[1]))
+        if s is None or g is None:
+            return None
+        key = (s, g)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            cells, hopped = self._cache[key]
+        else:
+            self.cache_misses += 1
+            cells, hopped = self._cache[key] = self._search(s, g)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        nz = self.nz
+        waypoints = [(*self.center(*divmod(c, nz)), c in hopped) for c in cells[1:-1]]
+        waypoints.append((float(goal[0]), float(goal[1]), len(cells) > 1 and cells[-1] in hopped))
+        return waypoints
+
+    def _sync(self):
+        # the index changed since the grid was rasterised
+        if getattr(self.index, "changes", 0) != self._changes:
+            self.rebuild()
+
+    def _hops_from(self, c: int) -> List[int]:
+        # landing cells of the hops from free cell c, found once per grid
+        hops = self._hops.get(c)
+        if hops is not None:
+            return hops
+        hops = []
+        nz = self.nz
+        free = self._free
+        ci, cj = divmod(c, nz)
+        for di, dj, step in _MOVES:
+            reach = int(self.hop_range / (step * self.res))
+            i, j = ci + di, cj + dj
+            k = 1
+            while k <= reach and 0 <= i < self.nx and 0 <= j < nz:
+                if free[i * nz + j]:
+                    if k > 1:
+                        hops.append(i * nz + j)
+                    break
+                i += di
+                j += dj
+                k += 1
+        self._hops[c] = hops
+        return hops
+
+    def _search(self, s: int, g: int) -> Tuple[Tuple[int, ...], frozenset]:
+        # (cells of the path, the cells on it reached by a hop)
+        nz = self.nz
+        nx = self.nx
+        free = self._free
+        theta = self.method == "theta"
+        hop_cost = self.hop_cost / self.res if self.hop_range > 0.0 else None
+        gi, gj = divmod(g, nz)
+
+        def h(c):
+            i, j = divmod(c, nz)
+            return math.hypot(i - gi, j - gj)
+
+        cost = {s: 0.0}
+        parent = {s: s}
+        hopped = set()
+        closed = set()
+        best = s  # closest cell to the goal reached so far
+        tie = itertools.count()
+        heap = [(h(s), next(tie), s)]
+        while heap:
+            _, _, c = heapq.heappop(heap)
+            if c in closed:
+                continue
+            if c == g:
+                break
+            closed.add(c)
+            if h(c) < h(best):
+                best = c
+            ci, cj = divmod(c, nz)
+            p = parent[c]
+            pi, pj = divmod(p, nz)
+            for di, dj, step in _MOVES:
+                ni = ci + di
+                nj = cj + dj
+                if not (0 <= ni < nx and 0 <= nj < nz):
+                    continue
+                n = ni * nz + nj
+                if n in closed or not free[n]:
+                    continue
+                # diagonal moves may not cut the corner of a blocked cell
+                if di and dj and not (free[ci * nz + nj] and free[ni * nz + cj]):
+                    continue
+                # a shortcut past c would skip the hop that reached it
+                if (theta and p != c and c not in hopped
+                        and self._line_of_sight(pi, pj, ni, nj)):
+                    new_cost = cost[p] + math.hypot(ni - pi, nj - pj)
+                    new_parent = p
+                else:
+                    new_cost = cost[c] + step
+                    new_parent = c
+                if new_cost < cost.get(n, math.inf):
+                    cost[n] = new_cost
+                    parent[n] = new_parent
+                    hopped.discard(n)
+                    heapq.heappush(heap, (new_cost + h(n), next(tie), n))
+            if hop_cost is None:
+                continue
+            for n in self._hops_from(c):
+                new_cost = cost[c] + hop_cost
+                if n not in closed and new_cost < cost.get(n, math.inf):
+                    cost[n] = new_cost
+                    parent[n] = c
+                    hopped.add(n)
+                    heapq.heappush(heap, (new_cost + h(n), next(tie), n))
+        if g not in parent:
+            g = best
+        cells = [g]
+        while cells[-1] != s:
+            cells.append(parent[cells[-1]])
+        cells.reverse()
+        hopped = frozenset(c for c in cells if c in hopped)
+        return (tuple(cells) if theta else self._drop_collinear(cells, hopped)), hopped
+
+    def _drop_collinear(self, cells: List[int], hopped: frozenset) -> Tuple[int, ...]:
+        # an A* path keeps only the cells where its direction changes, and
+        # both ends of every hop
+        nz = self.nz
+        if len(cells) < 3:
+            return tuple(cells)
+        out = [cells[0]]
+        for a, b, c in zip(cells, cells[1:], cells[2:]):
+            ai, aj = divmod(a, nz)
+            bi, bj = divmod(b, nz)
+            ci, cj = divmod(c, nz)
+            if (bi - ai, bj - aj) != (ci - bi, cj - bj) or b in hopped or c in hopped:
+                out.append(b)
+        out.append(cells[-1])
+        return tuple(out)
+
+    def _line_of_sight(self, i0: int, j0: int, i1: int, j1: int) -> bool:
+        # every cell the segment between the two cell centers touches is
+        # free (supercover walk); at an exact corner both side cells count
+        free = self._free
+        nz = self.nz
+        di = abs(i1 - i0)
+        dj = abs(j1 - j0)
+        si = 1 if i1 > i0 else -1
+        sj = 1 if j1 > j0 else -1
+        i, j = i0, j0
+        err = di - dj
+        di2 = 2 * di
+        dj2 = 2 * dj
+        n = di + dj
+        while True:
+            if not free[i * nz + j]:
+                return False
+            if n <= 0:
+                return True
+            if err > 0:
+                i += si
+                err -= dj2
+                n -= 1
+            elif err < 0:
+                j += sj
+                err += di2
+                n -= 1
+            else:
+                if not (free[(i + si) * nz + j] and free[i * nz + j + sj]):
+                    return False
+                i += si
+                j += sj
+                err += di2 - dj2
+                n -= 2
+
+    def _nearest_free(self, cell: Tuple[int, int]) -> Optional[int]:
+        # breadth-first search outwards from a blocked cell
+        i, j = cell
+        if self._free[i * self.nz + j]:
+            return i * self.nz + j
+        seen = {cell}
+        queue = deque([cell])
+        while queue:
+            i, j = queue.popleft()
+            for di, dj, _ in _MOVES[:4]:
+                n = (i + di, j + dj)
+                if n in seen or not (0 <= n[0] < self.nx and 0 <= n[1] < self.nz):
+                    continue
+                if self._free[n[0] * self.nz + n[1]]:
+                    return n[0] * self.nz + n[1]
+                seen.add(n)
+                queue.append(n)
+        return None
@@ -0,0 +1,308 @@
+"""Batched NumPy renderer for the axis-aligned boxes of the robot scripts.
+
+draw_box() in the robot scripts rotates and projects the 8 vertices of one
+box in Python (recomputing cos/sin of the camera angles per point) and
+sorts the faces of that box only. BoxRenderer does the same projection for
+all boxes at once: the rotation matrix is built once per frame, every
+vertex goes through one matmul, faces that point away from the camera or
+lie off screen are culled, and the remaining faces of all boxes are depth
+sorted together before they are handed to pygame.
+
+visible_ids() adds view-frustum culling: the floor rectangle under the
+camera's view is computed from the four screen-corner rays and only the
+boxes the obstacle index returns for it are drawn. With `lod_pixels`, a
+box that would appear smaller than that on screen is drawn as a single
+quad.
+
+Usage (timing against the per-box draw_box of robot_1.py):
+    python render_batch.py --boxes 50 1000 5000 --frames 30
+"""
+
+import argparse
+import math
+import time
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+# same vertex order and faces as get_box_vertices / BOX_FACES in the scripts
+BOX_CORNERS = np.array([
+    (-1, -1, -1),
+    (1, -1, -1),
+    (1, 1, -1),
+    (-1, 1, -1),
+    (-1, -1, 1),
+    (1, -1, 1),
+    (1, 1, 1),
+    (-1, 1, 1),
+], dtype=np.float64) / 2.0
+BOX_FACES = np.array([
+    (0, 1, 5, 4),
+    (3, 2, 6, 7),
+    (4, 5, 6, 7),
+    (0, 1, 2, 3),
+    (0, 3, 7, 4),
+    (1, 2, 6, 5),
+], dtype=np.int64)
+# outward normal of each face in BOX_FACES
+FACE_NORMALS = np.array([
+    (0, -1, 0),
+    (0, 1, 0),
+    (0, 0, 1),
+    (0, 0, -1),
+    (-1, 0, 0),
+    (1, 0, 0),
+], dtype=np.float64)
+
+NEAR_Z = 0.1  # project_point clamps the camera-space depth to this
+
+
+def rotation_matrix(angle_x: float, angle_y: float) -> np.ndarray:
+    """3x3 matrix R with R @ p == rotate_point(*p, angle_x, angle_y)."""
+    cx, sx = math.cos(angle_x), math.sin(angle_x)
+    cy, sy = math.cos(angle_y), math.sin(angle_y)
+    rot_x = np.array([[1.0, 0.0, 0.0], [0.0, cx, -sx], [0.0, sx, cx]])
+    rot_y = np.array([[cy, 0.0, sy], [0.0, 1.0, 0.0], [-sy, 0.0, cy]])
+    return rot_y @ rot_x
+
+
+def box_vertices(boxes: np.ndarray) -> np.ndarray:
+    """(n, 8, 3) corners of boxes given as rows (cx, cy, cz, sx, sy, sz)."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 6)
+    return boxes[:, None, :3] + BOX_CORNERS[None, :, :] * boxes[:, None, 3:]
+
+
+def project(points: np.ndarray, fov: float, viewer_distance: float,
+            width: int, height: int) -> np.ndarray:
+    """Vectorised project_point for camera-space points of shape (..., 3): int (..., 2)."""
+    z = np.maximum(points[..., 2] + viewer_distance, NEAR_Z)
+    factor = fov / z
+    out = np.empty(points.shape[:-1] + (2,), dtype=np.float64)
+    out[..., 0] = points[..., 0] * factor + width / 2
+    out[..., 1] = -points[..., 1] * factor + height / 2
+    return out.astype(np.int64)  # int() truncation, like project_point
+
+
+class BoxRenderer:
+    """
+    Draws a fixed set of boxes (rows cx, cy, cz, sx, sy, sz) in one batch.
+    The world-space vertices are computed once; draw() only rotates,
+    projects, culls and sorts. `ids` restricts a frame to a subset.
+    """
+
+    def __init__(self, boxes: Sequence[Sequence[float]], face_color, edge_color=None,
+                 width: int = 600, height: int = 600, fov: float = 500.0,
+                 viewer_distance: float = 150.0, lod_pixels: float = 0.0):
+        self.face_color = face_color
+        self.edge_color = edge_color
+        self.width = width
+        self.height = height
+        self.fov = fov
+        self.viewer_distance = viewer_distance
+        self.lod_pixels = lod_pixels
+        self.set_boxes(boxes)
+
+    def set_boxes(self, boxes: Sequence[Sequence[float]]):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 6)
+        self.vertices = box_vertices(self.boxes)
+        # face centers, used for back-face culling
+        self.face_centers = self.vertices[:, BOX_FACES].mean(axis=2)
+        self.extent = self.boxes[:, 3:].max(axis=1) if len(self.boxes) else np.empty(0)
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def visible_rect(self, angle_x: float, angle_y: float,
+                     y_range: Tuple[float, float] = (0.0, 0.0)):
+        """
+        (xmin, zmin, xmax, zmax) on the floor that contains everything the
+        camera sees between heights y_range[0] and y_range[1], or None when
+        a screen corner looks above the horizon (the view is unbounded).
+        """
+        R = rotation_matrix(angle_x, angle_y)
+        eye = R.T @ np.array([0.0, 0.0, -self.viewer_distance])
+        # one pixel beyond the screen: project() truncates towards zero
+        px = np.array([-1.0, self.width + 1.0, self.width + 1.0, -1.0])
+        py = np.array([-1.0, -1.0, self.height + 1.0, self.height + 1.0])
+        rays = np.stack([(px - self.width / 2) / self.fov,
+                         -(py - self.height / 2) / self.fov,
+                         np.ones(4)], axis=1) @ R  # world-space corner rays
+        hits = []
+        for y in y_range:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = (y - eye[1]) / rays[:, 1]
+            if not np.all(np.isfinite(t) & (t > 0.0)):
+                return None
+            hits.append(eye[[0, 2]] + t[:, None] * rays[:, [0, 2]])
+        hits = np.vstack(hits)
+        lo = hits.min(axis=0)
+        hi = hits.max(axis=0)
+        return float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1])
+
+    def visible_faces(self, angle_x: float, angle_y: float, ids: Optional[np.ndarray] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Screen polygons (f, 4, 2) to draw, back to front, the box index of
+        each polygon and whether it is a level-of-detail quad: a box whose
+        projection is smaller than `lod_pixels` is drawn as the screen
+        rectangle around its 8 vertices instead of up to 3 faces.
+        """
+        if ids is None:
+            ids = np.arange(len(self.boxes))
+        else:
+            ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return np.empty((0, 4, 2), dtype=np.int64), ids, np.empty(0, dtype=bool)
+        R = rotation_matrix(angle_x, angle_y)
+        cam = self.vertices[ids] @ R.T  # (n, 8, 3)
+        vd = self.viewer_distance
+
+        far = np.zeros(len(ids), dtype=bool)
+        if self.lod_pixels > 0.0:
+            depth = cam[..., 2].mean(axis=1) + vd
+            far = (depth > NEAR_Z) & (self.fov * self.extent[ids] < self.lod_pixels * depth)
+        near_rows = np.flatnonzero(~far)
+        far_rows = np.flatnonzero(far)
+
+        # full boxes, with back-face culling: the camera sits at (0, 0, -vd)
+        centers = self.face_centers[ids[near_rows]] @ R.T  # (n, 6, 3)
+        normals = FACE_NORMALS @ R.T  # (6, 3)
+        centers[..., 2] += vd
+        box_of, face_of = np.nonzero(np.einsum("nfk,fk->nf", centers, normals) < 0.0)
+        box_of = near_rows[box_of]
+        quads = cam[box_of[:, None], BOX_FACES[face_of]]  # (f, 4, 3)
+        # faces completely behind the camera cannot be projected sensibly
+        ahead = (quads[..., 2] + vd > NEAR_Z).any(axis=1)
+        quads, box_of = quads[ahead], box_of[ahead]
+        pts = project(quads, self.fov, vd, self.width, self.height)
+        depth = quads[..., 2].mean(axis=1)
+
+        # level of detail: one screen-aligned quad per distant box
+        if len(far_rows):
+            corners = project(cam[far_rows], self.fov, vd, self.width, self.height)
+            lo = corners.min(axis=1)
+            hi = corners.max(axis=1)
+            lod_pts = np.stack([lo, np.stack([hi[:, 0], lo[:, 1]], axis=1),
+                                hi, np.stack([lo[:, 0], hi[:, 1]], axis=1)], axis=1)
+            pts = np.concatenate([pts, lod_pts])
+            depth = np.concatenate([depth, cam[far_rows, :, 2].mean(axis=1)])
+            box_of = np.concatenate([box_of, far_rows])
+        lod = np.zeros(len(pts), dtype=bool)
+        lod[len(pts) - len(far_rows):] = True
+
+        on_screen = ((pts[..., 0].max(axis=1) >= 0) & (pts[..., 0].min(axis=1) < self.width) &
+                     (pts[..., 1].max(axis=1) >= 0) & (pts[..., 1].min(axis=1) < self.height))
+        pts, depth, box_of, lod = pts[on_screen], depth[on_screen], box_of[on_screen], lod[on_screen]
+
+        # painter's algorithm over all boxes: far (large depth) first
+        order = np.argsort(-depth, kind="stable")
+        return pts[order], ids[box_of[order]], lod[order]
+
+    def draw(self, screen, angle_x: float, angle_y: float,
+             ids: Optional[np.ndarray] = None, hide_edges: bool = False) -> int:
+        """Draw the boxes (or the subset `ids`); returns the number of polygons drawn."""
+        import pygame
+
+        pts, _, lod = self.visible_faces(angle_x, angle_y, ids)
+        face_color = self.face_color
+        edge_color = None if hide_edges else self.edge_color
+        polygon = pygame.draw.polygon
+        for quad, simple in zip(pts.tolist(), lod.tolist()):
+            polygon(screen, face_color, quad)
+            if edge_color is not None and not simple:
+                polygon(screen, edge_color, quad, 1)
+        return len(pts)
+
+
+def visible_ids(renderer: BoxRenderer, index, angle_x: float, angle_y: float,
+                y_range: Tuple[float, float] = (0.0, 0.0), make_query=None):
+    """
+    Ids of the boxes the camera can see, from a range query on `index`
+    (RTree / SpatialHashGrid over the box footprints), or None (= draw
+    all) when the view reaches the horizon. `make_query(xmin, zmin, xmax,
+    zmax)` builds the query box; the default is a 2D Rect on (x, z).
+    """
+    rect = renderer.visible_rect(angle_x, angle_y, y_range)
+    if rect is None:
+        return None
+    if make_query is None:
+        from rtree_lib import Rect
+        make_query = Rect
+    return np.array(index.search_range(make_query(*rect)), dtype=np.int64)
+
+
+def main():
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from robot_sim import load_variant
+    from rtree_lib import Rect, RTree
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--boxes", type=int, nargs="+", default=[50, 1000, 5000])
+    ap.add_argument("--frames", type=int, default=30)
+    ap.add_argument("--lod-pixels", type=float, default=6.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    world = load_variant("robot_1")
+    pygame.init()
+    screen = pygame.display.set_mode((world.WIDTH, world.HEIGHT))
+    rng = np.random.default_rng(args.seed)
+    angles = [(-math.radians(90) + 0.015 * i, 0.03 * i) for i in range(args.frames)]
+
+    print(f"frames={args.frames} lod_pixels={args.lod_pixels} (ms per frame)")
+    print(f"{'world':>6} {'boxes':>7} {'draw_box':>10} {'batched':>10} {'culled':>10} "
+          f"{'polys':>7} {'culled polys':>12}")
+    for kind in ("dense", "large"):
+        for n in args.boxes:
+            half = world.FLOOR_SIZE / 2.0
+            if kind == "dense":
+                # robot_1's floor, boxes shrunk so n of them cover it like 50 do
+                scale = math.sqrt(50.0 / n)
+            else:
+                # robot_1's box size and density, floor grown to hold n boxes
+                scale = 1.0
+                half *= math.sqrt(n / 50.0)
+            centers = rng.uniform(-half, half, size=(n, 2))
+            size = 11.5 * scale
+            boxes = [(x, 2.0 * scale, z, size, 4.0 * scale, size) for x, z in centers.tolist()]
+            index = RTree.bulk_load(
+                ((Rect(x - size / 2, z - size / 2, x + size / 2, z + size / 2), i)
+                 for i, (x, z) in enumerate(centers.tolist())), 16, 6)
+            plain = BoxRenderer(boxes, world.COLOR_BOX_FACE, world.COLOR_BOX_EDGE,
+                                world.WIDTH, world.HEIGHT, world.FOV, world.VIEWER_DISTANCE)
+            culled = BoxRenderer(boxes, world.COLOR_BOX_FACE, world.COLOR_BOX_EDGE,
+                                 world.WIDTH, world.HEIGHT, world.FOV, world.VIEWER_DISTANCE,
+                                 lod_pixels=args.lod_pixels)
+
+            # off-screen polygons make pygame slow, so the per-box baseline
+            # only gets a few frames
+            naive_angles = angles[:3]
+            t0 = time.perf_counter()
+            for ax, ay in naive_angles:
+                for b in boxes:
+                    world.draw_box(screen, b, ax, ay, world.COLOR_BOX_FACE, world.COLOR_BOX_EDGE)
+            t_naive = time.perf_counter() - t0
+
+            polys = 0
+            t0 = time.perf_counter()
+            for ax, ay in angles:
+                polys += plain.draw(screen, ax, ay)
+            t_batch = time.perf_counter() - t0
+
+            culled_polys = 0
+            t0 = time.perf_counter()
+            for ax, ay in angles:
+                ids = visible_ids(culled, index, ax, ay, (0.0, 4.0 * scale))
+                culled_polys += culled.draw(screen, ax, ay, ids)
+            t_culled = time.perf_counter() - t0
+            print(f"{kind:>6} {n:>7} {1e3 * t_naive / len(naive_angles):>10.2f} "
+                  f"{1e3 * t_batch / args.frames:>10.2f} {1e3 * t_culled / args.frames:>10.2f} "
+                  f"{polys // args.frames:>7} {culled_polys // args.frames:>12}")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,24 @@ import pygame
 import math
 import random
 import sys
+import argparse
+
+# rekam / replay trace simulasi (kolom .npy di-mmap)
+from sim_trace import ScriptTrace, cli_setup
+# waktu per fase tiap frame + grafik overlay
+from frame_profiler import LoopProfiler, add_cli_args, marker
 
 # ========= CONFIG =========
+_cli = argparse.ArgumentParser(add_help=False)
+# Profiling: --profile tampilkan grafik waktu per fase (toggle tombol P),
+# --profile-out FILE simpan frame terakhir ke .csv atau .json (Chrome trace)
+add_cli_args(_cli)
+# Rekam / replay: --record DIR simpan state tiap frame ke kolom .npy (lihat
+# sim_trace.py), --replay DIR putar ulang rekaman itu (renderer saja, tanpa
+# simulasi); --seed N bikin obstacle & target bisa diulang. cli_setup()
+# juga yang nge-seed `random`
+_args = cli_setup(_cli)
+
 WIDTH, HEIGHT = 600, 600
 BG_COLOR = (10, 10, 15)
 
@@ -339,6 +355,36 @@ def move_towards_target(dt):
         robot_vel[0] = move_x / dt
         robot_vel[1] = move_z / dt
 
+# ========= STEP SIMULASI (DIPAKAI WINDOW & HEADLESS) =========
+def step_simulation(dt, profiler=None):
+    """Satu langkah fisika: gerak ke target, avoid, jump, deteksi stuck.
+    `profiler` (FrameProfiler) mencatat waktu tiap fase kalau diisi."""
+    global idle_time
+    mark = marker(profiler)
+
+    prev_rx, prev_rz = robot_pos[0], robot_pos[1]
+
+    move_towards_target(dt)
+    mark("move")
+    avoid_obstacles(robot_pos, dt)
+    mark("avoid")
+    update_jump(dt)
+    mark("jump")
+
+    # deteksi stuck > 1s → lompat obstacle terdekat (tanpa R-tree cari dengan loop)
+    if not jump_active:
+        moved = math.hypot(robot_pos[0] - prev_rx, robot_pos[1] - prev_rz)
+        if moved < 0.05:
+            idle_time += dt
+        else:
+            idle_time = 0.0
+
+        if idle_time > 1.0:
+            idx = find_nearest_obstacle_idx()
+            start_jump_over_obstacle(idx)
+            idle_time = 0.0
+    mark("stuck")
+
 # ========= DRAW =========
 def draw_floor(screen, angle_x, angle_y):
     corners_world = [
@@ -395,8 +441,6 @@ def draw_target(screen, angle_x, angle_y):
 
 # ========= MAIN LOOP =========
 def main():
-    global idle_time
-
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("3D Robot NO R-tree: Random Obstacles & Targets")
@@ -406,13 +450,23 @@ def main():
     angle_x = -math.radians(90)
     angle_y = 0.0
 
+    # --record: state tiap frame ditulis ke trace; --replay: state robot &
+    # kamera diambil dari trace, step_simulation tidak dipanggil
+    trace = ScriptTrace(_args, globals(), "robot_1", step_simulation)
+
+    # waktu tiap fase frame masuk ring buffer; grafik tampil dengan --profile
+    # atau tombol P, --profile-out menyimpannya waktu keluar
+    profiler = LoopProfiler(_args)
+
     running = True
     while running:
-        dt = clock.tick(60) / 1000.0
+        dt = profiler.tick(clock)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            else:
+                profiler.handle_event(event)
 
         keys = pygame.key.get_pressed()
         if keys[pygame.K_ESCAPE]:
@@ -428,25 +482,13 @@ def main():
 
         max_pitch = math.radians(90)
         angle_x = max(-max_pitch, min(max_pitch, angle_x))
+        profiler.mark("input")
 
-        prev_rx, prev_rz = robot_pos[0], robot_pos[1]
-
-        move_towards_target(dt)
-        avoid_obstacles(robot_pos, dt)
-        update_jump(dt)
-
-        # deteksi stuck > 1s → lompat obstacle terdekat (tanpa R-tree cari dengan loop)
-        if not jump_active:
-            moved = math.hypot(robot_pos[0] - prev_rx, robot_pos[1] - prev_rz)
-            if moved < 0.05:
-                idle_time += dt
-            else:
-                idle_time = 0.0
-
-            if idle_time > 1.0:
-                idx = find_nearest_obstacle_idx()
-                start_jump_over_obstacle(idx)
-                idle_time = 0.0
+        frame = trace.frame(dt, angle_x, angle_y, profiler)
+        if frame is None:
+            break
+        dt, angle_x, angle_y = frame
+        profiler.mark("trace")
 
         # render
         screen.fill(BG_COLOR)
@@ -461,13 +503,17 @@ def main():
 
         msg = (
             "NO R-tree: obstacles & targets random | "
-            "Arrow: rotate | ESC: quit"
+            "Arrow: rotate | ESC: quit | P: profiler"
         )
         text = font.render(msg, True, (230, 230, 230))
         screen.blit(text, (10, 10))
+        profiler.mark("render")
 
-        pygame.display.flip()
+        profiler.overlay(screen, font)
+        profiler.flip()
 
+    trace.close()
+    profiler.close()
     pygame.quit()
     sys.exit()
 
@@ -2,216 +2,47 @@ import pygame
 import math
 import random
 import sys
-from dataclasses import dataclass
-from typing import List, Any, Tuple, Optional
-
-# ===================== R-TREE 2D (X-Z) =====================
-
-@dataclass
-class Rect:
-    xmin: float
-    ymin: float
-    xmax: float
-    ymax: float
-
-    def area(self) -> float:
-        return max(0.0, self.xmax - self.xmin) * max(0.0, self.ymax - self.ymin)
-
-    def union(self, other: "Rect") -> "Rect":
-        return Rect(
-            xmin=min(self.xmin, other.xmin),
-            ymin=min(self.ymin, other.ymin),
-            xmax=max(self.xmax, other.xmax),
-            ymax=max(self.ymax, other.ymax),
-        )
-
-    def enlarge_area_needed(self, other: "Rect") -> float:
-        new_rect = self.union(other)
-        return new_rect.area() - self.area()
-
-    def intersects(self, other: "Rect") -> bool:
-        return not (
-            self.xmax < other.xmin or self.xmin > other.xmax or
-            self.ymax < other.ymin or self.ymin > other.ymax
-        )
-
-
-class RTreeNode:
-    def __init__(self, leaf: bool = True, parent: "RTreeNode" = None):
-        self.leaf = leaf
-        self.entries: List[Tuple[Rect, Any]] = []
-        self.parent: Optional["RTreeNode"] = parent
-
-    def mbr(self) -> Optional[Rect]:
-        if not self.entries:
-            return None
-        r = self.entries[0][0]
-        for rect, _ in self.entries[1:]:
-            r = r.union(rect)
-        return r
-
-
-class RTree:
-    """
-    R-tree sederhana:
-    - index obstacle dengan MBR di bidang XZ
-    - dipakai untuk:
-      * penempatan obstacle tanpa overlap
-      * cek target aman
-      * pruning obstacle sekitar robot
-    """
-
-    def __init__(self, max_entries: int = 8, min_entries: int = 4):
-        assert 1 < min_entries <= max_entries // 2
-        self.M = max_entries
-        self.m = min_entries
-        self.root = RTreeNode(leaf=True)
-
-    def insert(self, rect: Rect, obj: Any):
-        leaf = self._choose_leaf(self.root, rect)
-        leaf.entries.append((rect, obj))
-        self._adjust_tree(leaf)
-
-    def search_range(self, query: Rect) -> List[Any]:
-        res: List[Any] = []
-        self._search_node(self.root, query, res)
-        return res
-
-    # ---------- internal ----------
-
-    def _choose_leaf(self, node: RTreeNode, rect: Rect) -> RTreeNode:
-        if node.leaf:
-            return node
-
-        best_entry = None
-        best_inc = None
-        best_area = None
-
-        for r, child in node.entries:
-            inc = r.enlarge_area_needed(rect)
-            area = r.area()
-            if (best_inc is None or
-                inc < best_inc or
-                (inc == best_inc and area < best_area)):
-                best_inc = inc
-                best_area = area
-                best_entry = (r, child)
-
-        _, child = best_entry
-        return self._choose_leaf(child, rect)
-
-    def _adjust_tree(self, node: RTreeNode):
-        while True:
-            if len(node.entries) > self.M:
-                node, new_node = self._split_node(node)
-
-                if node.parent is None:
-                    new_root = RTreeNode(leaf=False)
-                    node.parent = new_root
-                    new_node.parent = new_root
-                    new_root.entries = [
-                        (node.mbr(), node),
-                        (new_node.mbr(), new_node),
-                    ]
-                    self.root = new_root
-                    return
-                else:
-                    parent = node.parent
-                    for i, (r, ch) in enumerate(parent.entries):
-                        if ch is node:
-                            parent.entries[i] = (node.mbr(), node)
-                            break
-                    parent.entries.append((new_node.mbr(), new_node))
-                    node = parent
-                    continue
-            else:
-                parent = node.parent
-                while parent is not None:
-                    for i, (r, ch) in enumerate(parent.entries):
-                        if ch is node:
-                            parent.entries[i] = (node.mbr(), node)
-                            break
-                    node = parent
-                    parent = node.parent
-                return
-
-    def _split_node(self, node: RTreeNode):
-        entries = list(node.entries)
-        s1, s2 = self._pick_seeds(entries)
-
-        node1 = node
-        node1.entries = [entries[s1]]
-        node2 = RTreeNode(leaf=node.leaf, parent=node.parent)
-        node2.entries = [entries[s2]]
-
-        used = {s1, s2}
-        n = len(entries)
-
-        for i in range(n):
-            if i in used:
-                continue
-
-            rect, obj = entries[i]
-            remaining = n - len(used)
-
-            if len(node1.entries) + remaining == self.m:
-                node1.entries.append((rect, obj))
-                used.add(i)
-                continue
-            if len(node2.entries) + remaining == self.m:
-                node2.entries.append((rect, obj))
-                used.add(i)
-                continue
-
-            m1 = node1.mbr()
-            m2 = node2.mbr()
-            inc1 = m1.enlarge_area_needed(rect)
-            inc2 = m2.enlarge_area_needed(rect)
-
-            if inc1 < inc2:
-                node1.entries.append((rect, obj))
-            elif inc2 < inc1:
-                node2.entries.append((rect, obj))
-            else:
-                if m1.area() < m2.area():
-                    node1.entries.append((rect, obj))
-                else:
-                    node2.entries.append((rect, obj))
-            used.add(i)
-
-        if not node1.leaf:
-            for _, ch in node1.entries:
-                ch.parent = node1
-        if not node2.leaf:
-            for _, ch in node2.entries:
-                ch.parent = node2
-
-        return node1, node2
-
-    def _pick_seeds(self, entries: List[Tuple[Rect, Any]]):
-        max_d = -1.0
-        s1, s2 = 0, 1
-        n = len(entries)
-        for i in range(n):
-            for j in range(i + 1, n):
-                r1 = entries[i][0]
-                r2 = entries[j][0]
-                u = r1.union(r2)
-                d = u.area() - r1.area() - r2.area()
-                if d > max_d:
-                    max_d = d
-                    s1, s2 = i, j
-        return s1, s2
-
-    def _search_node(self, node: RTreeNode, query: Rect, res: List[Any]):
-        for rect, child in node.entries:
-            if rect.intersects(query):
-                if node.leaf:
-                    res.append(child)
-                else:
-                    self._search_node(child, query, res)
+import argparse
+
+import numpy as np
+
+# R-tree 3D (X, Y, Z): Box & RTree dari rtree_lib.py
+from rtree_lib import Box, RTree
+from spatial_hash import SpatialHashGrid
+# renderer batch NumPy: semua obstacle diproyeksikan sekaligus
+from render_batch import BoxRenderer, visible_ids
+# A*/Theta* di occupancy grid yang dibangun dari index obstacle
+from path_planner import GridPlanner
+# target acak dari mask free space yang di-rasterisasi sekali (tanpa retry)
+from free_space import FreeSpaceSampler
+# rekam / replay trace simulasi (kolom .npy di-mmap)
+from sim_trace import ScriptTrace, cli_setup
+# waktu per fase tiap frame + grafik overlay
+from frame_profiler import LoopProfiler, add_cli_args, marker
+# layout obstacle Poisson-disk (grid Bridson-style) + kotak index-nya
+from poisson_disk import obstacle_layout, obstacle_boxes
+# cache map obstacle + R-tree di disk, di-key pakai parameter generate-nya
+from obstacle_cache import cache_params, load_obstacle_cache, save_obstacle_cache
 
 # ========= CONFIG =========
+# Index obstacle dipilih lewat flag: --index rtree (default) atau --index grid
+# (spatial hash 3D; cocok karena semua obstacle ukurannya sama)
+_cli = argparse.ArgumentParser(add_help=False)
+_cli.add_argument("--index", choices=("rtree", "grid"), default="rtree")
+# Path planning: --planner astar (default), theta, atau none (lurus ke target,
+# lompat setelah nabrak / diam)
+_cli.add_argument("--planner", choices=("none", "astar", "theta"), default="astar")
+# Profiling: --profile tampilkan grafik waktu per fase (toggle tombol P),
+# --profile-out FILE simpan frame terakhir ke .csv atau .json (Chrome trace)
+add_cli_args(_cli)
+# Rekam / replay: --record DIR simpan state tiap frame ke kolom .npy (lihat
+# sim_trace.py), --replay DIR putar ulang rekaman itu (renderer saja, tanpa
+# simulasi); --seed N bikin obstacle & target bisa diulang. cli_setup()
+# juga yang nge-seed `random`
+_args = cli_setup(_cli)
+OBSTACLE_INDEX = _args.index
+PLANNER = _args.planner
+
 WIDTH, HEIGHT = 600, 600
 BG_COLOR = (10, 10, 15)
 
@@ -219,6 +50,8 @@ FOV = 500
 VIEWER_DISTANCE = 150
 FLOOR_SIZE = 180
 ROT_SPEED = 1.8
+# obstacle yang di layar lebih kecil dari ini (pixel) digambar 1 quad saja
+LOD_PIXELS = 6.0
 
 COLOR_FLOOR = (255, 255, 255)
 COLOR_BOX_FACE = (255, 0, 0)
@@ -237,6 +70,16 @@ JUMP_DURATION = 1.0
 JUMP_HEIGHT = 15.0
 BOUNCE_MULTIPLIER = 1.3
 
+# grid planner: ukuran sel & jarak aman pusat robot dari obstacle. Planner
+# juga boleh merencanakan lompatan (hop) lewat obstacle sampai PLAN_HOP_RANGE;
+# biayanya = jarak jalan selama satu lompatan
+PLAN_RESOLUTION = 2.0
+PLAN_CLEARANCE = ROBOT_RADIUS + 0.5
+PLAN_HOP_RANGE = 30.0
+
+# ukuran sel mask free space untuk memilih target
+TARGET_RESOLUTION = 1.0
+
 BOX_FACES = [
     (0, 1, 5, 4),
     (3, 2, 6, 7),
@@ -290,91 +133,107 @@ def should_hide_edges(angle_x, angle_y):
     deg_y = math.degrees(angle_y)
     return abs(abs(deg_x) - 90.0) < 0.5 and abs(deg_y) < 0.5
 
-# ========= OBSTACLES (PAKAI R-TREE, TANPA OVERLAP) =========
+def robot_query_box(x, z, half_xz, y=0.0):
+    """Box 3D (X, Y, Z) di sekitar robot: XZ +- half_xz, tinggi ROBOT_HEIGHT mulai dari y."""
+    return Box.from_min_max((x - half_xz, y, z - half_xz),
+                            (x + half_xz, y + ROBOT_HEIGHT, z + half_xz))
+
+# ========= OBSTACLES (PAKAI R-TREE 3D, TANPA OVERLAP) =========
 
 num_obstacles = 50
 obstacles = []
-obstacle_index = RTree(max_entries=8, min_entries=4)
 
 sx = 11.5
 sz = 11.5
 sy = 4.0
 
+def make_obstacle_index():
+    """Index 3D kosong sesuai OBSTACLE_INDEX; sel grid = ukuran obstacle."""
+    if OBSTACLE_INDEX == "grid":
+        return SpatialHashGrid(cell_size=max(sx, sz), dims=3)
+    return RTree(max_entries=8, min_entries=4, dims=3)
+
+def build_obstacle_index(obstacles):
+    """Index berisi semua obstacle: R-tree di-bulk-load (STR), grid di-insert."""
+    boxes = obstacle_boxes(obstacles)
+    if OBSTACLE_INDEX == "rtree":
+        return RTree.bulk_load_arrays(boxes, max_entries=8, min_entries=4)
+    index = make_obstacle_index()
+    for i, b in enumerate(boxes):
+        index.insert(Box(b), i)
+    return index
+
 half_box_xz = max(sx, sz) / 2.0
 min_pos = -half_floor + half_box_xz
 max_pos =  half_floor - half_box_xz
 
-max_attempts_per_obstacle = 100
-margin = 1.0  # jarak minimal antar obstacle (sedikit ruang)
-
-for _ in range(num_obstacles):
-    placed = False
-    for _try in range(max_attempts_per_obstacle):
-        cx = random.uniform(min_pos, max_pos)
-        cz = random.uniform(min_pos, max_pos)
-        cy = sy / 2.0
-
-        # bounding box + margin supaya tidak saling nempel
-        rect = Rect(
-            cx - sx / 2.0 - margin,
-            cz - sz / 2.0 - margin,
-            cx + sx / 2.0 + margin,
-            cz + sz / 2.0 + margin,
-        )
-
-        # cek ke R-tree: kalau ada yang intersect, berarti tabrakan -> cari lagi
-        candidates = obstacle_index.search_range(rect)
-        if candidates:
-            continue
-
-        # aman: simpan obstacle & masukin ke R-tree
-        idx = len(obstacles)
-        obstacles.append((cx, cy, cz, sx, sy, sz))
-        obstacle_index.insert(rect, idx)
-        placed = True
-        break
-
-    if not placed:
-        # kalau gagal terus, obstacle ini diskip; environment jadi sedikit lebih kosong
-        pass
+margin = 1.0  # jarak minimal antar obstacle = 2 * margin (sedikit ruang)
+
+# Map + R-tree di-cache ke disk (lihat obstacle_cache.py); dipakai lagi cuma
+# kalau parameter di bawah + state `random` sama, None = selalu generate
+OBSTACLE_CACHE = "robot_3_obstacles"
+
+obstacle_params = cache_params(num_obstacles=num_obstacles, size=(sx, sy, sz),
+                               bounds=(min_pos, max_pos), layout="poisson",
+                               margin=margin, max_entries=8, min_entries=4)
+cached = load_obstacle_cache(OBSTACLE_CACHE, OBSTACLE_INDEX, obstacle_params)
+if cached is not None:
+    obstacles, obstacle_index = cached
+else:
+    # Poisson-disk: tiap sel grid (sisi = ukuran obstacle + 2*margin) isi max
+    # 1 obstacle, jadi tidak ada overlap dan tidak ada obstacle yang ke-skip
+    # seperti rejection sampling; seed diambil dari `random` supaya ikut seed sim
+    rng = np.random.default_rng(random.getrandbits(64))
+    layout = obstacle_layout(num_obstacles, (min_pos, min_pos, max_pos, max_pos),
+                             max(sx, sz), sy, 2 * margin, rng)
+    obstacles = [tuple(o) for o in layout.tolist()]
+    obstacle_index = build_obstacle_index(obstacles)
+
+    save_obstacle_cache(OBSTACLE_CACHE, OBSTACLE_INDEX, obstacle_params,
+                        obstacles, obstacle_index)
+
+# query frustum di index 3D: kotak (x, 0..sy, z)
+def view_query(xmin, zmin, xmax, zmax):
+    return Box.from_min_max((xmin, 0.0, zmin), (xmax, sy, zmax))
 
 # ========= HELPERS BERBASIS R-TREE =========
 
-def random_pos_on_floor(margin=20.0):
-    return (
-        random.uniform(-half_floor + margin, half_floor - margin),
-        random.uniform(-half_floor + margin, half_floor - margin),
-    )
-
-def position_collides_obstacles(x, z, radius) -> bool:
-    """Cek lingkaran (x,z,radius) vs obstacle pakai R-tree."""
-    query = Rect(x - radius, z - radius, x + radius, z + radius)
-    candidates = obstacle_index.search_range(query)
-    for idx in candidates:
-        cx, cy, cz, sx, sy, sz = obstacles[idx]
-        halfx = sx / 2.0
-        halfz = sz / 2.0
-        closest_x = max(cx - halfx, min(x, cx + halfx))
-        closest_z = max(cz - halfz, min(z, cz + halfz))
-        dx = x - closest_x
-        dz = z - closest_z
-        if dx * dx + dz * dz < radius * radius:
-            return True
-    return False
-
-def choose_target_not_touching():
-    """Pilih target baru yang tidak menyinggung obstacle (pakai R-tree)."""
-    for _ in range(1000):
-        x, z = random_pos_on_floor(20.0)
-        if not position_collides_obstacles(x, z, ROBOT_RADIUS + 2.0):
-            return [x, z]
-    return [0.0, 0.0]
+def position_collides_obstacles(x, z, radius, y=0.0) -> bool:
+    """Cek robot (lingkaran x,z,radius; tinggi mulai dari y) vs obstacle pakai R-tree 3D;
+    berhenti di hit pertama."""
+    return obstacle_index.any_in_circle((x, z), radius, axes=(0, 2),
+                                        span=[(y, y + ROBOT_HEIGHT)])
+
+def robot_query_circle(x, z, radius, y=0.0):
+    """Filter + refine di R-tree: lingkaran di XZ, tinggi ROBOT_HEIGHT mulai dari y.
+    Return (idx, jarak, normal XZ) urut dari obstacle terdekat."""
+    return obstacle_index.query_circle((x, z), radius, axes=(0, 2),
+                                       span=[(y, y + ROBOT_HEIGHT)])
+
+# free space (jarak >= ROBOT_RADIUS + 2 dari obstacle) di-rasterisasi sekali,
+# dan otomatis diulang kalau obstacle_index berubah (insert / delete).
+# Keterhubungan dihitung di seluruh lantai yang bisa dilewati robot, target
+# cuma diambil di dalam margin 20; kalau robot ada di kantong kecil, target
+# diambil dari seluruh free space
+target_sampler = FreeSpaceSampler(obstacle_index,
+                                  (-half_floor + 20.0, -half_floor + 20.0,
+                                   half_floor - 20.0, half_floor - 20.0),
+                                  ROBOT_RADIUS + 2.0, TARGET_RESOLUTION,
+                                  span=(0.0, ROBOT_HEIGHT),
+                                  floor=(-half_floor + ROBOT_RADIUS, -half_floor + ROBOT_RADIUS,
+                                         half_floor - ROBOT_RADIUS, half_floor - ROBOT_RADIUS))
+
+def choose_target_not_touching(near=None):
+    """Pilih target baru yang tidak menyinggung obstacle (O(1), tanpa retry).
+    Dengan `near`, target ada di free space yang tersambung ke titik itu."""
+    x, z = target_sampler.sample(random, near)
+    return [x, z]
 
 def find_nearest_obstacle_idx():
     """Cari obstacle terdekat dari robot (pakai R-tree untuk pruning)."""
     rx, rz = robot_pos
     sense = 60.0
-    query = Rect(rx - sense, rz - sense, rx + sense, rz + sense)
+    query = robot_query_box(rx, rz, sense)
     candidates = obstacle_index.search_range(query)
     if not candidates:
         candidates = list(range(len(obstacles)))
@@ -395,7 +254,7 @@ robot_pos = [-half_floor + 20.0, -half_floor + 20.0]
 if position_collides_obstacles(robot_pos[0], robot_pos[1], ROBOT_RADIUS + 2.0):
     robot_pos = choose_target_not_touching()
 
-target_pos = choose_target_not_touching()
+target_pos = choose_target_not_touching(robot_pos)
 
 collision_counts = [0] * max(1, len(obstacles))
 collision_active = [False] * max(1, len(obstacles))
@@ -409,11 +268,41 @@ jump_y_offset = 0.0
 robot_vel = [0.0, 0.0]
 idle_time = 0.0  # untuk deteksi diam > 1s
 
+# ========= PATH PLANNING (GRID DARI INDEX) =========
+# occupancy grid di-rasterisasi dari obstacle_index, robot jalan lewat
+# waypoint A*/Theta*; path di-cache per (sel start, sel goal), grid & cache
+# otomatis dibangun ulang kalau obstacle_index berubah
+path_planner = None
+if PLANNER != "none":
+    path_planner = GridPlanner(obstacle_index,
+                               (-half_floor, -half_floor, half_floor, half_floor),
+                               PLAN_RESOLUTION, PLAN_CLEARANCE, method=PLANNER,
+                               span=(0.0, ROBOT_HEIGHT), hop_range=PLAN_HOP_RANGE,
+                               hop_cost=ROBOT_SPEED * JUMP_DURATION)
+path_waypoints = []
+
+def replan():
+    """Hitung ulang waypoint robot -> target (kosong = lurus ke target)."""
+    global path_waypoints
+    path_waypoints = []
+    if path_planner is not None:
+        path_waypoints = path_planner.route(robot_pos, target_pos) or []
+
+replan()
+
 # ========= JUMP =========
 
-def start_jump_over_obstacle(idx):
+def start_jump_to(x, z):
+    """Lompat dari posisi robot ke (x, z) (di-clamp ke lantai) selama JUMP_DURATION."""
     global jump_active, jump_t, jump_start, jump_end
 
+    jump_start = [robot_pos[0], robot_pos[1]]
+    jump_end = [max(-half_floor + ROBOT_RADIUS, min(half_floor - ROBOT_RADIUS, x)),
+                max(-half_floor + ROBOT_RADIUS, min(half_floor - ROBOT_RADIUS, z))]
+    jump_active = True
+    jump_t = 0.0
+
+def start_jump_over_obstacle(idx):
     if idx is None or idx < 0 or idx >= len(obstacles):
         return
 
@@ -442,13 +331,7 @@ def start_jump_over_obstacle(idx):
     new_x = cx + dx * jump_dist
     new_z = cz + dz * jump_dist
 
-    new_x = max(-half_floor + ROBOT_RADIUS, min(half_floor - ROBOT_RADIUS, new_x))
-    new_z = max(-half_floor + ROBOT_RADIUS, min(half_floor - ROBOT_RADIUS, new_z))
-
-    jump_start = [rx, rz]
-    jump_end = [new_x, new_z]
-    jump_active = True
-    jump_t = 0.0
+    start_jump_to(new_x, new_z)
 
     if 0 <= idx < len(collision_counts):
         collision_counts[idx] = 0
@@ -468,6 +351,7 @@ def update_jump(dt):
         robot_pos[0], robot_pos[1] = jump_end
         jump_active = False
         jump_y_offset = 0.0
+        replan()
     else:
         robot_pos[0] = (1 - t) * jump_start[0] + t * jump_end[0]
         robot_pos[1] = (1 - t) * jump_start[1] + t * jump_end[1]
@@ -487,37 +371,14 @@ def avoid_obstacles(robot_pos, dt):
     sense_radius = 30.0
     avoid_radius = 18.0
 
-    query = Rect(rx - sense_radius, rz - sense_radius,
-                 rx + sense_radius, rz + sense_radius)
-    candidate_ids = obstacle_index.search_range(query)
+    # pruning 3D: obstacle di bawah robot (saat masih melayang) tidak ikut
+    # jarak + normal kontak langsung dari R-tree (refine vektor per level)
+    hit_ids, hit_dist, hit_normals = robot_query_circle(rx, rz, sense_radius, jump_y_offset)
 
-    for idx in candidate_ids:
+    for idx, dist, (nx, nz) in zip(hit_ids.tolist(), hit_dist.tolist(), hit_normals.tolist()):
         if idx < 0 or idx >= len(obstacles):
             continue
 
-        cx, cy, cz, sx, sy, sz = obstacles[idx]
-        halfx = sx / 2.0
-        halfz = sz / 2.0
-
-        closest_x = max(cx - halfx, min(rx, cx + halfx))
-        closest_z = max(cz - halfz, min(rz, cz + halfz))
-
-        dx = rx - closest_x
-        dz = rz - closest_z
-        dist_sq = dx * dx + dz * dz
-
-        if dist_sq == 0.0:
-            dx = rx - cx
-            dz = rz - cz
-            dist_sq = dx * dx + dz * dz
-        if dist_sq == 0.0:
-            dx, dz = 1.0, 0.0
-            dist_sq = 1.0
-
-        dist = math.sqrt(dist_sq)
-        nx = dx / dist
-        nz = dz / dist
-
         # tabrakan keras: resolve + bounce
         if dist < r:
             if not collision_active[idx]:
@@ -566,6 +427,36 @@ def move_towards_target(dt):
     rx, rz = robot_pos
     tx, tz = target_pos
 
+    # ikuti waypoint planner dulu; waypoint terakhir = target itu sendiri.
+    # waypoint dilewati kalau sudah dekat, atau kalau waypoint berikutnya
+    # sudah kelihatan langsung (robot sempat terdorong keluar jalur)
+    while len(path_waypoints) > 1 and not path_waypoints[0][2] and (
+            math.hypot(path_waypoints[0][0] - rx, path_waypoints[0][1] - rz) < 1.5
+            or path_planner.line_of_sight(robot_pos, path_waypoints[1])):
+        path_waypoints.pop(0)
+    # waypoint hasil hop: lompat ke sana (langsung, tanpa nabrak dulu),
+    # kecuali jalannya sudah bebas
+    if path_waypoints and path_waypoints[0][2]:
+        wx, wz, _ = path_waypoints[0]
+        if path_planner.line_of_sight(robot_pos, (wx, wz)):
+            path_waypoints[0] = (wx, wz, False)
+        else:
+            path_waypoints.pop(0)
+            start_jump_to(wx, wz)
+            return
+    if len(path_waypoints) > 1:
+        wx, wz, _ = path_waypoints[0]
+        dist = math.hypot(wx - rx, wz - rz)
+        step = min(ROBOT_SPEED * dt, dist)
+        move_x = (wx - rx) / dist * step
+        move_z = (wz - rz) / dist * step
+        robot_pos[0] += move_x
+        robot_pos[1] += move_z
+        if dt > 0:
+            robot_vel[0] = move_x / dt
+            robot_vel[1] = move_z / dt
+        return
+
     dx = tx - rx
     dz = tz - rz
     dist = math.hypot(dx, dz)
@@ -573,7 +464,8 @@ def move_towards_target(dt):
 
     if dist < reach_eps:
         robot_pos[0], robot_pos[1] = tx, tz
-        target_pos = choose_target_not_touching()
+        target_pos = choose_target_not_touching(robot_pos)
+        replan()
         robot_vel = [0.0, 0.0]
         return
 
@@ -583,7 +475,8 @@ def move_towards_target(dt):
         move_x = dx
         move_z = dz
         robot_pos[0], robot_pos[1] = tx, tz
-        target_pos = choose_target_not_touching()
+        target_pos = choose_target_not_touching(robot_pos)
+        replan()
     else:
         nx = dx / dist
         nz = dz / dist
@@ -596,6 +489,37 @@ def move_towards_target(dt):
         robot_vel[0] = move_x / dt
         robot_vel[1] = move_z / dt
 
+# ========= STEP SIMULASI (DIPAKAI WINDOW & HEADLESS) =========
+
+def step_simulation(dt, profiler=None):
+    """Satu langkah fisika: gerak ke target, avoid, jump, deteksi stuck.
+    `profiler` (FrameProfiler) mencatat waktu tiap fase kalau diisi."""
+    global idle_time
+    mark = marker(profiler)
+
+    prev_rx, prev_rz = robot_pos[0], robot_pos[1]
+
+    move_towards_target(dt)
+    mark("move")
+    avoid_obstacles(robot_pos, dt)
+    mark("avoid")
+    update_jump(dt)
+    mark("jump")
+
+    # deteksi stuck: kalau hampir tidak gerak > 1 detik → lompat
+    if not jump_active:
+        moved = math.hypot(robot_pos[0] - prev_rx, robot_pos[1] - prev_rz)
+        if moved < 0.05:
+            idle_time += dt
+        else:
+            idle_time = 0.0
+
+        if idle_time > 1.0:
+            idx = find_nearest_obstacle_idx()
+            start_jump_over_obstacle(idx)
+            idle_time = 0.0
+    mark("stuck")
+
 # ========= DRAW =========
 
 def draw_floor(screen, angle_x, angle_y):
@@ -654,8 +578,6 @@ def draw_target(screen, angle_x, angle_y):
 # ========= MAIN LOOP =========
 
 def main():
-    global idle_time
-
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption(
@@ -664,16 +586,32 @@ def main():
     clock = pygame.time.Clock()
     font = pygame.font.SysFont("consolas", 14)
 
+    # obstacle statis: vertex dihitung sekali, tiap frame cuma rotasi
+    # (satu matmul), back-face culling, dan sort depth semua face
+    obstacle_renderer = BoxRenderer(obstacles, COLOR_BOX_FACE, COLOR_BOX_EDGE,
+                                    WIDTH, HEIGHT, FOV, VIEWER_DISTANCE, LOD_PIXELS)
+
     angle_x = -math.radians(90)
     angle_y = 0.0
 
+    # --record: state tiap frame ditulis ke trace; --replay: state robot &
+    # kamera diambil dari trace, step_simulation tidak dipanggil
+    trace = ScriptTrace(_args, globals(), "robot_3", step_simulation,
+                        ["--index", OBSTACLE_INDEX, "--planner", PLANNER])
+
+    # waktu tiap fase frame masuk ring buffer; grafik tampil dengan --profile
+    # atau tombol P, --profile-out menyimpannya waktu keluar
+    profiler = LoopProfiler(_args)
+
     running = True
     while running:
-        dt = clock.tick(60) / 1000.0
+        dt = profiler.tick(clock)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            else:
+                profiler.handle_event(event)
 
         keys = pygame.key.get_pressed()
         if keys[pygame.K_ESCAPE]:
@@ -689,37 +627,29 @@ def main():
 
         max_pitch = math.radians(90)
         angle_x = max(-max_pitch, min(max_pitch, angle_x))
+        profiler.mark("input")
 
-        prev_rx, prev_rz = robot_pos[0], robot_pos[1]
-
-        move_towards_target(dt)
-        avoid_obstacles(robot_pos, dt)
-        update_jump(dt)
-
-        # deteksi stuck: kalau hampir tidak gerak > 1 detik → lompat
-        if not jump_active:
-            moved = math.hypot(robot_pos[0] - prev_rx, robot_pos[1] - prev_rz)
-            if moved < 0.05:
-                idle_time += dt
-            else:
-                idle_time = 0.0
-
-            if idle_time > 1.0:
-                idx = find_nearest_obstacle_idx()
-                start_jump_over_obstacle(idx)
-                idle_time = 0.0
+        frame = trace.frame(dt, angle_x, angle_y, profiler)
+        if frame is None:
+            break
+        dt, angle_x, angle_y = frame
+        profiler.mark("trace")
 
         # render
         screen.fill(BG_COLOR)
         draw_floor(screen, angle_x, angle_y)
-        for obs in obstacles:
-            draw_box(screen, obs, angle_x, angle_y,
-                     COLOR_BOX_FACE, COLOR_BOX_EDGE)
+        # cuma obstacle di bawah view frustum: area lantai yang terlihat
+        # dihitung dari 4 sudut layar, lalu di-query ke index
+        # (None = horizon kelihatan -> gambar semua)
+        visible = visible_ids(obstacle_renderer, obstacle_index, angle_x, angle_y,
+                              (0.0, sy), view_query)
+        obstacle_renderer.draw(screen, angle_x, angle_y, visible,
+                               hide_edges=should_hide_edges(angle_x, angle_y))
         draw_robot(screen, angle_x, angle_y)
         draw_target(screen, angle_x, angle_y)
 
         msg = (
-            "Arrow: rotate | ESC: quit | "
+            "Arrow: rotate | ESC: quit | P: profiler | "
             "Obstacles: non-overlap via R-tree | "
             "Target: safe via R-tree | "
             "Avoid: R-tree radius + bounce | "
@@ -727,9 +657,13 @@ def main():
         )
         text = font.render(msg, True, (230, 230, 230))
         screen.blit(text, (10, 10))
+        profiler.mark("render")
 
-        pygame.display.flip()
+        profiler.overlay(screen, font)
+        profiler.flip()
 
+    trace.close()
+    profiler.close()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,153 @@
+"""Headless, fixed-timestep runner for the robot scripts.
+
+Each robot script keeps its world in module globals and, in its window,
+advances it with `step_simulation(dt)` once per frame at a 60 FPS cap.
+RobotSim loads a fresh copy of a script (no display needed), seeds the
+`random` module the script uses for obstacles and targets, and calls
+`step_simulation` with a fixed dt as fast as the CPU allows, so the
+naive and indexed variants can be benchmarked and regression-tested in
+batch. Each run also reports how far the robot got from its start, and
+main() flags a run that never left START_AREA around it (targets drawn
+inside a pocket count as reached without the robot moving).
+
+Usage:
+    python robot_sim.py --variants robot_1 robot_2 robot_3 --steps 20000
+    python robot_sim.py --variants robot_3 --index grid --seed 7
+    python robot_sim.py --variants robot_2 robot_3 --planner none
+"""
+
+import argparse
+import importlib.util
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Optional, Sequence
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VARIANTS = ("robot_1", "robot_2", "robot_3")
+START_AREA = 20.0  # radius around the start a run is expected to leave
+
+_load_ids = itertools.count()
+
+
+def load_variant(variant: str, argv: Sequence[str] = ()) -> ModuleType:
+    """Execute robot script `variant` as a new, independent module."""
+    if variant not in VARIANTS:
+        raise ValueError(f"unknown variant {variant!r}, expected one of {VARIANTS}")
+    path = os.path.join(HERE, variant + ".py")
+    spec = importlib.util.spec_from_file_location(f"_{variant}_sim{next(_load_ids)}", path)
+    module = importlib.util.module_from_spec(spec)
+    saved_argv = sys.argv
+    sys.argv = [path, *argv]  # the scripts read their flags at import time
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.argv = saved_argv
+    return module
+
+
+@dataclass
+class SimReport:
+    variant: str
+    steps: int
+    sim_seconds: float
+    wall_seconds: float
+    targets_reached: int
+    collisions: int
+    jumps: int
+    farthest: float  # largest distance of the robot from its start
+
+    @property
+    def steps_per_sec(self) -> float:
+        return self.steps / self.wall_seconds if self.wall_seconds > 0 else float("inf")
+
+
+class RobotSim:
+    """One robot world advanced with a fixed timestep, without rendering."""
+
+    def __init__(self, variant: str = "robot_3", seed: int = 0, dt: float = 1.0 / 60.0,
+                 argv: Sequence[str] = ()):
+        if dt <= 0.0:
+            raise ValueError(f"dt must be > 0, got {dt}")
+        self.variant = variant
+        self.seed = seed
+        self.dt = dt
+        random.seed(seed)
+        self.world = load_variant(variant, argv)
+        self.start = tuple(self.world.robot_pos)
+        self.farthest = 0.0
+        self.steps = 0
+        self.targets_reached = 0
+        self.collisions = 0
+        self.jumps = 0
+
+    def step(self, dt: Optional[float] = None):
+        """One step of `dt` seconds (default: the fixed timestep)."""
+        w = self.world
+        target = w.target_pos
+        was_jumping = w.jump_active
+        was_hit = list(w.collision_active)
+
+        w.step_simulation(self.dt if dt is None else dt)
+
+        self.steps += 1
+        if w.target_pos is not target:
+            self.targets_reached += 1
+        if w.jump_active and not was_jumping:
+            self.jumps += 1
+        # new contacts only: an obstacle counts again after the robot left it
+        self.collisions += sum(1 for a, b in zip(was_hit, w.collision_active) if b and not a)
+        x, z = w.robot_pos
+        d = math.hypot(x - self.start[0], z - self.start[1])
+        if d > self.farthest:
+            self.farthest = d
+
+    def run(self, steps: int) -> SimReport:
+        t0 = time.perf_counter()
+        for _ in range(steps):
+            self.step()
+        wall = time.perf_counter() - t0
+        return SimReport(self.variant, steps, steps * self.dt, wall,
+                         self.targets_reached, self.collisions, self.jumps, self.farthest)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    ap.add_argument("--steps", type=int, default=20000)
+    ap.add_argument("--dt", type=float, default=1.0 / 60.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--index", choices=("rtree", "grid"), default="rtree",
+                    help="obstacle index for robot_2 / robot_3")
+    ap.add_argument("--planner", choices=("none", "astar", "theta"), default="astar",
+                    help="path planner for robot_2 / robot_3 (none = steer straight)")
+    args = ap.parse_args()
+
+    print(f"steps={args.steps} dt={args.dt:.5f} seed={args.seed} index={args.index} "
+          f"planner={args.planner}")
+    print(f"{'variant':>8} {'steps/s':>10} {'sim s':>8} {'targets':>8} "
+          f"{'collisions':>10} {'jumps':>6} {'farthest':>8}")
+    for variant in args.variants:
+        sim = RobotSim(variant, seed=args.seed, dt=args.dt,
+                       argv=["--index", args.index, "--planner", args.planner])
+        rep = sim.run(args.steps)
+        print(f"{rep.variant:>8} {rep.steps_per_sec:>10.0f} {rep.sim_seconds:>8.1f} "
+              f"{rep.targets_reached:>8} {rep.collisions:>10} {rep.jumps:>6} "
+              f"{rep.farthest:>8.1f}")
+        if rep.farthest < START_AREA:
+            print(f"{'':>8} never left the {START_AREA:g} area around its start "
+                  f"{tuple(round(v, 1) for v in sim.start)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Headless multi-robot swarm: thousands of robots in NumPy arrays.
+
+The world is the one from robot_2.py (random 11.5 x 11.5 obstacles on a
+square floor, robots of radius 4 driving to random targets). The floor
+and obstacle count grow with the number of robots so that density stays
+comparable. Every tick is computed for all robots at once:
+
+- move towards target, with a new target (clear of obstacles) on arrival
+- obstacle avoidance: one batched R-tree query (`RTree.search_batch`) for
+  all sensing circles, then the closest-point distance, hard-collision
+  push-out, velocity bounce and soft repulsion of `avoid_obstacles` as
+  array operations
+- robot-robot separation: the robots' own R-tree is rebuilt every tick
+  (`RTree.bulk_load`) and self-joined (`RTree.join`) to find pairs closer
+  than two radii, which are pushed apart
+- clamp to the floor
+
+Jumps and stuck detection of the single-robot scripts are left out.
+
+Usage:
+    python robot_swarm.py --robots 100 1000 5000 --ticks 200
+"""
+
+import argparse
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+
+import numpy as np
+
+from rtree_lib import Rect, RTree
+
+# same behaviour constants as robot_2.py
+ROBOT_RADIUS = 4.0
+ROBOT_SPEED = 12.0
+AVOID_STRENGTH = 80.0
+BOUNCE_MULTIPLIER = 1.3
+SENSE_RADIUS = 30.0
+AVOID_RADIUS = 18.0
+REACH_EPS = 1.5
+OBSTACLE_SIZE = 11.5
+
+# robot_2.py: 50 obstacles on a 180 x 180 floor
+BASE_FLOOR = 180.0
+BASE_OBSTACLES = 50
+FLOOR_PER_ROBOT = 12.0  # floor side grows with sqrt(robots) * this
+
+
+@dataclass
+class SwarmReport:
+    robots: int
+    ticks: int
+    wall_seconds: float
+    targets_reached: int
+    collisions: int
+    robot_contacts: int
+    phase_seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ticks_per_sec(self) -> float:
+        return self.ticks / self.wall_seconds if self.wall_seconds > 0 else float("inf")
+
+    @property
+    def robot_steps_per_sec(self) -> float:
+        return self.ticks_per_sec * self.robots
+
+
+class Swarm:
+    """N robots on one floor; state is pos / vel / target arrays of shape (N, 2)."""
+
+    def __init__(self, n_robots: int, seed: int = 0, floor: float = None,
+                 n_obstacles: int = None, max_entries: int = 8, min_entries: int = 4):
+        self.rng = np.random.default_rng(seed)
+        self.n = n_robots
+        self.floor = floor or max(BASE_FLOOR, FLOOR_PER_ROBOT * math.sqrt(n_robots))
+        self.half = self.floor / 2.0
+        if n_obstacles is None:
+            n_obstacles = int(round(BASE_OBSTACLES * (self.floor / BASE_FLOOR) ** 2))
+        self.M = max_entries
+        self.m = min_entries
+
+        # obstacle footprints (xmin, zmin, xmax, zmax), indexed once
+        half_box = OBSTACLE_SIZE / 2.0
+        centers = self.rng.uniform(-self.half + half_box, self.half - half_box,
+                                   size=(n_obstacles, 2))
+        self.obstacles = np.hstack([centers - half_box, centers + half_box])
+        self.obstacle_index = RTree.bulk_load(
+            ((Rect(*b), i) for i, b in enumerate(self.obstacles.tolist())),
+            max_entries, min_entries)
+
+        self.pos = self._free_positions(n_robots, margin=20.0)
+        self.target = self._free_positions(n_robots, margin=20.0)
+        self.vel = np.zeros((n_robots, 2))
+        self.in_contact = np.empty(0, dtype=np.int64)  # robot * n_obstacles + obstacle
+
+        self.targets_reached = 0
+        self.collisions = 0
+        self.robot_contacts = 0
+        self.phase_seconds = {"move": 0.0, "obstacles": 0.0, "separation": 0.0}
+
+    # ---------- setup ----------
+
+    def _free_positions(self, count: int, margin: float) -> np.ndarray:
+        """Random floor points whose robot circle (+2) touches no obstacle."""
+        lo = -self.half + margin
+        hi = self.half - margin
+        out = self.rng.uniform(lo, hi, size=(count, 2))
+        todo = np.arange(count)
+        for _ in range(1000):
+            bad = self._touching(out[todo], ROBOT_RADIUS + 2.0)
+            todo = todo[bad]
+            if len(todo) == 0:
+                break
+            out[todo] = self.rng.uniform(lo, hi, size=(len(todo), 2))
+        return out
+
+    def _touching(self, points: np.ndarray, radius: float) -> np.ndarray:
+        pairs = self.obstacle_index.search_batch(np.hstack([points, points]), radius)
+        _, dist = self._obstacle_gap(points[pairs[:, 0]], pairs[:, 1])
+        hit = np.zeros(len(points), dtype=bool)
+        hit[pairs[dist < radius, 0]] = True
+        return hit
+
+    def _obstacle_gap(self, points: np.ndarray, obs: np.ndarray):
+        # vector from the closest point of each obstacle box to the point
+        b = self.obstacles[obs]
+        gap = points - np.clip(points, b[:, :2], b[:, 2:])
+        return gap, np.sqrt(np.einsum("ij,ij->i", gap, gap))
+
+    # ---------- simulation ----------
+
+    def step(self, dt: float):
+        t0 = time.perf_counter()
+        self._move_towards_targets(dt)
+        t1 = time.perf_counter()
+        self._avoid_obstacles(dt)
+        t2 = time.perf_counter()
+        self._separate()
+        np.clip(self.pos, -self.half + ROBOT_RADIUS, self.half - ROBOT_RADIUS, out=self.pos)
+        t3 = time.perf_counter()
+        self.phase_seconds["move"] += t1 - t0
+        self.phase_seconds["obstacles"] += t2 - t1
+        self.phase_seconds["separation"] += t3 - t2
+
+    def _move_towards_targets(self, dt: float):
+        delta = self.target - self.pos
+        dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+        step = ROBOT_SPEED * dt
+        arrived = (dist < REACH_EPS) | (step >= dist)
+        safe = np.where(dist > 0.0, dist, 1.0)
+        move = np.where(arrived[:, None], delta, delta / safe[:, None] * step)
+        self.pos += move
+        self.vel = move / dt
+        # robots that snapped onto the target from within REACH_EPS stop
+        self.vel[dist < REACH_EPS] = 0.0
+        n_arrived = int(arrived.sum())
+        if n_arrived:
+            self.targets_reached += n_arrived
+            self.target[arrived] = self._free_positions(n_arrived, margin=20.0)
+
+    def _avoid_obstacles(self, dt: float):
+        pos = self.pos
+        pairs = self.obstacle_index.search_batch(np.hstack([pos, pos]), SENSE_RADIUS)
+        robot, obs = pairs[:, 0], pairs[:, 1]
+        gap, dist = self._obstacle_gap(pos[robot], obs)
+
+        # inside the box: push away from its center instead
+        inside = dist == 0.0
+        if inside.any():
+            b = self.obstacles[obs[inside]]
+            gap[inside] = pos[robot[inside]] - (b[:, :2] + b[:, 2:]) / 2.0
+        length = np.sqrt(np.einsum("ij,ij->i", gap, gap))
+        still = length == 0.0
+        gap[still] = (1.0, 0.0)
+        length[still] = 1.0
+        normal = gap / length[:, None]
+        if inside.any():
+            dist = np.where(inside, 0.0, dist)
+
+        hard = dist < ROBOT_RADIUS
+        soft = ~hard & (dist < AVOID_RADIUS)
+        push = np.zeros(len(dist))
+        push[hard] = ROBOT_RADIUS - dist[hard] + 0.3
+        push[soft] = (AVOID_STRENGTH * (AVOID_RADIUS - dist[soft]) / AVOID_RADIUS * dt) / 30.0
+        np.add.at(pos, robot, normal * push[:, None])
+
+        # bounce: reflect the velocity of robots heading into the obstacle
+        dot = np.einsum("ij,ij->i", self.vel[robot], normal)
+        bounce = hard & (dot < 0.0)
+        np.add.at(self.vel, robot[bounce],
+                  -2.0 * (dot[bounce] * BOUNCE_MULTIPLIER)[:, None] * normal[bounce])
+
+        # a collision is a contact that did not exist on the previous tick
+        contact = robot[hard] * len(self.obstacles) + obs[hard]
+        self.collisions += int(np.count_nonzero(~np.isin(contact, self.in_contact)))
+        self.in_contact = contact
+
+    def _separate(self):
+        # per-tick rebuild of the robots' own index, then a self-join for
+        # every pair closer than two radii; each robot moves half the overlap
+        robots = RTree.bulk_load(
+            ((Rect(x, z, x, z), i) for i, (x, z) in enumerate(self.pos.tolist())),
+            self.M, self.m)
+        pairs = robots.join(robots, "within_distance", 2.0 * ROBOT_RADIUS)
+        if len(pairs) == 0:
+            return
+        a, b = pairs[:, 0], pairs[:, 1]
+        delta = self.pos[a] - self.pos[b]
+        dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+        close = dist < 2.0 * ROBOT_RADIUS
+        a, b, delta, dist = a[close], b[close], delta[close], dist[close]
+        self.robot_contacts += len(a)
+        same = dist == 0.0
+        delta[same] = (1.0, 0.0)
+        dist[same] = 1.0
+        shift = delta / dist[:, None] * ((2.0 * ROBOT_RADIUS - np.where(same, 0.0, dist)) / 2.0)[:, None]
+        np.add.at(self.pos, a, shift)
+        np.add.at(self.pos, b, -shift)
+
+    def run(self, ticks: int, dt: float = 1.0 / 60.0) -> SwarmReport:
+        t0 = time.perf_counter()
+        for _ in range(ticks):
+            self.step(dt)
+        wall = time.perf_counter() - t0
+        return SwarmReport(self.n, ticks, wall, self.targets_reached, self.collisions,
+                           self.robot_contacts, dict(self.phase_seconds))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--robots", type=int, nargs="+", default=[100, 1000, 5000])
+    ap.add_argument("--ticks", type=int, default=200)
+    ap.add_argument("--dt", type=float, default=1.0 / 60.0)
+    ap.add_argument("--M", type=int, default=8, help="R-tree node capacity")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"ticks={args.ticks} dt={args.dt:.5f} M={args.M} seed={args.seed}")
+    print(f"{'robots':>7} {'floor':>6} {'obst':>6} {'ticks/s':>8} {'robot-steps/s':>14} "
+          f"{'move%':>6} {'obst%':>6} {'sep%':>6} {'targets':>8} {'collisions':>10}")
+    for n in args.robots:
+        swarm = Swarm(n, seed=args.seed, max_entries=args.M, min_entries=max(2, args.M * 2 // 5))
+        rep = swarm.run(args.ticks, args.dt)
+        total = sum(rep.phase_seconds.values()) or 1.0
+        share = {k: 100.0 * v / total for k, v in rep.phase_seconds.items()}
+        print(f"{n:>7} {swarm.floor:>6.0f} {len(swarm.obstacles):>6} {rep.ticks_per_sec:>8.1f} "
+              f"{rep.robot_steps_per_sec:>14.0f} {share['move']:>6.1f} {share['obstacles']:>6.1f} "
+              f"{share['separation']:>6.1f} {rep.targets_reached:>8} {rep.collisions:>10}")
+
+
+if __name__ == "__main__":
+    main()
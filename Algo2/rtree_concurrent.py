@@ -0,0 +1,98 @@
+"""Thread-safe access to an RTree: many concurrent readers, one writer.
+
+RTree mutates node `entries` lists and `parent` pointers in place while
+inserting, so readers must never walk the tree during a write.
+ConcurrentRTree guards every call with a writer-preferring
+readers-writer lock: queries run in parallel with each other, an insert
+waits for running queries to finish and blocks new ones until it is done.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+from rtree_lib import Rect, RTree
+
+
+class ReadWriteLock:
+    """Shared (read) / exclusive (write) lock; waiting writers block new readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentRTree:
+    """RTree wrapper whose methods are safe to call from several threads."""
+
+    def __init__(self, tree: Optional[RTree] = None, **rtree_kwargs):
+        self.tree = tree if tree is not None else RTree(**rtree_kwargs)
+        self.lock = ReadWriteLock()
+
+    def insert(self, rect: Rect, obj: Any):
+        with self.lock.write():
+            self.tree.insert(rect, obj)
+
+    def search_range(self, query: Rect) -> List[Any]:
+        with self.lock.read():
+            return self.tree.search_range(query)
+
+    def iter_range(self, query: Rect) -> Iterator[Any]:
+        # the result is collected under the lock: a lazily consumed
+        # generator would otherwise hold the read lock for an unknown time
+        return iter(self.search_range(query))
+
+    def count_range(self, query: Rect) -> int:
+        with self.lock.read():
+            return self.tree.count_range(query)
+
+    def any_in_range(self, query: Rect) -> bool:
+        with self.lock.read():
+            return self.tree.any_in_range(query)
+
+    def save(self, path: str):
+        with self.lock.read():
+            self.tree.save(path)
@@ -1,5 +1,24 @@
-from dataclasses import dataclass
-from typing import List, Any, Tuple, Optional
+import heapq
+import itertools
+import math
+import struct
+from dataclasses import dataclass, field, fields
+from functools import cached_property
+from operator import itemgetter
+from typing import (List, Any, Tuple, Optional, Iterator, ClassVar, Sequence, Union, Iterable,
+                    Callable)
+
+import numpy as np
+
+SPLIT_STRATEGIES = ("quadratic", "linear", "rstar")
+JOIN_PREDICATES = ("intersects", "within_distance")
+
+# flat file: magic, version, M, m, split index, dims, height, nodes, entries
+FLAT_MAGIC = b"RTFL"
+FLAT_VERSION = 2
+FLAT_HEADER = struct.Struct("<4sIIIIIqqq")
+FLAT_ALIGN = 64
+
 
 @dataclass
 class Rect:
@@ -8,9 +27,27 @@ class Rect:
     xmax: float
     ymax: float
 
+    dims: ClassVar[int] = 2
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        return (self.xmin, self.ymin, self.xmax, self.ymax)
+
+    @cached_property
+    def coords(self) -> Tuple[float, float, float, float]:
+        # bounds, cached on first use like Box.coords (indexed Rects are
+        # never modified), for traversals that serve both
+        return (self.xmin, self.ymin, self.xmax, self.ymax)
+
     def area(self) -> float:
         return max(0.0, self.xmax - self.xmin) * max(0.0, self.ymax - self.ymin)
 
+    def margin(self) -> float:
+        return max(0.0, self.xmax - self.xmin) + max(0.0, self.ymax - self.ymin)
+
+    def center(self) -> Tuple[float, float]:
+        return (self.xmin + self.xmax) / 2.0, (self.ymin + self.ymax) / 2.0
+
     def union(self, other: "Rect") -> "Rect":
         return Rect(
             xmin=min(self.xmin, other.xmin),
@@ -23,6 +60,13 @@ class Rect:
         new_rect = self.union(other)
         return new_rect.area() - self.area()
 
+    def overlap(self, other: "Rect") -> float:
+        w = min(self.xmax, other.xmax) - max(self.xmin, other.xmin)
+        h = min(self.ymax, other.ymax) - max(self.ymin, other.ymin)
+        if w <= 0.0 or h <= 0.0:
+            return 0.0
+        return w * h
+
     def intersects(self, other: "Rect") -> bool:
         return not (
             self.xmax < other.xmin or self.xmin > other.xmax or
@@ -30,6 +74,125 @@ class Rect:
         )
 
 
+class Box:
+    """
+    d-dimensional axis-aligned box stored as float64[2*d]:
+    bounds = [min_0, ..., min_{d-1}, max_0, ..., max_{d-1}].
+    Same interface as Rect, so RTree(dims=d) can index it. The bounds are
+    read-only and also kept as a tuple of Python floats (`coords`), which
+    the per-entry intersection tests use instead of small NumPy ops.
+    """
+
+    __slots__ = ("bounds", "coords")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = np.array(bounds, dtype=np.float64)
+        if self.bounds.ndim != 1 or self.bounds.size % 2 or self.bounds.size == 0:
+            raise ValueError(f"Box bounds must be a flat float64[2*d] array, got {self.bounds.shape}")
+        self.bounds.flags.writeable = False
+        self.coords = tuple(self.bounds.tolist())
+
+    @classmethod
+    def from_min_max(cls, mins: Sequence[float], maxs: Sequence[float]) -> "Box":
+        return cls(np.concatenate((np.asarray(mins, dtype=np.float64),
+                                   np.asarray(maxs, dtype=np.float64))))
+
+    @property
+    def dims(self) -> int:
+        return self.bounds.size // 2
+
+    @property
+    def mins(self) -> np.ndarray:
+        return self.bounds[:self.dims]
+
+    @property
+    def maxs(self) -> np.ndarray:
+        return self.bounds[self.dims:]
+
+    def area(self) -> float:
+        return float(np.prod(np.maximum(self.maxs - self.mins, 0.0)))
+
+    def margin(self) -> float:
+        return float(np.maximum(self.maxs - self.mins, 0.0).sum())
+
+    def center(self) -> Tuple[float, ...]:
+        return tuple(((self.mins + self.maxs) / 2.0).tolist())
+
+    def union(self, other: "Box") -> "Box":
+        return Box(np.concatenate((np.minimum(self.mins, other.mins),
+                                   np.maximum(self.maxs, other.maxs))))
+
+    def enlarge_area_needed(self, other: "Box") -> float:
+        return self.union(other).area() - self.area()
+
+    def overlap(self, other: "Box") -> float:
+        ext = np.minimum(self.maxs, other.maxs) - np.maximum(self.mins, other.mins)
+        if (ext <= 0.0).any():
+            return 0.0
+        return float(np.prod(ext))
+
+    def intersects(self, other: "Box") -> bool:
+        a = self.coords
+        b = other.coords
+        d = len(a) // 2
+        for k in range(d):
+            if a[d + k] < b[k] or a[k] > b[d + k]:
+                return False
+        return True
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Box) and np.array_equal(self.bounds, other.bounds)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Box(mins={self.mins.tolist()}, maxs={self.maxs.tolist()})"
+
+
+AnyBox = Union[Rect, Box]
+
+
+@dataclass
+class QueryStats:
+    """
+    Counters accumulated by RTree range queries while instrumentation is on
+    (see RTree.enable_stats). A box test is one entry MBR compared with the
+    query; a false positive is a candidate rejected by the exact test of
+    RTree.iter_refined, query_circle or query_segment.
+    """
+    queries: int = 0
+    nodes_visited: int = 0
+    leaves_visited: int = 0
+    box_tests: int = 0
+    candidates: int = 0
+    false_positives: int = 0
+
+    def reset(self):
+        for f in fields(self):
+            setattr(self, f.name, 0)
+
+    def per_query(self) -> dict:
+        n = max(1, self.queries)
+        return {f.name: getattr(self, f.name) / n for f in fields(self) if f.name != "queries"}
+
+
+@dataclass
+class TreeStats:
+    """
+    Shape of an RTree. fill_histogram[k] is the number of nodes holding k
+    entries; overlap_area sums the pairwise overlap of sibling MBRs and
+    dead_space the area of every node MBR not covered by its entries.
+    """
+    height: int
+    nodes: int
+    leaves: int
+    entries: int
+    mean_fill: float
+    overlap_area: float
+    dead_space: float
+    fill_histogram: List[int] = field(repr=False, default_factory=list)
+
+
 class RTreeNode:
     def __init__(self, leaf: bool = True, parent: "RTreeNode" = None):
         self.leaf = leaf
@@ -46,26 +209,650 @@ class RTreeNode:
 
 
 class RTree:
-    def __init__(self, max_entries: int = 8, min_entries: int = 4):
+    """
+    R-tree with a selectable node split strategy:
+    - "quadratic": Guttman quadratic split (default)
+    - "linear": Guttman linear split, O(M) seed pick
+    - "rstar": R*-tree split (axis by margin, distribution by overlap)
+      with forced reinsertion on the first overflow per level
+
+    dims=2 indexes Rect (X-Y / X-Z); any other dims indexes Box, e.g.
+    dims=3 for 3D obstacles or point-cloud neighbourhoods.
+
+    `changes` counts inserts and deletes, so structures derived from the
+    tree (GridPlanner, FreeSpaceSampler) can tell when they are stale.
+    """
+
+    def __init__(self, max_entries: int = 8, min_entries: int = 4,
+                 split: str = "quadratic", reinsert_fraction: float = 0.3,
+                 dims: int = 2):
         assert 1 < min_entries <= max_entries // 2
+        if dims < 1:
+            raise ValueError(f"dims must be >= 1, got {dims}")
+        if split not in SPLIT_STRATEGIES:
+            raise ValueError(
+                f"unknown split strategy {split!r}, expected one of {SPLIT_STRATEGIES}"
+            )
         self.M = max_entries
         self.m = min_entries
+        self.split = split
+        self.dims = dims
+        p = int(round(reinsert_fraction * max_entries))
+        self.reinsert_count = max(1, min(p, max_entries + 1 - min_entries))
         self.root = RTreeNode(leaf=True)
+        self.height = 1
+        self._reinserted_levels = set()
+        self._flat = None
+        self.changes = 0
+        self.stats: Optional[QueryStats] = None
+
+    # ---------- instrumentation ----------
+
+    def enable_stats(self) -> QueryStats:
+        """
+        Start counting query work into a fresh QueryStats. While disabled
+        (the default) queries only pay one `stats is None` check per call;
+        counted queries take a separate traversal so the fast path stays
+        untouched.
+        """
+        self.stats = QueryStats()
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = None
+
+    def tree_stats(self) -> TreeStats:
+        """Height, fill histogram, sibling overlap and dead space of the whole tree."""
+        hist = [0] * (self.M + 1)
+        nodes = leaves = entries = 0
+        overlap = 0.0
+        dead = 0.0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            n = len(node.entries)
+            nodes += 1
+            entries += n
+            hist[n] += 1
+            if n == 0:
+                continue
+            boxes = np.array([r.bounds for r, _ in node.entries], dtype=np.float64)
+            dead += node.mbr().area() - _union_volume(boxes)
+            if node.leaf:
+                leaves += 1
+                continue
+            rects = [r for r, _ in node.entries]
+            for i in range(n):
+                for j in range(i + 1, n):
+                    overlap += rects[i].overlap(rects[j])
+            stack.extend(child for _, child in node.entries)
+        return TreeStats(height=self.height, nodes=nodes, leaves=leaves, entries=entries,
+                         mean_fill=entries / (nodes * self.M), overlap_area=overlap,
+                         dead_space=dead, fill_histogram=hist)
+
+    def insert(self, rect: AnyBox, obj: Any):
+        if rect.dims != self.dims:
+            raise ValueError(f"{rect.dims}D box inserted into a {self.dims}D RTree")
+        self._reinserted_levels = set()
+        self._flat = None
+        self.changes += 1
+        self._insert_at_level(rect, obj, 0)
+
+    def delete(self, rect: AnyBox, obj: Any) -> bool:
+        """Remove the entry (rect, obj); False if it is not in the tree."""
+        leaf = self._find_leaf(rect, obj)
+        if leaf is None:
+            return False
+        for i, (r, o) in enumerate(leaf.entries):
+            if o == obj and r == rect:
+                del leaf.entries[i]
+                break
+        self._flat = None
+        self.changes += 1
+        self._condense_tree(leaf)
+        return True
+
+    @classmethod
+    def bulk_load(cls, items: Iterable[Tuple[AnyBox, Any]], max_entries: int = 8,
+                  min_entries: int = 4, split: str = "quadratic",
+                  reinsert_fraction: float = 0.3, dims: int = 2) -> "RTree":
+        """
+        Build a tree from (rect, obj) pairs with Sort-Tile-Recursive packing:
+        much faster than repeated insert() and gives nearly full, barely
+        overlapping nodes. Later inserts use the chosen split strategy.
+        """
+        tree = cls(max_entries, min_entries, split=split,
+                   reinsert_fraction=reinsert_fraction, dims=dims)
+        entries = list(items)
+        for rect, _ in entries:
+            if rect.dims != dims:
+                raise ValueError(f"{rect.dims}D box inserted into a {dims}D RTree")
+        if entries:
+            bounds = np.array([r.bounds for r, _ in entries], dtype=np.float64)
+            tree._pack(entries, bounds.reshape(len(entries), 2 * dims))
+        return tree
+
+    @classmethod
+    def bulk_load_arrays(cls, boxes: np.ndarray, objs: Optional[Sequence[Any]] = None,
+                         max_entries: int = 8, min_entries: int = 4,
+                         split: str = "quadratic", reinsert_fraction: float = 0.3) -> "RTree":
+        """
+        bulk_load() for boxes given as an array of shape (n, 2 * dims) with
+        rows (min_0, .., min_{d-1}, max_0, .., max_{d-1}); objs defaults to
+        the row numbers. Skips building the boxes one by one in Python.
+        """
+        boxes = np.array(boxes, dtype=np.float64)
+        if boxes.ndim != 2 or boxes.shape[1] % 2 or boxes.shape[1] == 0:
+            raise ValueError(f"boxes must have shape (n, 2 * dims), got {boxes.shape}")
+        dims = boxes.shape[1] // 2
+        tree = cls(max_entries, min_entries, split=split,
+                   reinsert_fraction=reinsert_fraction, dims=dims)
+        if objs is None:
+            objs = range(len(boxes))
+        elif len(objs) != len(boxes):
+            raise ValueError(f"{len(objs)} objs for {len(boxes)} boxes")
+        if len(boxes):
+            tree._pack(list(zip(_boxes_from_array(boxes), objs)), boxes)
+        return tree
+
+    def _pack(self, entries: List[Tuple[AnyBox, Any]], bounds: np.ndarray):
+        # STR packing, level by level; node MBRs come from the bounds array
+        d = self.dims
+        leaf = True
+        while True:
+            groups = _str_groups((bounds[:, :d] + bounds[:, d:]) / 2.0, self.M)
+            order = np.concatenate(groups)
+            starts = np.cumsum([0] + [len(g) for g in groups[:-1]])
+            bounds = np.hstack([np.minimum.reduceat(bounds[order, :d], starts, axis=0),
+                                np.maximum.reduceat(bounds[order, d:], starts, axis=0)])
+            nodes = []
+            for group in groups:
+                node = RTreeNode(leaf=leaf)
+                node.entries = [entries[i] for i in group.tolist()]
+                if not leaf:
+                    for _, child in node.entries:
+                        child.parent = node
+                nodes.append(node)
+            if len(nodes) == 1:
+                break
+            entries = list(zip(_boxes_from_array(bounds), nodes))
+            leaf = False
+            self.height += 1
+        self.root = nodes[0]
+        self._flat = None
 
-    def insert(self, rect: Rect, obj: Any):
-        leaf = self._choose_leaf(self.root, rect)
-        leaf.entries.append((rect, obj))
-        self._adjust_tree(leaf)
+    def search_range(self, query: AnyBox) -> List[Any]:
+        return list(self._iter_range(query))
 
-    def search_range(self, query: Rect) -> List[Any]:
+    def iter_range(self, query: AnyBox) -> Iterator[Any]:
+        """Yield objects whose rect intersects `query`, lazily (explicit stack)."""
+        return self._iter_range(query)
+
+    def count_range(self, query: AnyBox) -> int:
+        return sum(1 for _ in self._iter_range(query))
+
+    def any_in_range(self, query: AnyBox) -> bool:
+        """True as soon as one leaf entry intersects `query`."""
+        return next(self._iter_range(query), _MISSING) is not _MISSING
+
+    def nearest(self, point: Sequence[float], k: int = 1) -> List[Any]:
+        """
+        The k objects whose boxes are closest to `point` (distance 0 when
+        the point is inside), nearest first. Best-first search: nodes are
+        expanded in order of their minimum distance to the point.
+        """
+        if len(point) != self.dims:
+            raise ValueError(f"{len(point)}D point queried on a {self.dims}D RTree")
         res: List[Any] = []
-        self._search_node(self.root, query, res)
+        if k < 1:
+            return res
+        point = tuple(float(p) for p in point)
+        tie = itertools.count()
+        heap = [(0.0, next(tie), False, self.root)]
+        while heap:
+            _, _, is_obj, item = heapq.heappop(heap)
+            if is_obj:
+                res.append(item)
+                if len(res) == k:
+                    break
+                continue
+            for r, child in item.entries:
+                heapq.heappush(heap, (_mindist2(r, point), next(tie), item.leaf, child))
         return res
 
-    def _choose_leaf(self, node: RTreeNode, rect: Rect) -> RTreeNode:
-        if node.leaf:
-            return node
-        best_entry = None
+    def iter_refined(self, query: AnyBox, exact: Callable[[Any], bool]) -> Iterator[Any]:
+        """
+        iter_range() filtered by an exact-geometry test on each candidate
+        object; with stats enabled, rejected candidates are counted as
+        false positives.
+        """
+        stats = self.stats
+        for obj in self.iter_range(query):
+            if exact(obj):
+                yield obj
+            elif stats is not None:
+                stats.false_positives += 1
+
+    def _iter_range(self, query: AnyBox) -> Iterator[Any]:
+        # the traversal behind every range query: counted while stats are
+        # on, unrolled plain-float tests for 2D and 3D, Box.intersects otherwise
+        if self.stats is not None:
+            return self._iter_range_counted(query)
+        if self.dims == 3:
+            return self._iter_range_3d(query)
+        if self.dims != 2:
+            return self._iter_range_nd(query)
+        return self._iter_range_2d(query)
+
+    def _iter_range_2d(self, query: Rect) -> Iterator[Any]:
+        qx0, qy0, qx1, qy1 = query.xmin, query.ymin, query.xmax, query.ymax
+        stack = [self.root]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node = pop()
+            if node.leaf:
+                for r, obj in node.entries:
+                    if not (r.xmax < qx0 or r.xmin > qx1 or
+                            r.ymax < qy0 or r.ymin > qy1):
+                        yield obj
+            else:
+                for r, child in node.entries:
+                    if not (r.xmax < qx0 or r.xmin > qx1 or
+                            r.ymax < qy0 or r.ymin > qy1):
+                        push(child)
+
+    def _iter_range_3d(self, query: Box) -> Iterator[Any]:
+        qx0, qy0, qz0, qx1, qy1, qz1 = query.coords
+        stack = [self.root]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node = pop()
+            if node.leaf:
+                for r, obj in node.entries:
+                    x0, y0, z0, x1, y1, z1 = r.coords
+                    if not (x1 < qx0 or x0 > qx1 or y1 < qy0 or y0 > qy1 or
+                            z1 < qz0 or z0 > qz1):
+                        yield obj
+            else:
+                for r, child in node.entries:
+                    x0, y0, z0, x1, y1, z1 = r.coords
+                    if not (x1 < qx0 or x0 > qx1 or y1 < qy0 or y0 > qy1 or
+                            z1 < qz0 or z0 > qz1):
+                        push(child)
+
+    def _iter_range_counted(self, query: AnyBox) -> Iterator[Any]:
+        # same traversal as _iter_range_nd, plus the QueryStats bookkeeping
+        stats = self.stats
+        stats.queries += 1
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            stats.nodes_visited += 1
+            stats.box_tests += len(node.entries)
+            if node.leaf:
+                stats.leaves_visited += 1
+                for r, obj in node.entries:
+                    if r.intersects(query):
+                        stats.candidates += 1
+                        yield obj
+            else:
+                for r, child in node.entries:
+                    if r.intersects(query):
+                        stack.append(child)
+
+    def _iter_range_nd(self, query: AnyBox) -> Iterator[Any]:
+        stack = [self.root]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node = pop()
+            if node.leaf:
+                for r, obj in node.entries:
+                    if r.intersects(query):
+                        yield obj
+            else:
+                for r, child in node.entries:
+                    if r.intersects(query):
+                        push(child)
+
+    # ---------- spatial join ----------
+
+    def join(self, other: "RTree", predicate: str = "intersects",
+             distance: float = 0.0) -> np.ndarray:
+        """
+        All (obj_self, obj_other) pairs whose boxes intersect, or whose
+        boxes are within `distance` of each other, as an array of shape
+        (k, 2) (int64 when all objects are ints).
+
+        Both trees are traversed in lockstep, one level at a time: every
+        surviving node pair is expanded into its entry pairs and tested in
+        one vectorised pass, so node pairs whose MBRs do not qualify are
+        pruned together with their whole subtrees. When `other is self`,
+        each unordered pair is reported once and (x, x) pairs are skipped.
+        """
+        if predicate not in JOIN_PREDICATES:
+            raise ValueError(f"unknown predicate {predicate!r}, expected one of {JOIN_PREDICATES}")
+        if predicate == "within_distance":
+            if distance < 0.0:
+                raise ValueError("distance must be >= 0")
+            d2 = float(distance) ** 2
+        else:
+            d2 = 0.0
+        if other.dims != self.dims:
+            raise ValueError(f"cannot join a {self.dims}D RTree with a {other.dims}D one")
+
+        _, start_a, boxes_a, refs_a, objs_a = self._flatten()
+        _, start_b, boxes_b, refs_b, objs_b = other._flatten()
+        if len(objs_a) == 0 or len(objs_b) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        d = self.dims
+        self_join = other is self
+        count_a = np.diff(start_a)
+        count_b = np.diff(start_b)
+        mbr_a = _node_mbrs(start_a, boxes_a, d)
+        mbr_b = _node_mbrs(start_b, boxes_b, d)
+
+        # current node pairs, and how many levels each side still has
+        pa = np.zeros(1, dtype=np.int64)
+        pb = np.zeros(1, dtype=np.int64)
+        levels_a = self.height
+        levels_b = other.height
+        while len(pa):
+            if levels_a > levels_b:
+                ea, rep = _expand(pa, start_a, count_a)
+                keep = _near_arrays(boxes_a[ea], mbr_b[pb[rep]], d2, d)
+                pa = refs_a[ea[keep]]
+                pb = pb[rep[keep]]
+                levels_a -= 1
+                continue
+            if levels_b > levels_a:
+                eb, rep = _expand(pb, start_b, count_b)
+                keep = _near_arrays(mbr_a[pa[rep]], boxes_b[eb], d2, d)
+                pa = pa[rep[keep]]
+                pb = refs_b[eb[keep]]
+                levels_b -= 1
+                continue
+
+            ea, eb, rep = _expand_pairs(pa, pb, start_a, count_a, boxes_a, mbr_a,
+                                        start_b, count_b, boxes_b, mbr_b, d2, d)
+            keep = _near_arrays(boxes_a[ea], boxes_b[eb], d2, d)
+            if self_join:
+                # a node paired with itself yields both orientations
+                same = (pa == pb)[rep]
+                keep &= ~same | ((ea < eb) if levels_a == 1 else (ea <= eb))
+            ea = ea[keep]
+            eb = eb[keep]
+            if levels_a == 1:
+                out = np.empty((len(ea), 2), dtype=np.result_type(objs_a, objs_b))
+                out[:, 0] = objs_a[refs_a[ea]]
+                out[:, 1] = objs_b[refs_b[eb]]
+                return out
+            pa = refs_a[ea]
+            pb = refs_b[eb]
+            levels_a -= 1
+            levels_b -= 1
+        return np.empty((0, 2), dtype=np.result_type(objs_a, objs_b))
+
+    def search_batch(self, boxes: np.ndarray, distance: float = 0.0) -> np.ndarray:
+        """
+        Range query for many boxes at once: (k, 2) pairs (row, obj) where row
+        indexes `boxes` (shape (n, 2 * dims)) and obj's box lies within
+        `distance` of that row (0 = intersects). The tree is descended level
+        by level for all queries together, like join().
+        """
+        d = self.dims
+        q = np.asarray(boxes, dtype=np.float64).reshape(-1, 2 * d)
+        _, start, tree_boxes, refs, objs = self._flatten()
+        if len(objs) == 0 or len(q) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        d2 = float(distance) ** 2
+        count = np.diff(start)
+        nodes = np.zeros(len(q), dtype=np.int64)
+        rows = np.arange(len(q))
+        for level in range(self.height):
+            entries, rep = _expand(nodes, start, count)
+            rows = rows[rep]
+            keep = _near_arrays(tree_boxes[entries], q[rows], d2, d)
+            entries = entries[keep]
+            rows = rows[keep]
+            nodes = refs[entries]
+        out = np.empty((len(rows), 2), dtype=np.result_type(np.int64, objs))
+        out[:, 0] = rows
+        out[:, 1] = objs[nodes]
+        return out
+
+    # ---------- filter and refine ----------
+
+    def query_circle(self, center: Sequence[float], radius: float,
+                     axes: Optional[Sequence[int]] = None,
+                     span: Optional[Sequence[Tuple[float, float]]] = None):
+        """
+        Objects whose box lies strictly closer than `radius` to `center`,
+        nearest first, as (objs, dist, normals). normals[i] points from the
+        box towards the center (from the box center when the center is
+        inside it). With `axes` the circle lives in those coordinates only
+        (e.g. axes=(0, 2) for an X-Z footprint in a 3D tree) and the other
+        axes are tested against the intervals in `span`.
+
+        A circle over two axes, the per-frame collision query, walks the
+        node tree with plain-float tests and works out distances and normals
+        for the hits only. Other shapes, and queries while stats are on,
+        descend the flat arrays one vectorised level at a time.
+        """
+        plane = self._circle_plane(center, axes, span)
+        if plane is None:
+            _, start, boxes, refs, objs = self._flatten()
+            hits, dist, normals = _query_circle(start, boxes, refs, self.height, self.dims,
+                                                center, radius, axes, span, self.stats)
+            return objs[refs[hits]], dist, normals
+
+        hits = sorted(self._iter_circle(center, radius, plane, span), key=itemgetter(0))
+        if not hits:
+            return _NO_CONTACTS
+        d = self.dims
+        u, v = plane
+        cu = float(center[0])
+        cv = float(center[1])
+        objs = []
+        dist = []
+        normals = []
+        for g2, gu, gv, c, item in hits:
+            if g2 == 0.0:
+                # center inside the box: push out along center - box center
+                gu = cu - (c[u] + c[d + u]) / 2.0
+                gv = cv - (c[v] + c[d + v]) / 2.0
+            length = math.sqrt(gu * gu + gv * gv)
+            if length == 0.0:
+                gu, gv, length = 1.0, 0.0, 1.0
+            objs.append(item)
+            dist.append(math.sqrt(g2))
+            normals.append(gu / length)
+            normals.append(gv / length)
+        return _obj_array(objs), np.array(dist), np.array(normals).reshape(-1, 2)
+
+    def any_in_circle(self, center: Sequence[float], radius: float,
+                      axes: Optional[Sequence[int]] = None,
+                      span: Optional[Sequence[Tuple[float, float]]] = None) -> bool:
+        """True when query_circle would return anything; stops at the first hit."""
+        plane = self._circle_plane(center, axes, span)
+        if plane is None:
+            return len(self.query_circle(center, radius, axes, span)[0]) > 0
+        return next(self._iter_circle(center, radius, plane, span), None) is not None
+
+    def _circle_plane(self, center, axes, span) -> Optional[Tuple[int, int]]:
+        # the two circle axes when the pointer traversal can answer the query
+        if self.stats is not None or len(center) != 2:
+            return None
+        if axes is None:
+            return (0, 1) if self.dims == 2 else None
+        if len(axes) != 2 or len(span or ()) not in (0, self.dims - 2):
+            return None
+        return int(axes[0]), int(axes[1])
+
+    def _iter_circle(self, center, radius, plane, span) -> Iterator[tuple]:
+        # (squared gap, gap u, gap v, box coords, obj) of every hit, gap being
+        # center minus the closest point of the box, in traversal order
+        d = self.dims
+        u, v = plane
+        u_hi = d + u
+        v_hi = d + v
+        cu = float(center[0])
+        cv = float(center[1])
+        radius = float(radius)
+        r2 = radius * radius
+        # the circle's bounding square rejects most entries on one compare
+        u0 = cu - radius
+        u1 = cu + radius
+        v0 = cv - radius
+        v1 = cv + radius
+        limits = ()
+        if span:
+            others = [a for a in range(d) if a != u and a != v]
+            limits = [(a, d + a, float(lo), float(hi)) for a, (lo, hi) in zip(others, span)]
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            leaf = node.leaf
+            for r, item in node.entries:
+                c = r.coords
+                lo = c[u]
+                hi = c[u_hi]
+                if hi < u0 or lo > u1:
+                    continue
+                gu = cu - lo if cu < lo else (cu - hi if cu > hi else 0.0)
+                lo = c[v]
+                hi = c[v_hi]
+                if hi < v0 or lo > v1:
+                    continue
+                gv = cv - lo if cv < lo else (cv - hi if cv > hi else 0.0)
+                g2 = gu * gu + gv * gv
+                if g2 >= r2:
+                    continue
+                for a, b, lo, hi in limits:
+                    if c[b] < lo or c[a] > hi:
+                        break
+                else:
+                    if leaf:
+                        yield g2, gu, gv, c, item
+                    else:
+                        stack.append(item)
+
+    def query_segment(self, p0: Sequence[float], p1: Sequence[float]):
+        """
+        Objects whose box the segment p0 -> p1 passes through, nearest first,
+        as (objs, dist, normals): dist is measured along the segment from p0
+        to the entry point, normals[i] is the outward normal of the entered
+        face (zero when p0 starts inside the box).
+        """
+        _, start, boxes, refs, objs = self._flatten()
+        hits, dist, normals = _query_segment(start, boxes, refs, self.height, self.dims,
+                                             p0, p1, self.stats)
+        return objs[refs[hits]], dist, normals
+
+    # ---------- persistence ----------
+
+    def save(self, path: str):
+        """
+        Write the tree as flat arrays (BFS node order):
+        node_leaf[n_nodes], node_start[n_nodes + 1] (entry offsets),
+        entry_box[n_entries, 2 * dims] and entry_ref[n_entries], where entry_ref is
+        a child node index for internal nodes and the object id for leaves.
+        Leaf objects must be ints.
+        """
+        leaf, start, boxes, refs, objs = self._flatten()
+        if objs.dtype != np.int64:
+            bad = next(o for o in objs if not isinstance(o, (int, np.integer)))
+            raise TypeError(f"RTree.save needs int leaf objects, got {type(bad).__name__}")
+        refs = refs.copy()
+        leaf_entries = np.repeat(leaf.astype(bool), np.diff(start))
+        refs[leaf_entries] = objs
+        n_entries = len(refs)
+
+        header = FLAT_HEADER.pack(FLAT_MAGIC, FLAT_VERSION, self.M, self.m,
+                                  SPLIT_STRATEGIES.index(self.split), self.dims,
+                                  self.height, len(leaf), n_entries)
+        offsets = _flat_layout(len(leaf), n_entries, self.dims)
+        with open(path, "wb") as f:
+            f.write(header)
+            for offset, arr in zip(offsets, (leaf, start, boxes, refs)):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(arr.tobytes())
+
+    def _flatten(self):
+        """
+        BFS arrays shared by save() and join(), cached until the next insert:
+        leaf[n_nodes], start[n_nodes + 1], boxes[n_entries, 2 * dims],
+        refs[n_entries] (child node index, or index into objs for leaf
+        entries) and objs (leaf objects; int64 when all are ints).
+        """
+        if self._flat is not None:
+            return self._flat
+        nodes = [self.root]
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            if not node.leaf:
+                nodes.extend(child for _, child in node.entries)
+            i += 1
+
+        leaf = np.empty(len(nodes), dtype=np.uint8)
+        start = np.empty(len(nodes) + 1, dtype=np.int64)
+        bounds = []
+        refs = []
+        objs = []
+        next_child = 1
+        for i, node in enumerate(nodes):
+            leaf[i] = node.leaf
+            start[i] = len(refs)
+            for r, item in node.entries:
+                bounds.append(r.bounds)
+                if node.leaf:
+                    refs.append(len(objs))
+                    objs.append(item)
+                else:
+                    # BFS order: children are numbered in the order they were queued
+                    refs.append(next_child)
+                    next_child += 1
+        start[len(nodes)] = len(refs)
+
+        boxes = np.array(bounds, dtype=np.float64).reshape(len(refs), 2 * self.dims)
+        self._flat = (leaf, start, boxes, np.array(refs, dtype=np.int64), _obj_array(objs))
+        return self._flat
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "FlatRTree":
+        """
+        Open a tree written by `save`. The result is a read-only FlatRTree
+        that answers queries straight from the arrays (memory-mapped when
+        `mmap=True`); use `FlatRTree.to_rtree()` to get a mutable RTree.
+        """
+        return FlatRTree.open(path, mmap=mmap)
+
+    # ---------- insertion ----------
+
+    def _insert_at_level(self, rect: AnyBox, item: Any, level: int):
+        # level 0 = leaf; level > 0 re-attaches a subtree during reinsertion
+        node = self._choose_node(rect, level)
+        node.entries.append((rect, item))
+        if level > 0:
+            item.parent = node
+        self._adjust_tree(node, level)
+
+    def _choose_node(self, rect: AnyBox, level: int) -> RTreeNode:
+        node = self.root
+        node_level = self.height - 1
+        while node_level > level:
+            if self.split == "rstar" and node_level == 1:
+                node = self._choose_subtree_overlap(node, rect)
+            else:
+                node = self._choose_subtree_area(node, rect)
+            node_level -= 1
+        return node
+
+    def _choose_subtree_area(self, node: RTreeNode, rect: AnyBox) -> RTreeNode:
+        best_child = None
         best_increase = None
         best_area = None
         for r, child in node.entries:
@@ -76,87 +863,184 @@ class RTree:
                 (inc == best_increase and area < best_area)):
                 best_increase = inc
                 best_area = area
-                best_entry = (r, child)
-        _, child = best_entry
-        return self._choose_leaf(child, rect)
+                best_child = child
+        return best_child
 
-    def _adjust_tree(self, node: RTreeNode):
+    def _choose_subtree_overlap(self, node: RTreeNode, rect: AnyBox) -> RTreeNode:
+        # R*: for nodes pointing to leaves, minimise overlap enlargement
+        best_child = None
+        best_key = None
+        for i, (r, child) in enumerate(node.entries):
+            enlarged = r.union(rect)
+            overlap_inc = 0.0
+            for j, (other, _) in enumerate(node.entries):
+                if i != j:
+                    overlap_inc += enlarged.overlap(other) - r.overlap(other)
+            area = r.area()
+            key = (overlap_inc, enlarged.area() - area, area)
+            if best_key is None or key < best_key:
+                best_key = key
+                best_child = child
+        return best_child
+
+    def _adjust_tree(self, node: RTreeNode, level: int):
         while True:
-            if len(node.entries) > self.M:
-                node, new_node = self._split_node(node)
-                if node.parent is None:
-                    new_root = RTreeNode(leaf=False)
-                    node.parent = new_root
-                    new_node.parent = new_root
-                    new_root.entries = [
-                        (node.mbr(), node),
-                        (new_node.mbr(), new_node),
-                    ]
-                    self.root = new_root
-                    return
-                else:
-                    parent = node.parent
-                    for i, (r, child) in enumerate(parent.entries):
-                        if child is node:
-                            parent.entries[i] = (node.mbr(), node)
-                            break
-                    parent.entries.append((new_node.mbr(), new_node))
-                    node = parent
-                    continue
-            else:
-                parent = node.parent
-                while parent is not None:
-                    for i, (r, child) in enumerate(parent.entries):
-                        if child is node:
-                            parent.entries[i] = (node.mbr(), node)
-                            break
-                    node = parent
-                    parent = node.parent
+            if len(node.entries) <= self.M:
+                self._refresh_mbrs(node)
+                return
+            if (self.split == "rstar" and node.parent is not None and
+                    level not in self._reinserted_levels):
+                self._reinserted_levels.add(level)
+                self._forced_reinsert(node, level)
+                return
+            node, new_node, mbr1, mbr2 = self._split_node(node)
+            if node.parent is None:
+                new_root = RTreeNode(leaf=False)
+                node.parent = new_root
+                new_node.parent = new_root
+                new_root.entries = [(mbr1, node), (mbr2, new_node)]
+                self.root = new_root
+                self.height += 1
                 return
+            parent = node.parent
+            for i, (r, child) in enumerate(parent.entries):
+                if child is node:
+                    parent.entries[i] = (mbr1, node)
+                    break
+            parent.entries.append((mbr2, new_node))
+            node = parent
+            level += 1
+
+    def _refresh_mbrs(self, node: RTreeNode):
+        parent = node.parent
+        while parent is not None:
+            for i, (r, child) in enumerate(parent.entries):
+                if child is node:
+                    parent.entries[i] = (node.mbr(), node)
+                    break
+            node = parent
+            parent = node.parent
+
+    def _forced_reinsert(self, node: RTreeNode, level: int):
+        c = node.mbr().center()
+
+        def dist2(entry):
+            return sum((a - b) ** 2 for a, b in zip(entry[0].center(), c))
+
+        ordered = sorted(node.entries, key=dist2)
+        keep = len(ordered) - self.reinsert_count
+        node.entries = ordered[:keep]
+        self._refresh_mbrs(node)
+        # close reinsert: nearest of the removed entries first
+        for rect, item in ordered[keep:]:
+            self._insert_at_level(rect, item, level)
+
+    # ---------- deletion ----------
+
+    def _find_leaf(self, rect: AnyBox, obj: Any) -> Optional[RTreeNode]:
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.leaf:
+                for r, o in node.entries:
+                    if o == obj and r == rect:
+                        return node
+            else:
+                for r, child in node.entries:
+                    if r.intersects(rect):
+                        stack.append(child)
+        return None
+
+    def _condense_tree(self, node: RTreeNode):
+        # Guttman CondenseTree: drop underfull nodes on the path to the root
+        # and reinsert their entries at the level they came from
+        orphans = []
+        level = 0
+        while node.parent is not None:
+            parent = node.parent
+            if len(node.entries) < self.m:
+                parent.entries = [e for e in parent.entries if e[1] is not node]
+                orphans.extend((r, item, level) for r, item in node.entries)
+            else:
+                for i, (r, child) in enumerate(parent.entries):
+                    if child is node:
+                        parent.entries[i] = (node.mbr(), node)
+                        break
+            node = parent
+            level += 1
+        while not self.root.leaf and len(self.root.entries) == 1:
+            self.root = self.root.entries[0][1]
+            self.root.parent = None
+            self.height -= 1
+        if not self.root.leaf and not self.root.entries:
+            self.root = RTreeNode(leaf=True)
+            self.height = 1
+        for rect, item, level in sorted(orphans, key=lambda o: -o[2]):
+            self._reinserted_levels = set()
+            self._insert_at_level(rect, item, level)
+
+    # ---------- split ----------
 
     def _split_node(self, node: RTreeNode):
         entries = list(node.entries)
-        s1, s2 = self._pick_seeds(entries)
+        if self.split == "rstar":
+            group1, group2, mbr1, mbr2 = self._split_rstar(entries)
+        else:
+            if self.split == "linear":
+                s1, s2 = self._linear_pick_seeds(entries)
+            else:
+                s1, s2 = self._pick_seeds(entries)
+            group1, group2, mbr1, mbr2 = self._distribute(entries, s1, s2)
         node1 = node
-        node1.entries = [entries[s1]]
+        node1.entries = group1
         node2 = RTreeNode(leaf=node.leaf, parent=node.parent)
-        node2.entries = [entries[s2]]
-        used = {s1, s2}
-        n = len(entries)
-        for i in range(n):
-            if i in used:
-                continue
-            rect, obj = entries[i]
-            remaining = n - len(used)
-            if len(node1.entries) + remaining == self.m:
-                node1.entries.append((rect, obj))
-                used.add(i)
-                continue
-            if len(node2.entries) + remaining == self.m:
-                node2.entries.append((rect, obj))
-                used.add(i)
-                continue
-            mbr1 = node1.mbr()
-            mbr2 = node2.mbr()
-            inc1 = mbr1.enlarge_area_needed(rect)
-            inc2 = mbr2.enlarge_area_needed(rect)
-            if inc1 < inc2:
-                node1.entries.append((rect, obj))
-            elif inc2 < inc1:
-                node2.entries.append((rect, obj))
-            else:
-                if mbr1.area() < mbr2.area():
-                    node1.entries.append((rect, obj))
-                else:
-                    node2.entries.append((rect, obj))
-            used.add(i)
+        node2.entries = group2
         if not node1.leaf:
             for _, child in node1.entries:
                 child.parent = node1
         if not node2.leaf:
             for _, child in node2.entries:
                 child.parent = node2
-        return node1, node2
+        return node1, node2, mbr1, mbr2
+
+    def _distribute(self, entries: List[Tuple[Rect, Any]], s1: int, s2: int):
+        # Guttman distribution; group MBRs are grown incrementally
+        group1 = [entries[s1]]
+        group2 = [entries[s2]]
+        mbr1 = entries[s1][0]
+        mbr2 = entries[s2][0]
+        area1 = mbr1.area()
+        area2 = mbr2.area()
+        remaining = len(entries) - 2
+        for i, entry in enumerate(entries):
+            if i == s1 or i == s2:
+                continue
+            rect = entry[0]
+            u1 = mbr1.union(rect)
+            u2 = mbr2.union(rect)
+            if len(group1) + remaining == self.m:
+                to_first = True
+            elif len(group2) + remaining == self.m:
+                to_first = False
+            else:
+                inc1 = u1.area() - area1
+                inc2 = u2.area() - area2
+                if inc1 != inc2:
+                    to_first = inc1 < inc2
+                elif area1 != area2:
+                    to_first = area1 < area2
+                else:
+                    to_first = len(group1) < len(group2)
+            if to_first:
+                group1.append(entry)
+                mbr1 = u1
+                area1 = mbr1.area()
+            else:
+                group2.append(entry)
+                mbr2 = u2
+                area2 = mbr2.area()
+            remaining -= 1
+        return group1, group2, mbr1, mbr2
 
     def _pick_seeds(self, entries: List[Tuple[Rect, Any]]):
         max_d = -1.0
@@ -173,10 +1057,537 @@ class RTree:
                     seed1, seed2 = i, j
         return seed1, seed2
 
-    def _search_node(self, node: RTreeNode, query: Rect, res: List[Any]):
-        for rect, child in node.entries:
-            if rect.intersects(query):
+    def _linear_pick_seeds(self, entries: List[Tuple[Rect, Any]]):
+        best_sep = None
+        seeds = (0, 1)
+        bounds = [e[0].bounds for e in entries]
+        n = len(bounds)
+        d = self.dims
+        for axis in range(d):
+            lows = [float(b[axis]) for b in bounds]
+            highs = [float(b[axis + d]) for b in bounds]
+            width = max(highs) - min(lows)
+            highest_low = max(range(n), key=lows.__getitem__)
+            lowest_high = min(
+                (i for i in range(n) if i != highest_low), key=highs.__getitem__
+            )
+            sep = lows[highest_low] - highs[lowest_high]
+            if width > 0.0:
+                sep /= width
+            if best_sep is None or sep > best_sep:
+                best_sep = sep
+                seeds = (highest_low, lowest_high)
+        return seeds
+
+    def _split_rstar(self, entries: List[Tuple[Rect, Any]]):
+        n = len(entries)
+        m = self.m
+        best_margin = None
+        best_sorts = None
+        d = self.dims
+        for axis in range(d):
+            keys = (
+                lambda e, a=axis: (float(e[0].bounds[a]), float(e[0].bounds[a + d])),
+                lambda e, a=axis: (float(e[0].bounds[a + d]), float(e[0].bounds[a])),
+            )
+            margin = 0.0
+            sorts = []
+            for key in keys:
+                ordered = sorted(entries, key=key)
+                prefix, suffix = _prefix_suffix_mbrs(ordered)
+                for k in range(m, n - m + 1):
+                    margin += prefix[k - 1].margin() + suffix[k].margin()
+                sorts.append((ordered, prefix, suffix))
+            if best_margin is None or margin < best_margin:
+                best_margin = margin
+                best_sorts = sorts
+
+        best = None
+        for ordered, prefix, suffix in best_sorts:
+            for k in range(m, n - m + 1):
+                b1 = prefix[k - 1]
+                b2 = suffix[k]
+                key = (b1.overlap(b2), b1.area() + b2.area())
+                if best is None or key < best[0]:
+                    best = (key, ordered, k, b1, b2)
+        _, ordered, k, b1, b2 = best
+        return ordered[:k], ordered[k:], b1, b2
+
+
+_MISSING = object()
+
+
+def _obj_array(objs: List[Any]) -> np.ndarray:
+    # int64 when every object is an int, else an object array
+    if all(isinstance(o, (int, np.integer)) for o in objs):
+        return np.array(objs, dtype=np.int64)
+    out = np.empty(len(objs), dtype=object)
+    out[:] = objs
+    return out
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+# query_circle result with no hits, shared by every call
+_NO_CONTACTS = (_read_only(np.empty(0, dtype=np.int64)), _read_only(np.empty(0)),
+                _read_only(np.empty((0, 2))))
+
+
+def _mindist2(r: AnyBox, point: Tuple[float, ...]) -> float:
+    # squared distance from point to the closest point of box r
+    b = r.bounds
+    d = len(point)
+    s = 0.0
+    for i, p in enumerate(point):
+        lo = b[i]
+        hi = b[d + i]
+        if p < lo:
+            s += (lo - p) ** 2
+        elif p > hi:
+            s += (p - hi) ** 2
+    return float(s)
+
+
+def _boxes_from_array(bounds: np.ndarray) -> List[AnyBox]:
+    # Rect (2D) or Box per row; Box rows are read-only views into `bounds`,
+    # which the callers own and never modify
+    if bounds.shape[1] == 4:
+        return [Rect(*row) for row in bounds.tolist()]
+    view = bounds.view()
+    view.flags.writeable = False
+    out = []
+    new = Box.__new__
+    for row, coords in zip(view, bounds.tolist()):
+        box = new(Box)
+        box.bounds = row
+        box.coords = tuple(coords)
+        out.append(box)
+    return out
+
+
+def _str_groups(centers: np.ndarray, cap: int) -> List[np.ndarray]:
+    # Sort-Tile-Recursive: slice along each axis in turn so that every group
+    # holds <= cap rows; groups are split evenly, so each has >= cap // 2
+    dims = centers.shape[1]
+
+    def tile(idx: np.ndarray, axis: int) -> List[np.ndarray]:
+        pages = -(-len(idx) // cap)
+        idx = idx[np.argsort(centers[idx, axis], kind="stable")]
+        if axis == dims - 1 or pages == 1:
+            return np.array_split(idx, pages)
+        slabs = int(np.ceil(pages ** (1.0 / (dims - axis)) - 1e-9))
+        out = []
+        for part in np.array_split(idx, slabs):
+            out.extend(tile(part, axis + 1))
+        return out
+
+    return tile(np.arange(len(centers)), 0)
+
+
+def _union_volume(boxes: np.ndarray) -> float:
+    # exact volume of a union of boxes: compress the coordinates per axis
+    # and add up the grid cells covered by at least one box
+    d = boxes.shape[1] // 2
+    mids = []
+    volume = np.ones([1] * d)
+    for axis in range(d):
+        edges = np.unique(np.concatenate((boxes[:, axis], boxes[:, d + axis])))
+        if len(edges) < 2:
+            return 0.0
+        shape = [1] * d
+        shape[axis] = len(edges) - 1
+        mids.append(((edges[:-1] + edges[1:]) / 2.0).reshape(shape))
+        volume = volume * np.diff(edges).reshape(shape)
+    covered = np.zeros(volume.shape, dtype=bool)
+    for b in boxes:
+        inside = True
+        for axis, mid in enumerate(mids):
+            inside = inside & (mid >= b[axis]) & (mid <= b[d + axis])
+        covered |= inside
+    return float(volume[covered].sum())
+
+
+def _descend(start: np.ndarray, boxes: np.ndarray, refs: np.ndarray, height: int,
+             keep: Callable[[np.ndarray], np.ndarray],
+             stats: Optional[QueryStats],
+             overlap: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> np.ndarray:
+    # level-synchronous descent over flat BFS arrays: every node of the
+    # frontier is expanded at once and keep(boxes) filters the entries;
+    # returns the surviving leaf entry indices. With stats on, leaf entries
+    # are first filtered by overlap(boxes) (the query's bounding box) and
+    # counted as candidates, so the ones keep() then refines away show up
+    # as false positives
+    count = np.diff(start)
+    nodes = np.zeros(1, dtype=np.int64)
+    if stats is not None:
+        stats.queries += 1
+    for level in range(height):
+        entries, _ = _expand(nodes, start, count)
+        if stats is not None:
+            stats.nodes_visited += len(nodes)
+            stats.box_tests += len(entries)
+        if level == height - 1 and stats is not None:
+            stats.leaves_visited += len(nodes)
+            if overlap is not None:
+                entries = entries[overlap(boxes[entries])]
+                stats.candidates += len(entries)
+                exact = keep(boxes[entries])
+                stats.false_positives += len(entries) - int(exact.sum())
+                return entries[exact]
+            entries = entries[keep(boxes[entries])]
+            stats.candidates += len(entries)
+            return entries
+        entries = entries[keep(boxes[entries])]
+        if level == height - 1:
+            return entries
+        nodes = refs[entries]
+    return np.empty(0, dtype=np.int64)
+
+
+class CircleQuery:
+    """
+    Circle (ball) over `axes` of a `dims`-dimensional box space, with the
+    other axes tested against the intervals in `span`. keep() and contacts()
+    work on (n, 2 * dims) box arrays; every index that offers query_circle
+    uses it for the vectorised filter and refine steps.
+    """
+
+    def __init__(self, dims: int, center, radius: float, axes, span):
+        self.dims = dims
+        self.axes = np.arange(dims) if axes is None else np.asarray(axes, dtype=np.int64)
+        self.center = np.asarray(center, dtype=np.float64)
+        if self.center.shape != self.axes.shape:
+            raise ValueError(f"center needs {len(self.axes)} coordinates, got {self.center.shape}")
+        in_circle = set(self.axes.tolist())
+        self.others = [a for a in range(dims) if a not in in_circle]
+        self.span = [] if span is None else [(float(lo), float(hi)) for lo, hi in span]
+        if self.span and len(self.span) != len(self.others):
+            raise ValueError(f"span needs one (lo, hi) per axis {self.others}, got {len(self.span)}")
+        self.radius = float(radius)
+        self.r2 = self.radius ** 2
+
+    def bbox(self) -> Tuple[np.ndarray, np.ndarray]:
+        lo = np.full(self.dims, -np.inf)
+        hi = np.full(self.dims, np.inf)
+        lo[self.axes] = self.center - self.radius
+        hi[self.axes] = self.center + self.radius
+        for axis, (a, b) in zip(self.others, self.span):
+            lo[axis] = a
+            hi[axis] = b
+        return lo, hi
+
+    def overlaps(self, b: np.ndarray) -> np.ndarray:
+        """Filter step: boxes that intersect bbox(); a superset of keep()."""
+        lo, hi = self.bbox()
+        d = self.dims
+        return ((b[:, d:] >= lo) & (b[:, :d] <= hi)).all(axis=1)
+
+    def _gap(self, b: np.ndarray) -> np.ndarray:
+        d = self.dims
+        return self.center - np.clip(self.center, b[:, self.axes], b[:, d + self.axes])
+
+    def keep(self, b: np.ndarray) -> np.ndarray:
+        g = self._gap(b)
+        ok = np.einsum("ij,ij->i", g, g) < self.r2
+        d = self.dims
+        for axis, (lo, hi) in zip(self.others, self.span):
+            ok &= (b[:, d + axis] >= lo) & (b[:, axis] <= hi)
+        return ok
+
+    def contacts(self, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(dist, normals, nearest-first order) for boxes that passed keep()."""
+        d = self.dims
+        g = self._gap(b)
+        dist = np.sqrt(np.einsum("ij,ij->i", g, g))
+        inside = dist == 0.0
+        if inside.any():
+            # center inside the box: push out along center - box center
+            g[inside] = self.center - (b[inside][:, self.axes] + b[inside][:, d + self.axes]) / 2.0
+        length = np.sqrt(np.einsum("ij,ij->i", g, g))
+        still = length == 0.0
+        g[still] = 0.0
+        g[still, 0] = 1.0
+        length[still] = 1.0
+        return dist, g / length[:, None], np.argsort(dist, kind="stable")
+
+
+def _query_circle(start, boxes, refs, height, dims, center, radius, axes, span, stats):
+    circle = CircleQuery(dims, center, radius, axes, span)
+    hits = _descend(start, boxes, refs, height, circle.keep, stats, circle.overlaps)
+    dist, normals, order = circle.contacts(boxes[hits])
+    return hits[order], dist[order], normals[order]
+
+
+def _query_segment(start, boxes, refs, height, dims, p0, p1, stats):
+    p0 = np.asarray(p0, dtype=np.float64)
+    p1 = np.asarray(p1, dtype=np.float64)
+    if p0.shape != (dims,) or p1.shape != (dims,):
+        raise ValueError(f"segment end points need {dims} coordinates")
+    delta = p1 - p0
+    flat = delta == 0.0
+    with np.errstate(divide="ignore"):
+        inv = np.where(flat, 0.0, 1.0 / np.where(flat, 1.0, delta))
+
+    def slabs(b):
+        # slab method: parameter interval [t_near, t_far] inside each axis
+        lo = b[:, :dims]
+        hi = b[:, dims:]
+        t0 = (lo - p0) * inv
+        t1 = (hi - p0) * inv
+        near = np.minimum(t0, t1)
+        far = np.maximum(t0, t1)
+        inside = (p0 >= lo) & (p0 <= hi)
+        near = np.where(flat, np.where(inside, -np.inf, np.inf), near)
+        far = np.where(flat, np.where(inside, np.inf, -np.inf), far)
+        return near, far
+
+    def keep(b):
+        near, far = slabs(b)
+        return np.maximum(near.max(axis=1), 0.0) <= np.minimum(far.min(axis=1), 1.0)
+
+    lo = np.minimum(p0, p1)
+    hi = np.maximum(p0, p1)
+
+    def overlaps(b):
+        return ((b[:, dims:] >= lo) & (b[:, :dims] <= hi)).all(axis=1)
+
+    hits = _descend(start, boxes, refs, height, keep, stats, overlaps)
+    near, _ = slabs(boxes[hits])
+    axis = near.argmax(axis=1)
+    t_enter = near[np.arange(len(hits)), axis]
+    normals = np.zeros((len(hits), dims))
+    entering = t_enter > 0.0
+    rows = np.flatnonzero(entering)
+    normals[rows, axis[rows]] = -np.sign(delta[axis[rows]])
+    dist = np.maximum(t_enter, 0.0) * float(np.sqrt(delta @ delta))
+    order = np.argsort(dist, kind="stable")
+    return hits[order], dist[order], normals[order]
+
+
+def _near_arrays(a: np.ndarray, b: np.ndarray, d2: float, d: int) -> np.ndarray:
+    # row-wise: squared gap between boxes a[i] and b[i] is <= d2
+    gap = np.maximum(np.maximum(a[:, :d] - b[:, d:], b[:, :d] - a[:, d:]), 0.0)
+    return np.einsum("ij,ij->i", gap, gap) <= d2
+
+
+def _node_mbrs(start: np.ndarray, boxes: np.ndarray, d: int) -> np.ndarray:
+    first = start[:-1]
+    return np.concatenate((np.minimum.reduceat(boxes[:, :d], first),
+                           np.maximum.reduceat(boxes[:, d:], first)), axis=1)
+
+
+def _expand(nodes: np.ndarray, start: np.ndarray, count: np.ndarray):
+    # entry indices of every node in `nodes`, plus the position each came from
+    sizes = count[nodes]
+    rep = np.repeat(np.arange(len(nodes)), sizes)
+    offset = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return start[nodes][rep] + offset, rep
+
+
+def _restrict(nodes: np.ndarray, start: np.ndarray, count: np.ndarray, boxes: np.ndarray,
+              other_mbrs: np.ndarray, d2: float, d: int):
+    # entries of every nodes[k] within the distance of other_mbrs[k], grouped
+    # by k in order, plus how many each k kept
+    entries, rep = _expand(nodes, start, count)
+    keep = _near_arrays(boxes[entries], other_mbrs[rep], d2, d)
+    return entries[keep], np.bincount(rep[keep], minlength=len(nodes))
+
+
+def _expand_pairs(pa: np.ndarray, pb: np.ndarray, start_a: np.ndarray, count_a: np.ndarray,
+                  boxes_a: np.ndarray, mbr_a: np.ndarray, start_b: np.ndarray,
+                  count_b: np.ndarray, boxes_b: np.ndarray, mbr_b: np.ndarray, d2: float, d: int):
+    # candidate entry pairs (ea, eb) of every node pair (pa[k], pb[k]): only
+    # entries near the other node's MBR can be in a qualifying pair, so each
+    # side is restricted to those before the cross product
+    ea, na = _restrict(pa, start_a, count_a, boxes_a, mbr_b[pb], d2, d)
+    eb, nb = _restrict(pb, start_b, count_b, boxes_b, mbr_a[pa], d2, d)
+    sizes = na * nb
+    rep = np.repeat(np.arange(len(pa)), sizes)
+    k = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    first_a = (np.cumsum(na) - na)[rep]
+    first_b = (np.cumsum(nb) - nb)[rep]
+    nb = nb[rep]
+    return ea[first_a + k // nb], eb[first_b + k % nb], rep
+
+
+def _prefix_suffix_mbrs(ordered: List[Tuple[AnyBox, Any]]):
+    n = len(ordered)
+    prefix = [ordered[0][0]] * n
+    for i in range(1, n):
+        prefix[i] = prefix[i - 1].union(ordered[i][0])
+    suffix = [ordered[-1][0]] * n
+    for i in range(n - 2, -1, -1):
+        suffix[i] = suffix[i + 1].union(ordered[i][0])
+    return prefix, suffix
+
+
+def _flat_layout(n_nodes: int, n_entries: int, dims: int) -> List[int]:
+    sizes = (n_nodes, 8 * (n_nodes + 1), 16 * dims * n_entries, 8 * n_entries)
+    offsets = []
+    pos = FLAT_HEADER.size
+    for size in sizes:
+        pos = -(-pos // FLAT_ALIGN) * FLAT_ALIGN
+        offsets.append(pos)
+        pos += size
+    return offsets
+
+
+class FlatRTree:
+    """
+    Read-only R-tree over the flat arrays written by `RTree.save`.
+    Queries walk the arrays directly, one vectorised box test per node,
+    so a memory-mapped file is usable without any deserialisation.
+    """
+
+    changes = 0  # read-only: see RTree.changes
+
+    def __init__(self, M: int, m: int, split: str, dims: int, height: int,
+                 leaf: np.ndarray, start: np.ndarray,
+                 boxes: np.ndarray, refs: np.ndarray):
+        self.M = M
+        self.m = m
+        self.split = split
+        self.dims = dims
+        self.height = height
+        self.leaf = leaf
+        self.start = start
+        self.boxes = boxes
+        self.refs = refs
+
+    @classmethod
+    def open(cls, path: str, mmap: bool = True) -> "FlatRTree":
+        with open(path, "rb") as f:
+            raw = f.read(FLAT_HEADER.size)
+        if len(raw) < FLAT_HEADER.size:
+            raise ValueError(f"{path} is not a flat R-tree file")
+        (magic, version, M, m, split, dims, height,
+         n_nodes, n_entries) = FLAT_HEADER.unpack(raw)
+        if magic != FLAT_MAGIC:
+            raise ValueError(f"{path} is not a flat R-tree file")
+        if version != FLAT_VERSION:
+            raise ValueError(f"unsupported flat R-tree version {version}")
+
+        specs = (
+            (np.uint8, (n_nodes,)),
+            (np.int64, (n_nodes + 1,)),
+            (np.float64, (n_entries, 2 * dims)),
+            (np.int64, (n_entries,)),
+        )
+        arrays = []
+        for offset, (dtype, shape) in zip(_flat_layout(n_nodes, n_entries, dims), specs):
+            count = int(np.prod(shape))
+            if count == 0:
+                arrays.append(np.empty(shape, dtype=dtype))
+            elif mmap:
+                arrays.append(np.memmap(path, dtype=dtype, mode="r",
+                                        offset=offset, shape=shape))
+            else:
+                arrays.append(np.fromfile(path, dtype=dtype, count=count,
+                                          offset=offset).reshape(shape))
+        return cls(M, m, SPLIT_STRATEGIES[split], dims, height, *arrays)
+
+    def __len__(self) -> int:
+        leaf = np.asarray(self.leaf, dtype=bool)
+        return int((self.start[1:][leaf] - self.start[:-1][leaf]).sum())
+
+    def _hits(self, i: int, q: np.ndarray) -> np.ndarray:
+        s = self.start[i]
+        e = self.start[i + 1]
+        b = self.boxes[s:e]
+        d = self.dims
+        mask = (b[:, d:] >= q[:d]).all(axis=1) & (b[:, :d] <= q[d:]).all(axis=1)
+        return self.refs[s:e][mask]
+
+    def search_range(self, query: AnyBox) -> List[int]:
+        q = np.asarray(query.bounds, dtype=np.float64)
+        res: List[int] = []
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            hits = self._hits(i, q).tolist()
+            if self.leaf[i]:
+                res.extend(hits)
+            else:
+                stack.extend(hits)
+        return res
+
+    def iter_range(self, query: AnyBox) -> Iterator[int]:
+        q = np.asarray(query.bounds, dtype=np.float64)
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            hits = self._hits(i, q).tolist()
+            if self.leaf[i]:
+                yield from hits
+            else:
+                stack.extend(hits)
+
+    def count_range(self, query: AnyBox) -> int:
+        q = np.asarray(query.bounds, dtype=np.float64)
+        count = 0
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            hits = self._hits(i, q)
+            if self.leaf[i]:
+                count += hits.size
+            else:
+                stack.extend(hits.tolist())
+        return count
+
+    def any_in_range(self, query: AnyBox) -> bool:
+        q = np.asarray(query.bounds, dtype=np.float64)
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            hits = self._hits(i, q)
+            if self.leaf[i]:
+                if hits.size:
+                    return True
+            else:
+                stack.extend(hits.tolist())
+        return False
+
+    def query_circle(self, center: Sequence[float], radius: float,
+                     axes: Optional[Sequence[int]] = None,
+                     span: Optional[Sequence[Tuple[float, float]]] = None):
+        """Same as RTree.query_circle."""
+        hits, dist, normals = _query_circle(self.start, self.boxes, self.refs, self.height,
+                                            self.dims, center, radius, axes, span, None)
+        return np.asarray(self.refs[hits]), dist, normals
+
+    def any_in_circle(self, center: Sequence[float], radius: float,
+                      axes: Optional[Sequence[int]] = None,
+                      span: Optional[Sequence[Tuple[float, float]]] = None) -> bool:
+        """Same as RTree.any_in_circle."""
+        return len(self.query_circle(center, radius, axes, span)[0]) > 0
+
+    def query_segment(self, p0: Sequence[float], p1: Sequence[float]):
+        """Same as RTree.query_segment."""
+        hits, dist, normals = _query_segment(self.start, self.boxes, self.refs, self.height,
+                                             self.dims, p0, p1, None)
+        return np.asarray(self.refs[hits]), dist, normals
+
+    def to_rtree(self) -> RTree:
+        tree = RTree(self.M, self.m, split=self.split, dims=self.dims)
+        tree.height = self.height
+        nodes = [RTreeNode(leaf=bool(flag)) for flag in self.leaf]
+        for i, node in enumerate(nodes):
+            for k in range(self.start[i], self.start[i + 1]):
+                if self.dims == 2:
+                    rect = Rect(*self.boxes[k].tolist())
+                else:
+                    rect = Box(np.array(self.boxes[k]))
+                ref = int(self.refs[k])
                 if node.leaf:
-                    res.append(child)
+                    node.entries.append((rect, ref))
                 else:
-                    self._search_node(child, query, res)
+                    child = nodes[ref]
+                    child.parent = node
+                    node.entries.append((rect, child))
+        if nodes:
+            tree.root = nodes[0]
+        return tree
@@ -0,0 +1,402 @@
+"""Record and replay robot simulation traces as memory-mapped .npy columns.
+
+The robot scripts take `dt` from the wall clock and, without a seed, draw
+obstacles and targets from an unseeded `random`, so no run can be repeated.
+A trace is a directory with
+
+- meta.json: variant, seed, script flags, start state, tick count
+- obstacles.npy: the (n, 6) obstacle rows (cx, cy, cz, sx, sy, sz)
+- one .npy file per column in COLUMNS, one row per tick
+
+TraceWriter appends a row after every step_simulation(dt) call into
+memory-mapped columns (doubled when full, cut to length on close), from
+robot_sim.RobotSim or from a script's window loop (`--record DIR`). Trace
+opens the columns memory-mapped again.
+
+replay() loads a variant with the recorded seed and flags, puts robot and
+target at the recorded start, hands out the recorded targets in order
+(instead of the variant's own choose_target_not_touching) and steps with
+the recorded dt sequence. Replaying the recording variant reproduces the
+trace exactly; replaying another variant (robot_1 vs robot_2 share the
+obstacle layout of a seed) runs it on the identical scenario, for timing
+and behaviour comparisons. The scripts' `--replay DIR` re-drives only the
+renderer from the recorded states and camera angles.
+
+The scripts get their --seed / --record / --replay flags and the seeding
+from cli_setup(), and hand each window-loop frame to ScriptTrace.frame(),
+which steps and records it or plays the next recorded tick back.
+
+Usage:
+    python sim_trace.py record traces/r2 --variant robot_2 --steps 5000 --seed 3
+    python sim_trace.py replay traces/r2 --variants robot_1 robot_2
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+COLUMNS = {
+    "dt": np.float64,
+    "robot_x": np.float64,
+    "robot_z": np.float64,
+    "robot_y": np.float64,       # jump height offset
+    "target_x": np.float64,
+    "target_z": np.float64,
+    "jumping": np.uint8,
+    "new_target": np.uint8,      # a new target was chosen this tick
+    "new_jump": np.uint8,        # a jump started this tick
+    "new_collisions": np.uint16,  # obstacles touched this tick, not on the last
+    "angle_x": np.float64,       # camera, for renderer replay
+    "angle_y": np.float64,
+}
+
+World = Union[dict, object]  # a robot script module or its globals()
+
+# target choosers replay() swaps out (robot_1 picks targets without a check)
+_TARGET_CHOOSERS = ("choose_target_not_touching", "choose_target_no_check")
+
+
+def _ns(world: World) -> dict:
+    return world if isinstance(world, dict) else vars(world)
+
+
+def read_meta(path: str) -> dict:
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+class TraceWriter:
+    """
+    Appends one row per tick to the trace directory `path`. The start state
+    and obstacles are taken from `world` when the writer is created, so
+    create it right before the first step.
+    """
+
+    def __init__(self, path: str, world: World, variant: str, seed: Optional[int],
+                 argv: Sequence[str] = (), capacity: int = 1 << 12):
+        ns = _ns(world)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = {
+            "variant": variant,
+            "seed": seed,
+            "argv": list(argv),
+            "start": {"robot": [float(v) for v in ns["robot_pos"]],
+                      "target": [float(v) for v in ns["target_pos"]]},
+            "ticks": 0,
+        }
+        np.save(os.path.join(path, "obstacles.npy"),
+                np.asarray(ns["obstacles"], dtype=np.float64).reshape(-1, 6))
+        self.length = 0
+        self.capacity = max(1, capacity)
+        self._cols = {name: open_memmap(self._file(name), mode="w+", dtype=dtype,
+                                        shape=(self.capacity,))
+                      for name, dtype in COLUMNS.items()}
+        self._target = ns["target_pos"]
+        self._jumping = bool(ns["jump_active"])
+        self._hit = list(ns["collision_active"])
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name + ".npy")
+
+    def _resize(self, size: int):
+        # the old map is dropped before its file is rewritten (Windows
+        # cannot replace a mapped file), so one column at a time is in RAM
+        keep = min(size, self.length)
+        for name in COLUMNS:
+            data = np.array(self._cols[name][:keep])
+            self._cols[name] = None
+            col = open_memmap(self._file(name), mode="w+", dtype=data.dtype, shape=(size,))
+            col[:keep] = data
+            self._cols[name] = col
+        self.capacity = size
+
+    def append(self, world: World, dt: float, angle_x: float = 0.0, angle_y: float = 0.0):
+        """Record the state of `world` after a step of `dt` seconds."""
+        ns = _ns(world)
+        if self.length == self.capacity:
+            self._resize(2 * self.capacity)
+        hit = ns["collision_active"]
+        target = ns["target_pos"]
+        jumping = bool(ns["jump_active"])
+        i = self.length
+        c = self._cols
+        c["dt"][i] = dt
+        c["robot_x"][i], c["robot_z"][i] = ns["robot_pos"]
+        c["robot_y"][i] = ns["jump_y_offset"]
+        c["target_x"][i], c["target_z"][i] = target
+        c["jumping"][i] = jumping
+        c["new_target"][i] = target is not self._target
+        c["new_jump"][i] = jumping and not self._jumping
+        c["new_collisions"][i] = sum(1 for a, b in zip(self._hit, hit) if b and not a)
+        c["angle_x"][i] = angle_x
+        c["angle_y"][i] = angle_y
+        self._target = target
+        self._jumping = jumping
+        self._hit = list(hit)
+        self.length += 1
+
+    def close(self):
+        """Cut the columns to the recorded length and write meta.json."""
+        if self._cols is None:
+            return
+        self._resize(self.length)
+        for col in self._cols.values():
+            col.flush()
+        self._cols = None
+        self.meta["ticks"] = self.length
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Trace:
+    """A recorded trace; columns are read-only memory maps."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.meta = read_meta(path)
+        self.obstacles = np.load(os.path.join(path, "obstacles.npy"))
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in COLUMNS}
+
+    def __len__(self) -> int:
+        return self.meta["ticks"]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def targets(self) -> np.ndarray:
+        """(k, 2) targets in the order they were chosen, after the start target."""
+        sel = self["new_target"] != 0
+        return np.stack([self["target_x"][sel], self["target_z"][sel]], axis=1)
+
+    def totals(self) -> Dict[str, int]:
+        return {"targets": int(self["new_target"].sum()),
+                "collisions": int(self["new_collisions"].sum(dtype=np.int64)),
+                "jumps": int(self["new_jump"].sum())}
+
+    def check_obstacles(self, world: World, variant: str):
+        """Raise ValueError unless `world` has the recorded obstacles."""
+        obstacles = np.asarray(_ns(world)["obstacles"], dtype=np.float64).reshape(-1, 6)
+        if obstacles.shape != self.obstacles.shape or not np.array_equal(obstacles, self.obstacles):
+            raise ValueError(f"{variant} builds a different obstacle layout than the "
+                             f"{self.meta['variant']} trace for seed {self.meta['seed']}")
+
+    def apply(self, tick: int, world: World):
+        """Put the robot state of `tick` into `world`; returns (dt, angle_x, angle_y)."""
+        ns = _ns(world)
+        c = self.columns
+        ns["robot_pos"][0] = float(c["robot_x"][tick])
+        ns["robot_pos"][1] = float(c["robot_z"][tick])
+        ns["jump_y_offset"] = float(c["robot_y"][tick])
+        ns["jump_active"] = bool(c["jumping"][tick])
+        target = [float(c["target_x"][tick]), float(c["target_z"][tick])]
+        if target != ns["target_pos"]:
+            ns["target_pos"] = target
+        return float(c["dt"][tick]), float(c["angle_x"][tick]), float(c["angle_y"][tick])
+
+
+# ---------- robot script window loops ----------
+
+
+def cli_setup(parser: argparse.ArgumentParser) -> argparse.Namespace:
+    """
+    Add --seed / --record / --replay to a script's flag parser, parse the
+    known flags of sys.argv and seed `random`: with the recorded seed for
+    --replay, a fresh one for --record without --seed. args.seed is the
+    seed in use (None when `random` was left alone).
+    """
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--record", default=None, metavar="DIR")
+    parser.add_argument("--replay", default=None, metavar="DIR")
+    args = parser.parse_known_args()[0]
+    if args.replay:
+        args.seed = read_meta(args.replay)["seed"]
+    elif args.record and args.seed is None:
+        args.seed = random.randrange(2 ** 32)
+    if args.seed is not None:
+        random.seed(args.seed)
+    return args
+
+
+class ScriptTrace:
+    """
+    --record / --replay in a script's window loop. Create it right before
+    the loop, since the recorder takes the start state of `world` then;
+    `step` is the script's step_simulation and `argv` the script flags
+    stored in the trace.
+    """
+
+    def __init__(self, args: argparse.Namespace, world: World, variant: str,
+                 step: Callable[..., None], argv: Sequence[str] = ()):
+        self.world = world
+        self.step = step
+        self.recorder = None
+        if args.record:
+            self.recorder = TraceWriter(args.record, world, variant, args.seed, argv)
+        self.replay = None
+        if args.replay:
+            self.replay = Trace(args.replay)
+            self.replay.check_obstacles(world, variant)
+        self.tick = 0
+
+    def frame(self, dt: float, angle_x: float, angle_y: float,
+              *step_args) -> Optional[Tuple[float, float, float]]:
+        """
+        Advance one frame: step(dt, *step_args) and record it, or put the
+        next recorded tick into the world. Returns the (dt, angle_x,
+        angle_y) to render with, None when the replay is over.
+        """
+        if self.replay is not None:
+            if self.tick >= len(self.replay):
+                return None
+            self.tick += 1
+            return self.replay.apply(self.tick - 1, self.world)
+        self.step(dt, *step_args)
+        if self.recorder is not None:
+            self.recorder.append(self.world, dt, angle_x, angle_y)
+        return dt, angle_x, angle_y
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+# ---------- headless record / replay ----------
+
+
+def record(path: str, variant: str, steps: int, seed: int = 0, dt: float = 1.0 / 60.0,
+           argv: Sequence[str] = ()) -> Trace:
+    """Run `steps` fixed-dt steps of `variant` with robot_sim.RobotSim and record them."""
+    from robot_sim import RobotSim
+
+    sim = RobotSim(variant, seed=seed, dt=dt, argv=argv)
+    with TraceWriter(path, sim.world, variant, seed, argv, capacity=steps) as writer:
+        for _ in range(steps):
+            sim.step()
+            writer.append(sim.world, sim.dt)
+    return Trace(path)
+
+
+@dataclass
+class ReplayReport:
+    variant: str
+    steps: int
+    wall_seconds: float
+    targets_reached: int
+    collisions: int
+    jumps: int
+    diverged_at: Optional[int]  # first tick whose position differs from the trace
+    max_deviation: float
+
+    @property
+    def steps_per_sec(self) -> float:
+        return self.steps / self.wall_seconds if self.wall_seconds > 0 else float("inf")
+
+
+def replay(trace: Trace, variant: Optional[str] = None, tolerance: float = 1e-9) -> ReplayReport:
+    """
+    Re-run the scenario of `trace` (seed, start, target sequence, dt
+    sequence) with `variant` (default: the recorded one). Raises ValueError
+    when the variant builds a different obstacle layout for the seed.
+    """
+    from robot_sim import RobotSim
+
+    variant = variant or trace.meta["variant"]
+    sim = RobotSim(variant, seed=trace.meta["seed"], argv=trace.meta["argv"])
+    ns = vars(sim.world)
+    trace.check_obstacles(ns, variant)
+
+    start = trace.meta["start"]
+    ns["robot_pos"][:] = start["robot"]
+    ns["target_pos"] = list(start["target"])
+    # the recorded targets in order, then the variant's own choice
+    targets: List[List[float]] = trace.targets.tolist()[::-1]
+    chooser = next(name for name in _TARGET_CHOOSERS if name in ns)
+    own_choice = ns[chooser]
+
+    def next_target(*args, **kwargs):
+        return targets.pop() if targets else own_choice(*args, **kwargs)
+
+    ns[chooser] = next_target
+    if "replan" in ns:
+        ns["replan"]()
+
+    dts = trace["dt"].tolist()
+    xs = trace["robot_x"]
+    zs = trace["robot_z"]
+    pos = np.empty((len(dts), 2))
+    t0 = time.perf_counter()
+    for i, dt in enumerate(dts):
+        sim.step(dt)
+        pos[i] = ns["robot_pos"]
+    wall = time.perf_counter() - t0
+
+    dev = np.maximum(np.abs(pos[:, 0] - xs), np.abs(pos[:, 1] - zs))
+    off = np.flatnonzero(dev > tolerance)
+    return ReplayReport(variant, len(dts), wall, sim.targets_reached, sim.collisions, sim.jumps,
+                        int(off[0]) if len(off) else None,
+                        float(dev.max()) if len(dev) else 0.0)
+
+
+def main():
+    from robot_sim import VARIANTS
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="record a fixed-dt headless run")
+    rec.add_argument("path")
+    rec.add_argument("--variant", choices=VARIANTS, default="robot_2")
+    rec.add_argument("--steps", type=int, default=5000)
+    rec.add_argument("--dt", type=float, default=1.0 / 60.0)
+    rec.add_argument("--seed", type=int, default=0)
+    rec.add_argument("--index", choices=("rtree", "grid"), default="rtree")
+    rec.add_argument("--planner", choices=("none", "astar", "theta"), default="astar")
+    rep = sub.add_parser("replay", help="replay a trace with one or more variants")
+    rep.add_argument("path")
+    rep.add_argument("--variants", nargs="+", choices=VARIANTS, default=None,
+                     help="default: the recorded variant")
+    args = ap.parse_args()
+
+    if args.cmd == "record":
+        argv = ["--index", args.index, "--planner", args.planner]
+        t0 = time.perf_counter()
+        trace = record(args.path, args.variant, args.steps, args.seed, args.dt, argv)
+        size = sum(os.path.getsize(os.path.join(args.path, f)) for f in os.listdir(args.path))
+        print(f"{args.variant}: {len(trace)} ticks in {time.perf_counter() - t0:.1f} s, "
+              f"{size / 1024:.0f} KiB, {trace.totals()}")
+        return
+
+    trace = Trace(args.path)
+    meta = trace.meta
+    print(f"trace {args.path}: {meta['variant']} seed={meta['seed']} {' '.join(meta['argv'])} "
+          f"ticks={len(trace)} {trace.totals()}")
+    print(f"{'variant':>8} {'steps/s':>10} {'targets':>8} {'collisions':>10} {'jumps':>6} "
+          f"{'diverged':>9} {'max dev':>9}")
+    for variant in args.variants or [meta["variant"]]:
+        try:
+            r = replay(trace, variant)
+        except ValueError as e:
+            print(f"{variant:>8} skipped: {e}")
+            continue
+        diverged = "-" if r.diverged_at is None else str(r.diverged_at)
+        print(f"{r.variant:>8} {r.steps_per_sec:>10.0f} {r.targets_reached:>8} {r.collisions:>10} "
+              f"{r.jumps:>6} {diverged:>9} {r.max_deviation:>9.3g}")
+
+
+if __name__ == "__main__":
+    main()
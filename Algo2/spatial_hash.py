@@ -0,0 +1,283 @@
+"""Uniform-grid spatial hash: an alternative broad phase to RTree.
+
+Every box is listed in each cell it overlaps; a cell is the key
+(floor(x / cell), floor(y / cell), ...) of a dict bucket. When the objects
+all have about the same size (e.g. the equal obstacles in robot_3.py),
+cells sized to that extent keep every bucket tiny and a query only looks
+at a handful of cells, with no tree to descend. Boxes live in one growing
+NumPy array and each bucket is cached as an index array, so testing the
+candidates of a query is a single vectorised comparison.
+"""
+
+import itertools
+import math
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rtree_lib import AnyBox, CircleQuery
+
+Key = Tuple[int, ...]
+
+# nearest() walks rings cell by cell while a ring has at most this many
+# cells, then switches to scanning the array of occupied cells
+NEAREST_RING_CELLS = 125
+
+
+class SpatialHashGrid:
+    """
+    Drop-in alternative to RTree for similar-sized boxes: same insert /
+    delete / search_range / iter_range / count_range / any_in_range /
+    nearest / query_circle interface, including the `changes` counter.
+    `cell_size=None` sizes the cells to the largest extent of the first
+    inserted box.
+    """
+
+    def __init__(self, cell_size: Optional[float] = None, dims: int = 2):
+        if dims < 1:
+            raise ValueError(f"dims must be >= 1, got {dims}")
+        if cell_size is not None and cell_size <= 0.0:
+            raise ValueError(f"cell_size must be > 0, got {cell_size}")
+        self.cell = cell_size
+        self.dims = dims
+        self._boxes = np.empty((16, 2 * dims), dtype=np.float64)
+        self._objs = np.empty(16, dtype=np.int64)
+        self._count = 0
+        self._size = 0
+        self._buckets: Dict[Key, List[int]] = {}
+        self._arrays: Dict[Key, np.ndarray] = {}
+        self._keys: Optional[np.ndarray] = None
+        self._key_list: List[Key] = []
+        self._kmin: Optional[List[int]] = None
+        self._kmax: Optional[List[int]] = None
+        self.changes = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ---------- updates ----------
+
+    def insert(self, rect: AnyBox, obj: Any):
+        if rect.dims != self.dims:
+            raise ValueError(f"{rect.dims}D box inserted into a {self.dims}D SpatialHashGrid")
+        bounds = np.asarray(rect.bounds, dtype=np.float64)
+        if self.cell is None:
+            extent = float((bounds[self.dims:] - bounds[:self.dims]).max())
+            self.cell = extent if extent > 0.0 else 1.0
+        if self._count == len(self._boxes):
+            self._grow()
+        if self._objs.dtype != object and not isinstance(obj, (int, np.integer)):
+            self._objs = self._objs.astype(object)
+        i = self._count
+        self._boxes[i] = bounds
+        self._objs[i] = obj
+        self._count += 1
+        self._size += 1
+        self.changes += 1
+
+        lo, hi = self._key_range(bounds)
+        if self._kmin is None:
+            self._kmin, self._kmax = lo, hi
+        else:
+            self._kmin = [min(a, b) for a, b in zip(self._kmin, lo)]
+            self._kmax = [max(a, b) for a, b in zip(self._kmax, hi)]
+        for key in itertools.product(*(range(a, b + 1) for a, b in zip(lo, hi))):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = [i]
+                self._keys = None
+            else:
+                bucket.append(i)
+                self._arrays.pop(key, None)
+
+    def delete(self, rect: AnyBox, obj: Any) -> bool:
+        """Remove the entry (rect, obj); False if it is not in the grid."""
+        bounds = np.asarray(rect.bounds, dtype=np.float64)
+        if self._size == 0:
+            return False
+        ids = self._candidates(bounds[:self.dims].tolist(), bounds[self.dims:].tolist())
+        match = [i for i in ids.tolist()
+                 if self._objs[i] == obj and np.array_equal(self._boxes[i], bounds)]
+        if not match:
+            return False
+        i = match[0]
+        lo, hi = self._key_range(bounds)
+        for key in itertools.product(*(range(a, b + 1) for a, b in zip(lo, hi))):
+            bucket = self._buckets[key]
+            bucket.remove(i)
+            if not bucket:
+                del self._buckets[key]
+                self._keys = None
+            self._arrays.pop(key, None)
+        self._size -= 1
+        self.changes += 1
+        return True
+
+    # ---------- queries ----------
+
+    def search_range(self, query: AnyBox) -> List[Any]:
+        return self._objs[self._range_ids(query)].tolist()
+
+    def iter_range(self, query: AnyBox) -> Iterator[Any]:
+        return iter(self.search_range(query))
+
+    def count_range(self, query: AnyBox) -> int:
+        return len(self._range_ids(query))
+
+    def any_in_range(self, query: AnyBox) -> bool:
+        return len(self._range_ids(query)) > 0
+
+    def nearest(self, point: Sequence[float], k: int = 1) -> List[Any]:
+        """
+        The k objects whose boxes are closest to `point`, nearest first.
+        Cells are taken in growing square rings around the point's cell
+        until the k-th distance found is closer than any cell outside the
+        rings taken so far: ring by ring near the point, then (for sparse
+        regions) by doubling the ring over the array of occupied cells.
+        """
+        p = np.asarray(point, dtype=np.float64)
+        if p.shape != (self.dims,):
+            raise ValueError(f"{len(point)}D point queried on a {self.dims}D SpatialHashGrid")
+        if k < 1 or self._size == 0:
+            return []
+        home = [math.floor(v / self.cell) for v in p.tolist()]
+        found: List[int] = []
+        ring = 0
+        while (2 * ring + 1) ** self.dims <= NEAREST_RING_CELLS:
+            for key in itertools.product(*(range(h - ring, h + ring + 1) for h in home)):
+                if max(abs(a - h) for a, h in zip(key, home)) == ring:
+                    found.extend(self._buckets.get(key, ()))
+            cand = self._settled(found, p, k, ring)
+            if cand is not None:
+                return self._k_nearest(cand, p, k)
+            ring += 1
+
+        if self._keys is None:
+            self._key_list = list(self._buckets)
+            self._keys = np.array(self._key_list, dtype=np.int64).reshape(-1, self.dims)
+        ring_of = np.abs(self._keys - np.array(home)).max(axis=1)
+        while True:
+            near = np.flatnonzero(ring_of <= ring)
+            found = [i for j in near.tolist() for i in self._buckets[self._key_list[j]]]
+            cand = np.unique(np.array(found, dtype=np.int64))
+            if len(near) == len(ring_of):
+                return self._k_nearest(cand, p, k)
+            if len(cand) < k:
+                ring = 2 * ring + 1
+                continue
+            kth = np.partition(self._dist2(cand, p), k - 1)[k - 1]
+            if kth <= (ring * self.cell) ** 2:
+                return self._k_nearest(cand, p, k)
+            # the k-th candidate bounds the answer: one more ring suffices
+            ring = max(ring + 1, math.ceil(math.sqrt(kth) / self.cell))
+
+    def query_circle(self, center: Sequence[float], radius: float,
+                     axes: Optional[Sequence[int]] = None,
+                     span: Optional[Sequence[Tuple[float, float]]] = None):
+        """Same contract as RTree.query_circle: (objs, dist, normals), nearest first."""
+        circle = CircleQuery(self.dims, center, radius, axes, span)
+        lo, hi = circle.bbox()
+        ids = (self._candidates(lo.tolist(), hi.tolist()) if self._size
+               else np.empty(0, dtype=np.int64))
+        ids = ids[circle.keep(self._boxes[ids])]
+        dist, normals, order = circle.contacts(self._boxes[ids])
+        return self._objs[ids[order]], dist[order], normals[order]
+
+    def any_in_circle(self, center: Sequence[float], radius: float,
+                      axes: Optional[Sequence[int]] = None,
+                      span: Optional[Sequence[Tuple[float, float]]] = None) -> bool:
+        """Same contract as RTree.any_in_circle."""
+        return len(self.query_circle(center, radius, axes, span)[0]) > 0
+
+    # ---------- internal ----------
+
+    def _grow(self):
+        n = 2 * len(self._boxes)
+        boxes = np.empty((n, 2 * self.dims), dtype=np.float64)
+        boxes[:self._count] = self._boxes[:self._count]
+        objs = np.empty(n, dtype=self._objs.dtype)
+        objs[:self._count] = self._objs[:self._count]
+        self._boxes = boxes
+        self._objs = objs
+
+    def _key_range(self, bounds: np.ndarray) -> Tuple[List[int], List[int]]:
+        d = self.dims
+        c = self.cell
+        b = bounds.tolist()
+        return ([math.floor(v / c) for v in b[:d]], [math.floor(v / c) for v in b[d:]])
+
+    def _bucket(self, key: Key) -> np.ndarray:
+        arr = self._arrays.get(key)
+        if arr is None:
+            arr = np.array(self._buckets[key], dtype=np.int64)
+            self._arrays[key] = arr
+        return arr
+
+    def _candidates(self, lo, hi) -> np.ndarray:
+        # ids listed in any cell overlapping [lo, hi]; infinite bounds are
+        # clipped to the occupied key range
+        c = self.cell
+        klo = []
+        khi = []
+        n_cells = 1
+        for v, w, kmin, kmax in zip(lo, hi, self._kmin, self._kmax):
+            a = kmin if v == -math.inf else max(math.floor(v / c), kmin)
+            b = kmax if w == math.inf else min(math.floor(w / c), kmax)
+            if a > b:
+                return np.empty(0, dtype=np.int64)
+            klo.append(a)
+            khi.append(b)
+            n_cells *= b - a + 1
+        buckets = self._buckets
+        if n_cells == 1:
+            key = tuple(klo)
+            return self._bucket(key) if key in buckets else np.empty(0, dtype=np.int64)
+        if n_cells > len(buckets):
+            keys = [key for key in buckets
+                    if all(a <= k <= b for k, a, b in zip(key, klo, khi))]
+        else:
+            keys = [key for key in itertools.product(*(range(a, b + 1) for a, b in zip(klo, khi)))
+                    if key in buckets]
+        if len(keys) == 1:
+            return self._bucket(keys[0])
+        ids = []
+        for key in keys:
+            ids.extend(buckets[key])
+        # boxes spanning several cells are listed more than once
+        return np.unique(np.array(ids, dtype=np.int64))
+
+    def _range_ids(self, query: AnyBox) -> np.ndarray:
+        if query.dims != self.dims:
+            raise ValueError(f"{query.dims}D query on a {self.dims}D SpatialHashGrid")
+        if self._size == 0:
+            return np.empty(0, dtype=np.int64)
+        q = np.asarray(query.bounds, dtype=np.float64)
+        d = self.dims
+        ids = self._candidates(q[:d].tolist(), q[d:].tolist())
+        b = self._boxes[ids]
+        hit = (b[:, d:] >= q[:d]).all(axis=1) & (b[:, :d] <= q[d:]).all(axis=1)
+        return ids[hit]
+
+    def _settled(self, found: List[int], p: np.ndarray, k: int, ring: int) -> Optional[np.ndarray]:
+        # the ids found so far, if they already contain the k nearest: every
+        # box not found yet only touches cells beyond `ring`
+        if len(found) < k:
+            return None
+        # boxes spanning several cells are listed more than once
+        cand = np.unique(np.array(found, dtype=np.int64))
+        if len(cand) < k:
+            return None
+        d2 = self._dist2(cand, p)
+        if np.partition(d2, k - 1)[k - 1] <= (ring * self.cell) ** 2:
+            return cand
+        return None
+
+    def _k_nearest(self, cand: np.ndarray, p: np.ndarray, k: int) -> List[Any]:
+        order = np.argsort(self._dist2(cand, p), kind="stable")[:k]
+        return self._objs[cand[order]].tolist()
+
+    def _dist2(self, ids: np.ndarray, p: np.ndarray) -> np.ndarray:
+        b = self._boxes[ids]
+        d = self.dims
+        gap = np.maximum(np.maximum(b[:, :d] - p, p - b[:, d:]), 0.0)
+        return np.einsum("ij,ij->i", gap, gap)
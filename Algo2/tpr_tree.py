@@ -0,0 +1,341 @@
+"""Time-parameterized R-tree (TPR-tree) for moving rectangles in 2D.
+
+Every leaf entry stores a reference rectangle at time `t_ref` plus a
+velocity, so its position at any later time is `rect + v * (t - t_ref)`.
+Node bounds are time-parameterized too: the lower edges move with the
+smallest child velocity and the upper edges with the largest, so a node
+keeps enclosing its children as time passes without touching the index.
+Objects only need an `update` when their velocity changes.
+
+Queries ask "what intersects `query` at time t" (`search_at`) or "at any
+moment in [t1, t2]" (`search_between`) for times >= the last update.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from rtree_lib import Rect
+
+
+class TPBR:
+    """Time-parameterized bounding rectangle, valid for t >= t_ref."""
+
+    __slots__ = ("xmin", "ymin", "xmax", "ymax",
+                 "vxmin", "vymin", "vxmax", "vymax", "t_ref")
+
+    def __init__(self, xmin, ymin, xmax, ymax, vxmin, vymin, vxmax, vymax, t_ref):
+        self.xmin = xmin
+        self.ymin = ymin
+        self.xmax = xmax
+        self.ymax = ymax
+        self.vxmin = vxmin
+        self.vymin = vymin
+        self.vxmax = vxmax
+        self.vymax = vymax
+        self.t_ref = t_ref
+
+    @classmethod
+    def moving(cls, rect: Rect, velocity: Tuple[float, float], t: float) -> "TPBR":
+        vx, vy = velocity
+        return cls(rect.xmin, rect.ymin, rect.xmax, rect.ymax, vx, vy, vx, vy, t)
+
+    def at(self, t: float) -> Rect:
+        dt = t - self.t_ref
+        return Rect(self.xmin + self.vxmin * dt, self.ymin + self.vymin * dt,
+                    self.xmax + self.vxmax * dt, self.ymax + self.vymax * dt)
+
+    def rebased(self, t: float) -> "TPBR":
+        r = self.at(t)
+        return TPBR(r.xmin, r.ymin, r.xmax, r.ymax,
+                    self.vxmin, self.vymin, self.vxmax, self.vymax, t)
+
+    def union(self, other: "TPBR", t: float) -> "TPBR":
+        a = self.at(t)
+        b = other.at(t)
+        return TPBR(min(a.xmin, b.xmin), min(a.ymin, b.ymin),
+                    max(a.xmax, b.xmax), max(a.ymax, b.ymax),
+                    min(self.vxmin, other.vxmin), min(self.vymin, other.vymin),
+                    max(self.vxmax, other.vxmax), max(self.vymax, other.vymax), t)
+
+    def area_integral(self, t: float, horizon: float) -> float:
+        """Integral of the area over [t, t + horizon] (TPR-tree insertion metric)."""
+        r = self.at(t)
+        w = r.xmax - r.xmin
+        h = r.ymax - r.ymin
+        dw = self.vxmax - self.vxmin
+        dh = self.vymax - self.vymin
+        H = horizon
+        return w * h * H + (w * dh + h * dw) * H * H / 2.0 + dw * dh * H ** 3 / 3.0
+
+    def intersects_at(self, q: Rect, t: float) -> bool:
+        return self.at(t).intersects(q)
+
+    def intersects_during(self, q: Rect, t1: float, t2: float) -> bool:
+        # each edge moves linearly, so every overlap condition holds on a
+        # half-line of t; the box hits q iff the intersection with [t1, t2]
+        # of all four half-lines is non-empty
+        lo, hi = t1, t2
+        for c, v in (
+            (self.xmin - q.xmax, self.vxmin),   # xmin(t) <= q.xmax
+            (q.xmin - self.xmax, -self.vxmax),  # xmax(t) >= q.xmin
+            (self.ymin - q.ymax, self.vymin),
+            (q.ymin - self.ymax, -self.vymax),
+        ):
+            # c + v * (t - t_ref) <= 0
+            if v == 0.0:
+                if c > 0.0:
+                    return False
+            elif v > 0.0:
+                hi = min(hi, self.t_ref - c / v)
+            else:
+                lo = max(lo, self.t_ref - c / v)
+            if lo > hi:
+                return False
+        return True
+
+
+class TPRNode:
+    def __init__(self, leaf: bool = True, parent: "TPRNode" = None):
+        self.leaf = leaf
+        self.entries: List[Tuple[TPBR, Any]] = []
+        self.parent: Optional["TPRNode"] = parent
+
+    def bounds(self, t: float) -> Optional[TPBR]:
+        if not self.entries:
+            return None
+        b = self.entries[0][0].rebased(t)
+        for box, _ in self.entries[1:]:
+            b = b.union(box, t)
+        return b
+
+
+class TPRTree:
+    """
+    TPR-tree over moving rectangles. `horizon` is how far ahead (in the
+    caller's time unit) insertions optimise the bounding boxes for.
+    """
+
+    def __init__(self, max_entries: int = 8, min_entries: int = 4, horizon: float = 10.0):
+        assert 1 < min_entries <= max_entries // 2
+        self.M = max_entries
+        self.m = min_entries
+        self.horizon = horizon
+        self.root = TPRNode(leaf=True)
+        self.now = float("-inf")
+        self._leaf_of: Dict[Any, TPRNode] = {}
+
+    def __len__(self) -> int:
+        return len(self._leaf_of)
+
+    def __contains__(self, obj: Any) -> bool:
+        return obj in self._leaf_of
+
+    # ---------- updates ----------
+
+    def insert(self, obj: Any, rect: Rect, velocity: Tuple[float, float], t: float):
+        if obj in self._leaf_of:
+            raise KeyError(f"object {obj!r} already indexed, use update()")
+        self._advance(t)
+        self._insert_entry(TPBR.moving(rect, velocity, t), obj)
+
+    def update(self, obj: Any, rect: Rect, velocity: Tuple[float, float], t: float):
+        """New position/velocity for `obj` (e.g. after a turn) at time t."""
+        self.delete(obj, t)
+        self.insert(obj, rect, velocity, t)
+
+    def delete(self, obj: Any, t: Optional[float] = None) -> bool:
+        leaf = self._leaf_of.pop(obj, None)
+        if leaf is None:
+            return False
+        if t is not None:
+            self._advance(t)
+        leaf.entries = [e for e in leaf.entries if e[1] != obj]
+        self._condense(leaf)
+        return True
+
+    def position(self, obj: Any, t: float) -> Rect:
+        for box, o in self._leaf_of[obj].entries:
+            if o == obj:
+                return box.at(t)
+        raise KeyError(obj)
+
+    def tighten(self, t: float):
+        """Recompute every node bound at time t (shrinks boxes that grew loose)."""
+        self._advance(t)
+        self._tighten_node(self.root, t)
+
+    # ---------- queries ----------
+
+    def search_at(self, query: Rect, t: float) -> List[Any]:
+        self._check_time(t)
+        res: List[Any] = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for box, child in node.entries:
+                if box.intersects_at(query, t):
+                    if node.leaf:
+                        res.append(child)
+                    else:
+                        stack.append(child)
+        return res
+
+    def search_between(self, query: Rect, t1: float, t2: float) -> List[Any]:
+        if t2 < t1:
+            raise ValueError("t2 must be >= t1")
+        self._check_time(t1)
+        res: List[Any] = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for box, child in node.entries:
+                if box.intersects_during(query, t1, t2):
+                    if node.leaf:
+                        res.append(child)
+                    else:
+                        stack.append(child)
+        return res
+
+    # ---------- internal ----------
+
+    def _advance(self, t: float):
+        if t < self.now:
+            raise ValueError(f"time went backwards: {t} < {self.now}")
+        self.now = t
+
+    def _check_time(self, t: float):
+        # node bounds only hold from their reference time onward
+        if t < self.now:
+            raise ValueError(f"query time {t} precedes the last update at {self.now}")
+
+    def _insert_entry(self, box: TPBR, obj: Any):
+        t = self.now
+        node = self.root
+        while not node.leaf:
+            best = None
+            best_key = None
+            for b, child in node.entries:
+                cost = b.area_integral(t, self.horizon)
+                key = (b.union(box, t).area_integral(t, self.horizon) - cost, cost)
+                if best_key is None or key < best_key:
+                    best_key = key
+                    best = child
+            node = best
+        node.entries.append((box, obj))
+        self._leaf_of[obj] = node
+        self._adjust(node)
+
+    def _adjust(self, node: TPRNode):
+        t = self.now
+        while True:
+            if len(node.entries) > self.M:
+                node, new_node = self._split(node)
+                if node.parent is None:
+                    root = TPRNode(leaf=False)
+                    node.parent = root
+                    new_node.parent = root
+                    root.entries = [(node.bounds(t), node), (new_node.bounds(t), new_node)]
+                    self.root = root
+                    return
+                parent = node.parent
+                self._replace_bounds(parent, node)
+                parent.entries.append((new_node.bounds(t), new_node))
+                node = parent
+                continue
+            parent = node.parent
+            while parent is not None:
+                self._replace_bounds(parent, node)
+                node = parent
+                parent = node.parent
+            return
+
+    def _replace_bounds(self, parent: TPRNode, node: TPRNode):
+        for i, (_, child) in enumerate(parent.entries):
+            if child is node:
+                parent.entries[i] = (node.bounds(self.now), node)
+                return
+
+    def _split(self, node: TPRNode):
+        t = self.now
+        H = self.horizon
+        entries = list(node.entries)
+        n = len(entries)
+        costs = [b.area_integral(t, H) for b, _ in entries]
+        worst = None
+        s1, s2 = 0, 1
+        for i in range(n):
+            for j in range(i + 1, n):
+                d = (entries[i][0].union(entries[j][0], t).area_integral(t, H)
+                     - costs[i] - costs[j])
+                if worst is None or d > worst:
+                    worst = d
+                    s1, s2 = i, j
+
+        group1 = [entries[s1]]
+        group2 = [entries[s2]]
+        b1 = entries[s1][0].rebased(t)
+        b2 = entries[s2][0].rebased(t)
+        remaining = n - 2
+        for i, entry in enumerate(entries):
+            if i == s1 or i == s2:
+                continue
+            u1 = b1.union(entry[0], t)
+            u2 = b2.union(entry[0], t)
+            if len(group1) + remaining == self.m:
+                to_first = True
+            elif len(group2) + remaining == self.m:
+                to_first = False
+            else:
+                inc1 = u1.area_integral(t, H) - b1.area_integral(t, H)
+                inc2 = u2.area_integral(t, H) - b2.area_integral(t, H)
+                to_first = inc1 < inc2 or (inc1 == inc2 and len(group1) <= len(group2))
+            if to_first:
+                group1.append(entry)
+                b1 = u1
+            else:
+                group2.append(entry)
+                b2 = u2
+            remaining -= 1
+
+        node.entries = group1
+        new_node = TPRNode(leaf=node.leaf, parent=node.parent)
+        new_node.entries = group2
+        for n_, group in ((node, group1), (new_node, group2)):
+            for _, child in group:
+                if n_.leaf:
+                    self._leaf_of[child] = n_
+                else:
+                    child.parent = n_
+        return node, new_node
+
+    def _condense(self, node: TPRNode):
+        orphans: List[Tuple[TPBR, Any]] = []
+        while node.parent is not None:
+            parent = node.parent
+            if len(node.entries) < self.m:
+                parent.entries = [e for e in parent.entries if e[1] is not node]
+                orphans.extend(self._leaf_entries(node))
+            else:
+                self._replace_bounds(parent, node)
+            node = parent
+        while not self.root.leaf and len(self.root.entries) == 1:
+            self.root = self.root.entries[0][1]
+            self.root.parent = None
+        if not self.root.leaf and not self.root.entries:
+            self.root = TPRNode(leaf=True)
+        for box, obj in orphans:
+            self._insert_entry(box, obj)
+
+    def _leaf_entries(self, node: TPRNode) -> List[Tuple[TPBR, Any]]:
+        if node.leaf:
+            return list(node.entries)
+        out = []
+        for _, child in node.entries:
+            out.extend(self._leaf_entries(child))
+        return out
+
+    def _tighten_node(self, node: TPRNode, t: float):
+        if node.leaf:
+            return
+        for i, (_, child) in enumerate(node.entries):
+            self._tighten_node(child, t)
+            node.entries[i] = (child.bounds(t), child)
@@ -0,0 +1,198 @@
+"""Memory-mapped point cloud loading for binary PCD, PLY and NPY files.
+
+o3d.io.read_point_cloud copies the whole file into a PointCloud (float64,
+24 bytes per point) before anything else can run. load_points() parses
+only the header and maps the data section instead: the result is an
+(n, 3) view of the file's x, y, z values in their stored type (usually
+float32), and pages are read when they are touched, so a tile-by-tile
+consumer (dbscan_grid.dbscan_tiled) keeps only the tiles it works on in
+memory.
+
+Supported:
+- PCD with DATA binary (not ascii, not binary_compressed)
+- PLY binary_little_endian / binary_big_endian, the vertex element with
+  fixed-size properties (elements before it must be fixed-size too)
+- NPY with an (n, >=3) numeric array or a structured array with x, y, z
+Other files raise ValueError; read them with Open3D, or re-save them once
+as binary.
+
+Usage (header, point count and bounds of a file):
+    python cloud_io.py map.pcd
+"""
+
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_PCD_TYPES = {("F", 4): "f4", ("F", 8): "f8", ("U", 1): "u1", ("U", 2): "u2", ("U", 4): "u4",
+              ("U", 8): "u8", ("I", 1): "i1", ("I", 2): "i2", ("I", 4): "i4", ("I", 8): "i8"}
+_PLY_TYPES = {"char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1", "short": "i2",
+              "int16": "i2", "ushort": "u2", "uint16": "u2", "int": "i4", "int32": "i4",
+              "uint": "u4", "uint32": "u4", "float": "f4", "float32": "f4", "double": "f8",
+              "float64": "f8"}
+
+
+def _header_lines(f, end: str, limit: int = 1 << 16) -> Tuple[List[str], int]:
+    # text lines up to and including the one starting with `end`, and the
+    # byte offset of the data after it
+    lines = []
+    while True:
+        raw = f.readline(limit)
+        if not raw:
+            raise ValueError(f"no {end!r} line in the header")
+        line = raw.decode("ascii", errors="replace").strip()
+        lines.append(line)
+        if line.split(" ", 1)[0] == end:
+            return lines, f.tell()
+
+
+def _unique_names(names: List[str]) -> List[str]:
+    # PCL pads with fields named "_"; dtype names must be unique
+    seen: Dict[str, int] = {}
+    out = []
+    for name in names:
+        k = seen.get(name, 0)
+        seen[name] = k + 1
+        out.append(name if k == 0 else f"{name}_{k}")
+    return out
+
+
+def _pcd_layout(path: str) -> Tuple[np.dtype, int, int]:
+    with open(path, "rb") as f:
+        lines, offset = _header_lines(f, "DATA")
+    head = {}
+    for line in lines:
+        if line and not line.startswith("#"):
+            parts = line.split()
+            head[parts[0].upper()] = parts[1:]
+    if head["DATA"][0].lower() != "binary":
+        raise ValueError(f"{path}: PCD DATA {head['DATA'][0]} cannot be memory-mapped, "
+                         f"only binary")
+    names = _unique_names(head["FIELDS"])
+    sizes = [int(v) for v in head["SIZE"]]
+    types = [v.upper() for v in head["TYPE"]]
+    counts = [int(v) for v in head.get("COUNT", ["1"] * len(names))]
+    fields = []
+    for name, size, kind, count in zip(names, sizes, types, counts):
+        code = "<" + _PCD_TYPES[(kind, size)]
+        fields.append((name, code) if count == 1 else (name, code, (count,)))
+    if "POINTS" in head:
+        n = int(head["POINTS"][0])
+    else:
+        n = int(head["WIDTH"][0]) * int(head.get("HEIGHT", ["1"])[0])
+    return np.dtype(fields), offset, n
+
+
+def _ply_layout(path: str) -> Tuple[np.dtype, int, int]:
+    with open(path, "rb") as f:
+        lines, offset = _header_lines(f, "end_header")
+    if not lines or lines[0] != "ply":
+        raise ValueError(f"{path}: not a PLY file")
+    order = None
+    elements = []  # [name, count, fields or None when a list property makes it variable]
+    for line in lines[1:]:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == "format":
+            order = {"binary_little_endian": "<", "binary_big_endian": ">"}.get(parts[1])
+            if order is None:
+                raise ValueError(f"{path}: PLY format {parts[1]} cannot be memory-mapped, "
+                                 f"only binary")
+        elif parts[0] == "element":
+            elements.append([parts[1], int(parts[2]), []])
+        elif parts[0] == "property":
+            if parts[1] == "list":
+                elements[-1][2] = None
+            elif elements[-1][2] is not None:
+                elements[-1][2].append((parts[2], order + _PLY_TYPES[parts[1]]))
+    for name, count, fields in elements:
+        if fields is None:
+            raise ValueError(f"{path}: PLY element {name!r} has list properties, "
+                             f"its size is unknown without reading it")
+        dtype = np.dtype(fields)
+        if name == "vertex":
+            return dtype, offset, count
+        offset += dtype.itemsize * count
+    raise ValueError(f"{path}: PLY file without a vertex element")
+
+
+def _xyz(records: np.ndarray) -> np.ndarray:
+    # (n, 3) view of the x, y, z fields when they are adjacent and of one
+    # type, else a copy
+    dtype = records.dtype
+    for name in ("x", "y", "z"):
+        if name not in dtype.names:
+            raise ValueError(f"no {name!r} field in {dtype.names}")
+    fx, fy, fz = (dtype.fields[k] for k in ("x", "y", "z"))
+    if (fx[0] == fy[0] == fz[0] and fx[0].shape == () and fy[1] == fx[1] + fx[0].itemsize
+            and fz[1] == fy[1] + fx[0].itemsize):
+        return np.ndarray((len(records), 3), dtype=fx[0], buffer=records, offset=fx[1],
+                          strides=(dtype.itemsize, fx[0].itemsize))
+    return np.stack([records["x"], records["y"], records["z"]], axis=1)
+
+
+def load_points(path: str) -> np.ndarray:
+    """
+    (n, 3) read-only view of the x, y, z values of a binary PCD / PLY file
+    or an NPY file, backed by a memory map of the file.
+    """
+    lower = path.lower()
+    if lower.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+        if data.dtype.names:
+            return _xyz(data)
+        if data.ndim != 2 or data.shape[1] < 3:
+            raise ValueError(f"{path}: expected an (n, >=3) array, got shape {data.shape}")
+        return data[:, :3]
+    if lower.endswith(".pcd"):
+        dtype, offset, n = _pcd_layout(path)
+    elif lower.endswith(".ply"):
+        dtype, offset, n = _ply_layout(path)
+    else:
+        raise ValueError(f"{path}: unknown point cloud format, expected .pcd, .ply or .npy")
+    if n == 0:
+        return np.empty((0, 3), dtype=np.float32)
+    records = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(n,))
+    return _xyz(records)
+
+
+def save_points(path: str, points: np.ndarray, fmt: str = "pcd"):
+    """Write an (n, 3) array as binary PCD or little-endian binary PLY (float32 x, y, z)."""
+    points = np.ascontiguousarray(points, dtype="<f4").reshape(-1, 3)
+    n = len(points)
+    if fmt == "pcd":
+        header = (f"# .PCD v0.7 - Point Cloud Data file format\nVERSION 0.7\nFIELDS x y z\n"
+                  f"SIZE 4 4 4\nTYPE F F F\nCOUNT 1 1 1\nWIDTH {n}\nHEIGHT 1\n"
+                  f"VIEWPOINT 0 0 0 1 0 0 0\nPOINTS {n}\nDATA binary\n")
+    elif fmt == "ply":
+        header = (f"ply\nformat binary_little_endian 1.0\nelement vertex {n}\n"
+                  f"property float x\nproperty float y\nproperty float z\nend_header\n")
+    else:
+        raise ValueError(f"unknown format {fmt!r}, expected 'pcd' or 'ply'")
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        points.tofile(f)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("path")
+    args = ap.parse_args()
+
+    points = load_points(args.path)
+    print(f"{args.path}: {len(points)} points of {points.dtype}")
+    if len(points):
+        lo = np.full(3, np.inf)
+        hi = np.full(3, -np.inf)
+        for s in range(0, len(points), 1 << 22):
+            block = np.asarray(points[s:s + (1 << 22)], dtype=np.float64)
+            lo = np.minimum(lo, block.min(axis=0))
+            hi = np.maximum(hi, block.max(axis=0))
+        print(f"{'min':>4} {lo[0]:>12.3f} {lo[1]:>12.3f} {lo[2]:>12.3f}")
+        print(f"{'max':>4} {hi[0]:>12.3f} {hi[1]:>12.3f} {hi[2]:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
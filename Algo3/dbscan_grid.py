@@ -0,0 +1,562 @@
+"""NumPy DBSCAN on a voxel grid, label-compatible with Open3D's cluster_dbscan.
+
+Points are bucketed into cubic cells and sorted by cell, so every cell is
+one contiguous slice and the candidate neighbours of a point are the points
+of a fixed set of nearby cells. Candidate pairs are expanded and tested in
+chunks of bounded size, all in NumPy.
+
+DBSCAN uses cells of side eps / sqrt(3) (grid DBSCAN, Gunawan 2013): two
+points of one cell are always closer than eps, so
+
+1. a cell holding >= min_points points holds only core points; neighbour
+   counting is needed for the points of the other (sparse) cells only,
+   against the cells within reach (5 x 5 x 5 minus the far corners)
+2. the core points of one cell all belong to one cluster, so clusters are
+   a union-find over cells: two core cells are merged when any of their
+   core points are closer than eps. Cell pairs are tested nearest offsets
+   first and skipped once both cells share a root, which in dense regions
+   leaves most of the pairs untested
+3. non-core points take the smallest cluster label among their core
+   neighbours, or -1
+
+The labels follow PointCloud::cluster_dbscan exactly: every point is its
+own neighbour, neighbours are strictly closer than eps, clusters are
+numbered by their smallest core point index and a border point takes the
+smallest label among its core neighbours' clusters.
+
+dbscan_tiled() gives the same labels for clouds that should not be in
+memory at once (a memmap from cloud_io.load_points): the steps above run
+per (x, y) tile with a halo of eps, and the tiles' clusters are joined by
+a union-find through the core points they share.
+
+Usage (synthetic clusters, checked against a brute-force port of Open3D's
+loop for small n, and against Open3D itself when it is installed):
+    python dbscan_grid.py --points 20000 200000 1000000 --eps 0.2 --min-points 40
+"""
+
+import argparse
+import itertools
+import math
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_CHUNK = 1 << 22  # candidate pairs tested at once
+
+Offset = Tuple[int, int, int]
+
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(s, s + c) for every (s, c)."""
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    first = np.cumsum(counts) - counts
+    return np.repeat(starts - first, counts) + np.arange(total)
+
+
+def candidate_pairs(row_start: np.ndarray, row_count: np.ndarray, col_start: np.ndarray,
+                    col_count: np.ndarray, chunk: int, units: bool = False
+                    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    All (i, j) with i in row range k and j in column range k, for every
+    unit k, as chunks (i, j, k) of about `chunk` pairs (k is None unless
+    `units`); units larger than a chunk are split into blocks of rows.
+    """
+    live = np.flatnonzero((row_count > 0) & (col_count > 0))
+    if len(live) == 0:
+        return
+    rc = row_count[live]
+    cc = col_count[live]
+    blocks = np.maximum(1, -(-(rc * cc) // chunk))
+    rows = -(-rc // blocks)
+    blocks = -(-rc // rows)
+    part = np.repeat(np.arange(len(live)), blocks)
+    block = _ranges(np.zeros(len(live), dtype=np.int64), blocks)
+    rs = row_start[live][part] + block * rows[part]
+    rn = np.minimum(rows[part], rc[part] - block * rows[part])
+    cs = col_start[live][part]
+    cn = cc[part]
+    unit = live[part]
+    cost = np.cumsum(rn * cn)
+    cuts = np.searchsorted(cost, np.arange(chunk, cost[-1], chunk), side="right")
+    for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, len(cost)]):
+        if hi <= lo:
+            continue
+        n_rows = rn[lo:hi]
+        i = _ranges(rs[lo:hi], n_rows)
+        per_row = np.repeat(cn[lo:hi], n_rows)
+        j = _ranges(np.repeat(cs[lo:hi], n_rows), per_row)
+        k = np.repeat(np.repeat(unit[lo:hi], n_rows), per_row) if units else None
+        yield np.repeat(i, per_row), j, k
+
+
+class VoxelGrid:
+    """
+    Points sorted into cubic cells of side `cell`. Sorted position p is
+    original index order[p]; cell c holds sorted positions starts[c] ..
+    starts[c] + counts[c] - 1.
+    """
+
+    def __init__(self, points: np.ndarray, cell: float):
+        if cell <= 0.0:
+            raise ValueError(f"cell size must be > 0, got {cell}")
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.cell = float(cell)
+        self.n = len(points)
+        if self.n == 0:
+            self.order = np.empty(0, dtype=np.int64)
+            self.keys = self.starts = self.counts = self.cell_id = np.empty(0, dtype=np.int64)
+            self.x = self.y = self.z = np.empty(0)
+            self.dims = (1, 1, 1)
+            self.pad = 0
+            return
+        self.pad = 2  # neighbour keys never wrap for offsets up to +-pad
+        ijk = np.floor((points - points.min(axis=0)) / self.cell).astype(np.int64) + self.pad
+        self.dims = tuple(int(v) for v in ijk.max(axis=0) + self.pad + 1)
+        key = (ijk[:, 0] * self.dims[1] + ijk[:, 1]) * self.dims[2] + ijk[:, 2]
+        self.order = np.argsort(key, kind="stable")
+        self.keys, self.starts, self.counts = np.unique(key[self.order], return_index=True,
+                                                        return_counts=True)
+        self.cell_id = np.repeat(np.arange(len(self.keys)), self.counts)
+        # coordinates in sorted order, one contiguous array per axis
+        sorted_pts = points[self.order]
+        self.x = np.ascontiguousarray(sorted_pts[:, 0])
+        self.y = np.ascontiguousarray(sorted_pts[:, 1])
+        self.z = np.ascontiguousarray(sorted_pts[:, 2])
+
+    # ---------- cells ----------
+
+    def offsets(self, radius: float, half: bool) -> List[Offset]:
+        """
+        Cell offsets (not (0, 0, 0)) whose cells can hold a point closer
+        than `radius` to a point of the center cell, nearest first; with
+        `half` only one of every pair (d, -d).
+        """
+        reach = math.ceil(radius / self.cell)
+        if reach > self.pad:
+            raise ValueError(f"radius {radius} reaches {reach} cells, at most {self.pad} supported")
+        out = []
+        for d in itertools.product(range(-reach, reach + 1), repeat=3):
+            if d == (0, 0, 0) or (half and d < (0, 0, 0)):
+                continue
+            gap = math.sqrt(sum(max(abs(v) - 1, 0) ** 2 for v in d)) * self.cell
+            if gap < radius:
+                out.append((gap, sum(v * v for v in d), d))
+        return [d for _, _, d in sorted(out)]
+
+    def lookup(self, offset: Offset, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(hit, b): whether each of `cells` has an occupied neighbour at `offset`, and which."""
+        di, dj, dk = offset
+        target = self.keys[cells] + (di * self.dims[1] + dj) * self.dims[2] + dk
+        pos = np.minimum(np.searchsorted(self.keys, target), len(self.keys) - 1)
+        hit = self.keys[pos] == target
+        return hit, pos[hit]
+
+    def neighbours(self, offset: Offset, cells: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(a, b): cells a (of `cells`, default all) whose neighbour b at `offset` is occupied."""
+        if cells is None:
+            cells = np.arange(len(self.keys))
+        hit, b = self.lookup(offset, cells)
+        return cells[hit], b
+
+    def view(self, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The sorted positions where `mask` holds, with per-cell (starts, counts) into them."""
+        pos = np.flatnonzero(mask)
+        counts = np.bincount(self.cell_id[pos], minlength=len(self.keys))
+        return pos, np.cumsum(counts) - counts, counts
+
+    def close(self, p: np.ndarray, q: np.ndarray, r2: float) -> np.ndarray:
+        """Whether sorted positions p and q are closer than sqrt(r2)."""
+        dx = self.x[p] - self.x[q]
+        dy = self.y[p] - self.y[q]
+        dz = self.z[p] - self.z[q]
+        return dx * dx + dy * dy + dz * dz < r2
+
+    # ---------- pairs ----------
+
+    def pairs_within(self, radius: float, chunk: int = DEFAULT_CHUNK
+                     ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Every unordered pair of distinct points closer than `radius`, once,
+        as chunks of sorted positions (i, j); about `chunk` candidate pairs
+        are held in memory at a time.
+        """
+        r2 = float(radius) ** 2
+        cells = np.arange(len(self.keys))
+        pairs = [(cells, cells)] + [self.neighbours(d) for d in self.offsets(radius, half=True)]
+        for k, (a, b) in enumerate(pairs):
+            for i, j, _ in candidate_pairs(self.starts[a], self.counts[a], self.starts[b],
+                                           self.counts[b], chunk):
+                if k == 0:
+                    keep = i < j
+                    i, j = i[keep], j[keep]
+                hit = self.close(i, j, r2)
+                yield i[hit], j[hit]
+
+
+def _find(parent: np.ndarray, x: np.ndarray) -> np.ndarray:
+    r = parent[x]
+    while True:
+        up = parent[r]
+        if np.array_equal(up, r):
+            return r
+        r = up
+
+
+def _union(parent: np.ndarray, a: np.ndarray, b: np.ndarray):
+    # hook the larger root onto the smaller one until every pair shares a
+    # root; queried nodes are pointed straight at their root on the way
+    while len(a):
+        ra = _find(parent, a)
+        rb = _find(parent, b)
+        parent[a] = ra
+        parent[b] = rb
+        split = ra != rb
+        a, b = ra[split], rb[split]
+        np.minimum.at(parent, np.maximum(a, b), np.minimum(a, b))
+
+
+def _dbscan_grid(points: np.ndarray, eps: float) -> VoxelGrid:
+    # a hair below eps / sqrt(3), so rounding never puts two points of one
+    # cell at eps or more
+    return VoxelGrid(points, eps / math.sqrt(3.0) * (1.0 - 1e-9))
+
+
+def _core_points(grid: VoxelGrid, eps: float, min_points: int, chunk: int,
+                 mask: Optional[np.ndarray] = None) -> np.ndarray:
+    # core flags by sorted position: all of a dense cell, counted for the
+    # sparse cells; a cell is done once all its points have min_points
+    # neighbours. With `mask`, only the flags where it holds are counted.
+    r2 = float(eps) ** 2
+    cells = np.arange(len(grid.keys))
+    core = np.repeat(grid.counts >= min_points, grid.counts)
+    counts = np.zeros(grid.n, dtype=np.int64) if mask is None else np.where(mask, 0, min_points)
+    sparse = cells[grid.counts < min_points]
+    for d in [(0, 0, 0)] + grid.offsets(eps, half=False):
+        sparse = sparse[np.minimum.reduceat(counts, grid.starts)[sparse] < min_points]
+        if len(sparse) == 0:
+            break
+        a, b = grid.neighbours(d, sparse)
+        for i, j, _ in candidate_pairs(grid.starts[a], grid.counts[a], grid.starts[b],
+                                       grid.counts[b], chunk):
+            counts += np.bincount(i[grid.close(i, j, r2)], minlength=grid.n)
+    return core | (counts >= min_points)
+
+
+def _cluster_cells(grid: VoxelGrid, core: np.ndarray, eps: float, chunk: int
+                   ) -> Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+    # union-find over the cells with core points: (core view, root per cell)
+    r2 = float(eps) ** 2
+    cells = np.arange(len(grid.keys))
+    core_pos, core_start, core_count = grid.view(core)
+    parent = np.arange(len(grid.keys))
+    core_cells = cells[core_count > 0]
+    for d in grid.offsets(eps, half=True):
+        a, b = grid.neighbours(d, core_cells)
+        keep = core_count[b] > 0
+        a, b = a[keep], b[keep]
+        while len(a):
+            split = _find(parent, a) != _find(parent, b)
+            a, b = a[split], b[split]
+            if len(a) == 0:
+                break
+            # a batch of about `chunk` candidates, then drop the pairs the
+            # batch has already connected
+            cost = np.cumsum(core_count[a] * core_count[b])
+            take = max(1, int(np.searchsorted(cost, chunk, side="right")))
+            ba, bb = a[:take], b[:take]
+            a, b = a[take:], b[take:]
+            for i, j, k in candidate_pairs(core_start[ba], core_count[ba], core_start[bb],
+                                           core_count[bb], chunk, units=True):
+                hit = np.unique(k[grid.close(core_pos[i], core_pos[j], r2)])
+                _union(parent, ba[hit], bb[hit])
+    return (core_pos, core_start, core_count), _find(parent, cells)
+
+
+def _rank_by_first(comp: np.ndarray, index: np.ndarray, size: int) -> np.ndarray:
+    # cluster number of each of `size` components: the rank of the
+    # smallest original index of its points
+    big = np.iinfo(np.int64).max
+    first = np.full(size, big)
+    np.minimum.at(first, comp, index)
+    roots = np.flatnonzero(first != big)
+    rank = np.full(size, -1, dtype=np.int64)
+    rank[roots[np.argsort(first[roots])]] = np.arange(len(roots))
+    return rank
+
+
+def _border_labels(grid: VoxelGrid, core: np.ndarray,
+                   core_view: Tuple[np.ndarray, np.ndarray, np.ndarray], labels: np.ndarray,
+                   eps: float, chunk: int, mask: Optional[np.ndarray] = None):
+    # non-core points (where `mask` holds) take the smallest label among
+    # their core neighbours; `labels` is by sorted position, set in place
+    r2 = float(eps) ** 2
+    core_pos, core_start, core_count = core_view
+    rest_pos, rest_start, rest_count = grid.view(~core if mask is None else ~core & mask)
+    if len(rest_pos) == 0:
+        return
+    big = np.iinfo(np.int64).max
+    best = np.full(grid.n, big)
+    rest_cells = np.flatnonzero(rest_count > 0)
+    for d in [(0, 0, 0)] + grid.offsets(eps, half=False):
+        a, b = grid.neighbours(d, rest_cells)
+        for i, j, _ in candidate_pairs(rest_start[a], rest_count[a], core_start[b],
+                                       core_count[b], chunk):
+            p = rest_pos[i]
+            q = core_pos[j]
+            hit = grid.close(p, q, r2)
+            np.minimum.at(best, p[hit], labels[q[hit]])
+    border = rest_pos[best[rest_pos] != big]
+    labels[border] = best[border]
+
+
+def dbscan(points: np.ndarray, eps: float, min_points: int,
+           chunk: int = DEFAULT_CHUNK) -> np.ndarray:
+    """Open3D-compatible DBSCAN labels (int32, -1 = noise) of an (n, 3) array."""
+    grid = _dbscan_grid(points, eps)
+    n = grid.n
+    if n == 0:
+        return np.empty(0, dtype=np.int32)
+    labels = np.full(n, -1, dtype=np.int64)
+    core = _core_points(grid, eps, min_points, chunk)
+    core_view, root = _cluster_cells(grid, core, eps, chunk)
+    core_pos = core_view[0]
+    if len(core_pos):
+        core_root = root[grid.cell_id[core_pos]]
+        labels[core_pos] = _rank_by_first(core_root, grid.order[core_pos], len(root))[core_root]
+        _border_labels(grid, core, core_view, labels, eps, chunk)
+    out = np.empty(n, dtype=np.int32)
+    out[grid.order] = labels
+    return out
+
+
+class Tiles:
+    """
+    Square (x, y) tiles over an (n, 3) array, which may be a memmap: it is
+    read in blocks, and the point indices of all tiles are kept in one
+    array (int32 below 2**31 points), tile by tile.
+    """
+
+    def __init__(self, points: np.ndarray, tile_points: int, min_side: float,
+                 block: int = 1 << 22):
+        self.points = points
+        n = len(points)
+        lo = np.full(2, np.inf)
+        hi = np.full(2, -np.inf)
+        for s in range(0, n, block):
+            xy = np.asarray(points[s:s + block, :2], dtype=np.float64)
+            lo = np.minimum(lo, xy.min(axis=0))
+            hi = np.maximum(hi, xy.max(axis=0))
+        self.lo = lo
+        # tiles of about tile_points points at the mean density
+        area = float(np.prod(np.maximum(hi - lo, min_side)))
+        self.side = max(math.sqrt(area * tile_points / max(n, 1)), min_side)
+        self.shape = tuple(int(v) for v in (hi - lo) // self.side + 1)
+        counts = np.zeros(self.shape[0] * self.shape[1], dtype=np.int64)
+        for s in range(0, n, block):
+            counts += np.bincount(self.key(points[s:s + block]), minlength=len(counts))
+        self.counts = counts
+        self.starts = np.cumsum(counts) - counts
+        # counting sort of the point indices by tile, one block at a time
+        self.index = np.empty(n, dtype=np.int32 if n < 2**31 else np.int64)
+        fill = self.starts.copy()
+        for s in range(0, n, block):
+            key = self.key(points[s:s + block])
+            order = np.argsort(key, kind="stable")
+            tiles, first, count = np.unique(key[order], return_index=True, return_counts=True)
+            self.index[np.repeat(fill[tiles] - first, count) + np.arange(len(order))] = s + order
+            fill[tiles] += count
+
+    def key(self, points: np.ndarray) -> np.ndarray:
+        """Tile of each point."""
+        xy = np.asarray(points[:, :2], dtype=np.float64)
+        ij = np.floor((xy - self.lo) / self.side).astype(np.int64)
+        ij = np.minimum(np.maximum(ij, 0), np.array(self.shape) - 1)
+        return ij[:, 0] * self.shape[1] + ij[:, 1]
+
+    def occupied(self) -> np.ndarray:
+        return np.flatnonzero(self.counts)
+
+    def gather(self, tile: int, halo: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (index, own, xyz) of the points of `tile` and of the points of other
+        tiles within `halo` of its square, in index order; own marks the
+        tile's points, xyz is float64.
+        """
+        ti, tj = divmod(int(tile), self.shape[1])
+        reach = math.ceil(halo / self.side)
+        parts = []
+        for i in range(max(0, ti - reach), min(self.shape[0], ti + reach + 1)):
+            for j in range(max(0, tj - reach), min(self.shape[1], tj + reach + 1)):
+                t = i * self.shape[1] + j
+                parts.append(self.index[self.starts[t]:self.starts[t] + self.counts[t]])
+        index = np.sort(np.concatenate(parts)).astype(np.int64)
+        xyz = np.asarray(self.points[index], dtype=np.float64)
+        own = self.key(xyz) == tile
+        x0 = self.lo + np.array([ti, tj]) * self.side
+        near = np.all((xyz[:, :2] >= x0 - halo) & (xyz[:, :2] <= x0 + self.side + halo), axis=1)
+        keep = own | near
+        return index[keep], own[keep], xyz[keep]
+
+
+def dbscan_tiled(points: np.ndarray, eps: float, min_points: int,
+                 tile_points: int = 2_000_000, chunk: int = DEFAULT_CHUNK) -> np.ndarray:
+    """
+    dbscan() of an (n, 3) array (e.g. a memmap from cloud_io.load_points)
+    one (x, y) tile of about `tile_points` points at a time, with the same
+    labels. Each tile is read with a halo of eps around it, three times:
+    core flags of its points, its local clusters (stitched to the other
+    tiles' through the halo core points by a union-find over the tile
+    clusters), then its border points. Besides one tile, memory is about
+    13 bytes per point.
+    """
+    n = len(points)
+    if n <= tile_points:
+        return dbscan(np.asarray(points, dtype=np.float64), eps, min_points, chunk)
+    tiles = Tiles(points, tile_points, min_side=4.0 * eps)
+    # a little more than eps, so rounding at tile edges cannot cut a neighbour off
+    halo = eps * 1.01
+
+    # 1. core flags of every tile's own points
+    core = np.zeros(n, dtype=bool)
+    for t in tiles.occupied():
+        index, own, xyz = tiles.gather(t, halo)
+        grid = _dbscan_grid(xyz, eps)
+        mine = own[grid.order]
+        flags = _core_points(grid, eps, min_points, chunk, mask=mine)
+        core[index[grid.order[mine]]] = flags[mine]
+
+    # 2. local clusters, numbered globally; the owner's cluster of a point is
+    # kept in labels, the halo core points link the tiles' clusters
+    labels = np.full(n, -1, dtype=tiles.index.dtype)
+    n_comps = 0
+    links, firsts = [], []
+    for t in tiles.occupied():
+        index, own, xyz = tiles.gather(t, halo)
+        grid = _dbscan_grid(xyz, eps)
+        core_view, root = _cluster_cells(grid, core[index][grid.order], eps, chunk)
+        core_pos = core_view[0]
+        if len(core_pos) == 0:
+            continue
+        comps, local = np.unique(root[grid.cell_id[core_pos]], return_inverse=True)
+        comp = n_comps + local
+        n_comps += len(comps)
+        point = index[grid.order[core_pos]]
+        mine = own[grid.order[core_pos]]
+        labels[point[mine]] = comp[mine]
+        links.append((comp[~mine], point[~mine]))
+        big = np.iinfo(np.int64).max
+        first = np.full(len(comps), big)
+        np.minimum.at(first, local[mine], point[mine])
+        firsts.append(first)
+    if n_comps == 0:
+        return np.full(n, -1, dtype=np.int32)
+    parent = np.arange(n_comps)
+    for comp, point in links:
+        _union(parent, comp, labels[point].astype(np.int64))
+    root = _find(parent, np.arange(n_comps))
+    cluster = _rank_by_first(root, np.concatenate(firsts), n_comps)[root]
+    for s in range(0, n, 1 << 22):
+        mark = core[s:s + (1 << 22)]
+        part = labels[s:s + (1 << 22)]
+        part[mark] = cluster[part[mark]]
+
+    # 3. border points of every tile
+    for t in tiles.occupied():
+        index, own, xyz = tiles.gather(t, halo)
+        if not (own & ~core[index]).any():
+            continue
+        grid = _dbscan_grid(xyz, eps)
+        flags = core[index][grid.order]
+        local = labels[index][grid.order].astype(np.int64)
+        mine = own[grid.order]
+        _border_labels(grid, flags, grid.view(flags), local, eps, chunk, mask=mine)
+        rest = mine & ~flags
+        labels[index[grid.order[rest]]] = local[rest]
+    return labels.astype(np.int32, copy=False)
+
+
+def dbscan_reference(points: np.ndarray, eps: float, min_points: int) -> np.ndarray:
+    """Open3D's ClusterDBSCAN loop with brute-force neighbour lists, O(n^2); for tests."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    n = len(points)
+    nbs = []
+    for p in points:
+        d = points - p
+        nbs.append(np.flatnonzero(np.einsum("ij,ij->i", d, d) < eps * eps).tolist())
+    labels = [-2] * n
+    cluster = 0
+    for idx in range(n):
+        if labels[idx] != -2:
+            continue
+        if len(nbs[idx]) < min_points:
+            labels[idx] = -1
+            continue
+        todo = set(nbs[idx])
+        visited = {idx}
+        labels[idx] = cluster
+        while todo:
+            nb = todo.pop()
+            visited.add(nb)
+            if labels[nb] == -1:
+                labels[nb] = cluster
+            if labels[nb] != -2:
+                continue
+            labels[nb] = cluster
+            if len(nbs[nb]) >= min_points:
+                todo.update(q for q in nbs[nb] if q not in visited)
+        cluster += 1
+    return np.array(labels, dtype=np.int32)
+
+
+def synthetic_cloud(n: int, rng: np.random.Generator, noise: float = 0.1) -> np.ndarray:
+    """Gaussian blobs plus uniform noise in a box that grows with n."""
+    side = 4.0 * (n / 20000.0) ** (1.0 / 3.0)
+    n_noise = int(n * noise)
+    n_blobs = n - n_noise
+    k = max(1, n // 2000)
+    centers = rng.uniform(0.0, side, size=(k, 3))
+    pts = centers[rng.integers(0, k, n_blobs)] + rng.normal(0.0, 0.15, size=(n_blobs, 3))
+    return np.vstack([pts, rng.uniform(0.0, side, size=(n_noise, 3))])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--points", type=int, nargs="+", default=[20000, 200000, 1000000])
+    ap.add_argument("--eps", type=float, default=0.2)
+    ap.add_argument("--min-points", type=int, default=40)
+    ap.add_argument("--check-max", type=int, default=3000,
+                    help="compare with the brute-force Open3D loop up to this many points")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    try:
+        import open3d as o3d
+    except ImportError:
+        o3d = None
+    print(f"eps={args.eps} min_points={args.min_points} open3d={'yes' if o3d else 'no'}")
+    print(f"{'points':>8} {'grid s':>7} {'clusters':>8} {'noise':>8} {'ref s':>7} {'match':>5} "
+          f"{'o3d s':>7} {'match':>5}")
+    for n in [args.check_max] + args.points:
+        rng = np.random.default_rng(args.seed)
+        pts = synthetic_cloud(n, rng)
+        t0 = time.perf_counter()
+        labels = dbscan(pts, args.eps, args.min_points)
+        t1 = time.perf_counter()
+        ref = o3d_cmp = f"{'-':>7} {'-':>5}"
+        if n <= args.check_max:
+            expect = dbscan_reference(pts, args.eps, args.min_points)
+            ref = f"{time.perf_counter() - t1:>7.2f} {str(np.array_equal(labels, expect)):>5}"
+        if o3d is not None:
+            pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(pts))
+            t2 = time.perf_counter()
+            expect = np.asarray(pcd.cluster_dbscan(eps=args.eps, min_points=args.min_points))
+            o3d_cmp = f"{time.perf_counter() - t2:>7.2f} {str(np.array_equal(labels, expect)):>5}"
+        print(f"{n:>8} {t1 - t0:>7.2f} {labels.max() + 1:>8} {int((labels == -1).sum()):>8} "
+              f"{ref} {o3d_cmp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Radius-neighbour graph of a point cloud as an int32 edge array, for the wireframes.
+
+build_wireframe_full_radius() in dbscan_3d_filter.py asked a KD-tree for
+the neighbours of one point at a time and appended [i, j] lists, hours on a
+multi-million-point map. Here the points go into a voxel grid with cells
+of side `radius` (dbscan_grid.VoxelGrid): a point's neighbours are in its
+own cell or one of the 26 around it, and every cell pair is visited once
+(the cell itself plus 13 half offsets), so each edge comes out exactly
+once, as i < j, without de-duplication.
+
+Candidate pairs are tested about `chunk` at a time, so the working memory
+is bounded whatever the density; only the edge array itself (8 bytes per
+edge) grows with the output. estimate_edges() predicts its size from the
+exact neighbour counts of a random sample of points, so radius_graph()
+allocates once in the common case and can refuse a graph that would not
+fit (`max_edges`) before building it.
+
+radius_graph_parallel() spreads the work over a process pool. The points
+are sorted along their longest axis into one shared-memory buffer and cut
+into slabs of equal point count; a worker builds the graph of its slab
+plus a margin of `radius` beyond its upper face, so every edge is found
+by the slab of its lower endpoint. Edges also found by the slab below
+(both endpoints in its margin) are dropped by that slab, so the merge is
+a plain concatenation. Each worker tests `chunk` candidates at a time.
+
+Usage (time, estimate and memory, checked against brute force for small n):
+    python radius_graph.py --points 20000 200000 1000000 --radius 0.1 --workers 1 2 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from dbscan_grid import DEFAULT_CHUNK, VoxelGrid, candidate_pairs, synthetic_cloud
+
+
+def edge_chunks(points: np.ndarray, radius: float, chunk: int = DEFAULT_CHUNK,
+                grid: Optional[VoxelGrid] = None) -> Iterator[np.ndarray]:
+    """Every pair of points closer than `radius` once, as int32 (m, 2) chunks with i < j."""
+    if grid is None:
+        grid = VoxelGrid(points, radius)
+    for i, j in grid.pairs_within(radius, chunk):
+        a = grid.order[i]
+        b = grid.order[j]
+        edges = np.empty((len(a), 2), dtype=np.int32)
+        np.minimum(a, b, out=edges[:, 0])
+        np.maximum(a, b, out=edges[:, 1])
+        yield edges
+
+
+def estimate_edges(points: np.ndarray, radius: float, sample: int = 20000,
+                   rng: Optional[np.random.Generator] = None,
+                   grid: Optional[VoxelGrid] = None) -> int:
+    """
+    Expected edge count of the radius graph: the mean degree of up to
+    `sample` random points (exact when n <= sample) times n / 2.
+    """
+    if grid is None:
+        grid = VoxelGrid(points, radius)
+    n = grid.n
+    if n < 2:
+        return 0
+    if n <= sample:
+        p = np.arange(n)
+    else:
+        rng = rng if rng is not None else np.random.default_rng(0)
+        p = np.sort(rng.choice(n, sample, replace=False))
+    r2 = float(radius) ** 2
+    cells = grid.cell_id[p]
+    degree = -len(p)  # every point finds itself in its own cell
+    for d in [(0, 0, 0)] + grid.offsets(radius, half=False):
+        hit, b = grid.lookup(d, cells)
+        ones = np.ones(len(b), dtype=np.int64)
+        for i, j, _ in candidate_pairs(p[hit], ones, grid.starts[b], grid.counts[b],
+                                       DEFAULT_CHUNK):
+            degree += int(np.count_nonzero(grid.close(i, j, r2)))
+    return int(round(degree * n / (2.0 * len(p))))
+
+
+def radius_graph(points: np.ndarray, radius: float, chunk: int = DEFAULT_CHUNK,
+                 max_edges: Optional[int] = None) -> np.ndarray:
+    """
+    int32 (E, 2) array of every pair (i, j), i < j, of points closer than
+    `radius`. Raises ValueError when the estimated edge count is above
+    `max_edges`.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    grid = VoxelGrid(points, radius)
+    expected = estimate_edges(points, radius, grid=grid)
+    if max_edges is not None and expected > max_edges:
+        raise ValueError(f"about {expected} edges expected, more than max_edges={max_edges}; "
+                         f"use a smaller radius or downsample")
+    # room for the estimate plus a margin for its sampling error
+    out = np.empty((max(16, int(expected * 1.05)), 2), dtype=np.int32)
+    size = 0
+    for edges in edge_chunks(points, radius, chunk, grid):
+        if size + len(edges) > len(out):
+            grown = np.empty((max(size + len(edges), int(len(out) * 1.5)), 2), dtype=np.int32)
+            grown[:size] = out[:size]
+            out = grown
+        out[size:size + len(edges)] = edges
+        size += len(edges)
+    return out[:size].copy() if size < len(out) // 2 else out[:size]
+
+
+def _shared(array: np.ndarray) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+    return shm
+
+
+def _slab_edges(points_name: str, order_name: str, n: int, start: int, end: int, stop: int,
+                radius: float, chunk: int) -> np.ndarray:
+    # worker: edges of sorted positions start..stop-1 whose lower endpoint
+    # is below `end`, as original indices
+    points_shm = shared_memory.SharedMemory(name=points_name)
+    order_shm = shared_memory.SharedMemory(name=order_name)
+    try:
+        points = np.ndarray((n, 3), np.float64, buffer=points_shm.buf)
+        order = np.ndarray((n,), np.int64, buffer=order_shm.buf)
+        # local i < j, and local order is the sort order, so i is the lower endpoint
+        local = radius_graph(points[start:stop], radius, chunk)
+        local = local[local[:, 0] < end - start]
+        ends = order[start + local.astype(np.int64)]
+        edges = np.empty(local.shape, dtype=np.int32)
+        np.minimum(ends[:, 0], ends[:, 1], out=edges[:, 0])
+        np.maximum(ends[:, 0], ends[:, 1], out=edges[:, 1])
+        del points, order
+    finally:
+        points_shm.close()
+        order_shm.close()
+    return edges
+
+
+def slabs(coord: np.ndarray, count: int, radius: float) -> List[Tuple[int, int, int]]:
+    """
+    (start, end, stop) for `count` slabs of about equal size over the sorted
+    coordinates `coord`: the slab owns positions start..end-1 and reads up
+    to stop-1, the first position `radius` or more above its last point.
+    """
+    cuts = np.unique(np.linspace(0, len(coord), count + 1).astype(np.int64))
+    out = []
+    for start, end in zip(cuts[:-1].tolist(), cuts[1:].tolist()):
+        # a hair over radius, so rounding cannot leave a neighbour outside
+        stop = int(np.searchsorted(coord, coord[end - 1] + radius * (1.0 + 1e-9), side="right"))
+        out.append((start, end, stop))
+    return out
+
+
+def radius_graph_parallel(points: np.ndarray, radius: float, workers: Optional[int] = None,
+                          chunk: int = DEFAULT_CHUNK, max_edges: Optional[int] = None,
+                          slabs_per_worker: int = 2) -> np.ndarray:
+    """
+    radius_graph() on `workers` processes (default: all cores), with
+    `slabs_per_worker` slabs each for load balance. The same edges, in
+    another order.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    n = len(points)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or n < 2:
+        return radius_graph(points, radius, chunk, max_edges)
+    if max_edges is not None:
+        expected = estimate_edges(points, radius)
+        if expected > max_edges:
+            raise ValueError(f"about {expected} edges expected, more than max_edges={max_edges}; "
+                             f"use a smaller radius or downsample")
+
+    axis = int(np.argmax(np.ptp(points, axis=0)))
+    order = np.argsort(points[:, axis], kind="stable")
+    points_shm = _shared(points[order])
+    order_shm = _shared(order.astype(np.int64))
+    try:
+        coord = points[order, axis]
+        parts = slabs(coord, workers * slabs_per_worker, radius)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_slab_edges, points_shm.name, order_shm.name, n,
+                                   start, end, stop, radius, chunk)
+                       for start, end, stop in parts]
+            results = [f.result() for f in futures]
+    finally:
+        points_shm.close()
+        points_shm.unlink()
+        order_shm.close()
+        order_shm.unlink()
+    return np.concatenate(results) if results else np.empty((0, 2), dtype=np.int32)
+
+
+def radius_graph_reference(points: np.ndarray, radius: float) -> np.ndarray:
+    """Brute-force radius_graph, O(n^2), edges sorted; for tests."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    out = []
+    for i in range(len(points)):
+        d = points[i + 1:] - points[i]
+        j = np.flatnonzero(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1] + d[:, 2] * d[:, 2]
+                           < radius * radius)
+        out.append(np.stack([np.full(len(j), i), i + 1 + j], axis=1))
+    return np.concatenate(out).astype(np.int32) if out else np.empty((0, 2), dtype=np.int32)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--points", type=int, nargs="+", default=[20000, 200000, 1000000])
+    ap.add_argument("--radius", type=float, default=0.1)
+    ap.add_argument("--workers", type=int, nargs="+", default=[2, 4],
+                    help="process counts timed with radius_graph_parallel")
+    ap.add_argument("--check-max", type=int, default=5000,
+                    help="compare with brute force up to this many points")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"radius={args.radius} cores={os.cpu_count()}")
+    print(f"{'points':>8} {'edges':>10} {'estimate':>10} {'est s':>6} {'graph s':>7} "
+          f"{'MB':>7} {'match':>5}" + "".join(f" {f'{w} proc s':>9} {'same':>5}"
+                                              for w in args.workers))
+    for n in [args.check_max] + args.points:
+        pts = synthetic_cloud(n, np.random.default_rng(args.seed))
+        t0 = time.perf_counter()
+        expected = estimate_edges(pts, args.radius)
+        t1 = time.perf_counter()
+        edges = radius_graph(pts, args.radius)
+        t2 = time.perf_counter()
+        match = "-"
+        if n <= args.check_max:
+            ref = radius_graph_reference(pts, args.radius)
+            got = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+            match = str(np.array_equal(got, ref))
+        row = (f"{n:>8} {len(edges):>10} {expected:>10} {t1 - t0:>6.2f} {t2 - t1:>7.2f} "
+               f"{edges.nbytes / 2**20:>7.1f} {match:>5}")
+        # same edge set: same count and same sum of a per-edge hash
+        key = np.sum(edges[:, 0].astype(np.int64) * (n + 1) + edges[:, 1], dtype=np.uint64)
+        for w in args.workers:
+            t3 = time.perf_counter()
+            par = radius_graph_parallel(pts, args.radius, workers=w)
+            t4 = time.perf_counter()
+            same = len(par) == len(edges) and key == np.sum(
+                par[:, 0].astype(np.int64) * (n + 1) + par[:, 1], dtype=np.uint64)
+            row += f" {t4 - t3:>9.2f} {str(same):>5}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()